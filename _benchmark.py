@@ -0,0 +1,284 @@
+# coding: utf-8
+# Copyright (c) 2025 OceanBase.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Micro-benchmarks of obd hot paths, to track regressions:
+
+    python _benchmark.py [name ...]
+
+Every benchmark prints its timings and exits non-zero when it is over its budget.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+
+
+SOURCE_PATH = os.path.dirname(os.path.abspath(__file__))
+BENCHMARKS = {}
+
+
+def benchmark(func):
+    BENCHMARKS[func.__name__] = func
+    return func
+
+
+def timeit(func, rounds):
+    start_time = time.time()
+    for _ in range(rounds):
+        func()
+    return (time.time() - start_time) / rounds
+
+
+# the plugins which `obd cluster restart` dispatches for each component of a deployment
+RESTART_COMPONENTS = [
+    ('oceanbase', '4.2.1.0'),
+    ('obproxy-ce', '4.2.1'),
+    ('obagent', '4.2.2'),
+    ('prometheus', '2.37.1'),
+    ('grafana', '7.5.17'),
+    ('ocp-express', '4.2.2'),
+]
+RESTART_PLUGINS = [
+    'restart_pre', 'status', 'stop', 'start_check_pre', 'start_pre', 'start', 'health_check', 'connect', 'reload', 'display'
+]
+# dispatch overhead of one restart, in seconds
+PLUGIN_DISPATCH_BUDGET = 0.015
+
+
+@benchmark
+def plugin_dispatch(rounds=20):
+    """
+    Look up, import and export every plugin which a restart of a six-component deployment calls, as the plugin
+    calls do, without running the plugins themselves. The first restart compiles the plugin sources.
+    """
+    from _plugin import PluginManager
+
+    home_path = tempfile.mkdtemp()
+    try:
+        os.symlink(os.path.join(SOURCE_PATH, PluginManager.RELATIVE_PATH), os.path.join(home_path, PluginManager.RELATIVE_PATH))
+
+        def restart():
+            # every obd command, and every request of obd web, works with a new plugin manager
+            manager = PluginManager(home_path)
+            for component, version in RESTART_COMPONENTS:
+                for name in RESTART_PLUGINS:
+                    plugin = manager.get_best_py_script_plugin(name, component, version)
+                    if plugin:
+                        plugin._import()
+                        plugin._export()
+                        count[0] += 1
+
+        count = [0]
+        first = timeit(restart, 1)
+        cost = timeit(restart, rounds)
+    finally:
+        shutil.rmtree(home_path)
+    print('plugin_dispatch: %d plugins, first restart %.1fms, next restarts %.1fms' % (count[0] // (rounds + 1), first * 1000, cost * 1000))
+    return cost <= PLUGIN_DISPATCH_BUDGET
+
+
+# obd log lines, most of them have no secret and only a few reach the masking rules
+LOG_MASKING_CORPUS = [
+    "[2025-06-12 10:21:33.512] [INFO] Get local repositories and plugins ok",
+    "[2025-06-12 10:21:33.874] [DEBUG] - host: 10.0.0.11, port: 22, user: admin, password: ",
+    "[2025-06-12 10:21:34.102] [DEBUG] -- admin@10.0.0.11 execute: cat /home/admin/observer/run/observer.pid ",
+    "[2025-06-12 10:21:34.130] [DEBUG] -- exited code 0",
+    "[2025-06-12 10:21:34.522] [DEBUG] - connect 10.0.0.11 -P2881 -uroot -p'Pa55w0rd!'",
+    "[2025-06-12 10:21:35.010] [DEBUG] - execute sql: alter user root IDENTIFIED BY 'Pa55w0rd!'",
+    "[2025-06-12 10:21:35.377] [DEBUG] - start ocp-express with access_id=ak123&access_key=sk456",
+    "[2025-06-12 10:21:35.801] [DEBUG] - cluster_config: {'root_password': 'Pa55w0rd!', 'mysql_port': 2881}",
+    "[2025-06-12 10:21:36.015] [DEBUG] -- admin@10.0.0.12 execute: echo 'admin:Pa55w0rd!' | sudo -S chpasswd ",
+    "[2025-06-12 10:21:36.202] [INFO] Check before start observer ok",
+    "[2025-06-12 10:21:36.640] [DEBUG] - obd host init admin 10.0.0.11 -p Pa55w0rd!",
+    "[2025-06-12 10:21:37.011] [DEBUG] - observer program health check ok",
+]
+# masking cost of one log line, in seconds
+LOG_MASKING_BUDGET = 0.00002
+
+
+@benchmark
+def log_masking(rounds=2000):
+    """
+    Mask the corpus as IO.log does for every line it writes.
+    """
+    from _stdio import LOG_MASKING
+
+    def mask():
+        for line in LOG_MASKING_CORPUS:
+            LOG_MASKING.mask(line)
+
+    cost = timeit(mask, rounds) / len(LOG_MASKING_CORPUS)
+    print('log_masking: %d lines, %.2fus per line' % (len(LOG_MASKING_CORPUS), cost * 1000000))
+    return cost <= LOG_MASKING_BUDGET
+
+
+# the modules which the obd CLI must not import before a command needs them
+STARTUP_DEFERRED_MODULES = ['core', 'ssh', 'paramiko', 'pymysql', 'Crypto', 'requests']
+# import time of the obd CLI, in seconds
+STARTUP_BUDGET = 0.3
+STARTUP_SCRIPT = '''
+import sys, time
+start_time = time.time()
+import _cmd
+print(time.time() - start_time)
+print(' '.join([name for name in %r if name in sys.modules]))
+'''
+
+
+@benchmark
+def startup(rounds=5):
+    """
+    Import _cmd in a new interpreter, as every obd command does before parsing its arguments.
+    The best of `rounds` runs is taken, and the deferred modules must not be imported.
+    """
+    costs = []
+    loaded = ''
+    for _ in range(rounds):
+        output = subprocess.check_output([sys.executable, '-c', STARTUP_SCRIPT % STARTUP_DEFERRED_MODULES], cwd=SOURCE_PATH)
+        lines = output.decode().split('\n')
+        costs.append(float(lines[0]))
+        loaded = lines[1].strip()
+    cost = min(costs)
+    print('startup: import _cmd %.1fms%s' % (cost * 1000, ', loaded %s' % loaded if loaded else ''))
+    return cost <= STARTUP_BUDGET and not loaded
+
+
+# dispatch cost of one attribute access, one call of each method and one construction, in seconds
+SAFE_STDIO_DISPATCH_BUDGET = 0.00001
+
+
+@benchmark
+def safe_stdio_dispatch(rounds=200000):
+    """
+    Access an attribute, call a method without stdio and `execute_command` with the stdio of the object, and create
+    the object, on a SafeStdio class which stands for SshClient without its connection.
+    """
+    from _stdio import SafeStdio
+
+    class Client(SafeStdio):
+
+        def __init__(self, config, stdio=None):
+            self.config = config
+            self.stdio = stdio
+
+        def is_local(self):
+            return False
+
+        def execute_command(self, command, timeout=None, stdio=None):
+            return stdio
+
+    client = Client('config')
+    costs = [
+        ('attribute access', timeit(lambda: client.config, rounds)),
+        ('method without stdio', timeit(lambda: client.is_local(), rounds)),
+        ('execute_command', timeit(lambda: client.execute_command('echo'), rounds)),
+        ('construction', timeit(lambda: Client('config'), rounds // 10)),
+    ]
+    print('safe_stdio_dispatch: %s' % ', '.join(['%s %.2fus' % (name, cost * 1000000) for name, cost in costs]))
+    return sum(cost for _, cost in costs) <= SAFE_STDIO_DISPATCH_BUDGET
+
+
+# the versions in a mirror: {component: (major versions, patches of each, releases of each patch)}
+MIRROR_COMPONENTS = {
+    'oceanbase-ce': (['3.1', '4.0.0', '4.1.0', '4.2.0', '4.2.1', '4.2.2', '4.2.5', '4.3.0', '4.3.5'], 12, 4),
+    'oceanbase-ce-libs': (['3.1', '4.0.0', '4.1.0', '4.2.0', '4.2.1', '4.2.2', '4.2.5', '4.3.0', '4.3.5'], 12, 4),
+    'obproxy-ce': (['3.2', '4.0.0', '4.1.0', '4.2.0', '4.2.1', '4.2.3', '4.3.0'], 10, 3),
+    'obagent': (['1.2', '1.3', '4.2.0', '4.2.1', '4.2.2'], 8, 2),
+    'ocp-express': (['1.0', '4.2.0', '4.2.1', '4.2.2'], 8, 2),
+    'obclient': (['2.0', '2.2', '2.2.1', '2.2.4'], 8, 2),
+}
+MIRROR_ARCHS = ['x86_64', 'aarch64']
+# sort, filter and plugin resolution cost of one round, in seconds
+VERSION_MATCHING_BUDGET = 0.1
+
+
+@benchmark
+def version_matching(rounds=3):
+    """
+    Sort the package list of a mirror, filter it by the version conditions of match_score,
+    and resolve the best version of every plugin file of every plugin version through a new PluginIndex.
+    """
+    import random
+    from _rpm import PackageInfo
+    from _mirror import LocalMirrorRepository
+    from _plugin import PluginIndex
+
+    infos = []
+    for name, (majors, patches, releases) in MIRROR_COMPONENTS.items():
+        for major in majors:
+            for patch in range(patches):
+                for release in range(releases):
+                    for arch in MIRROR_ARCHS:
+                        version = '%s.%s' % (major, patch)
+                        md5 = '%s-%s-%s-%s' % (name, version, release, arch)
+                        infos.append(PackageInfo(name, version, '%s%08d.el7' % (release + 1, patch * 10000 + release), arch, md5, 0))
+    random.Random(0).shuffle(infos)
+
+    plugin_path = os.path.join(SOURCE_PATH, 'plugins')
+    plugin_files = []
+    for component in os.listdir(plugin_path):
+        component_path = os.path.join(plugin_path, component)
+        if os.path.isdir(component_path):
+            for version in os.listdir(component_path):
+                if os.path.isdir(os.path.join(component_path, version)):
+                    for file_name in os.listdir(os.path.join(component_path, version)):
+                        plugin_files.append((component, file_name, version))
+
+    def match():
+        for info in infos:
+            mirror.match_score(info, info.name, ['x86_64', 'noarch'], min_version='4.0.0.0', max_version='4.3.0.0')
+
+    def resolve():
+        index = PluginIndex(plugin_path)
+        for component, file_name, version in plugin_files:
+            index.get_best_version(component, file_name, version)
+
+    mirror_path = tempfile.mkdtemp()
+    try:
+        mirror = LocalMirrorRepository(mirror_path)
+        costs = [
+            ('sort', timeit(lambda: sorted(infos), rounds)),
+            ('match_score', timeit(match, rounds)),
+            ('plugin resolution', timeit(resolve, rounds)),
+        ]
+    finally:
+        shutil.rmtree(mirror_path)
+    print('version_matching: %d packages, %d plugin files, %s' % (
+        len(infos), len(plugin_files), ', '.join(['%s %.1fms' % (name, cost * 1000) for name, cost in costs])))
+    return sum(cost for _, cost in costs) <= VERSION_MATCHING_BUDGET
+
+
+def main(names):
+    names = names or sorted(BENCHMARKS)
+    failed = []
+    for name in names:
+        if name not in BENCHMARKS:
+            print('no such benchmark: %s' % name)
+            failed.append(name)
+        elif not BENCHMARKS[name]():
+            print('%s is over its budget' % name)
+            failed.append(name)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, SOURCE_PATH)
+    sys.exit(main(sys.argv[1:]))
@@ -28,15 +28,20 @@ import getpass
 from uuid import uuid1 as uuid, UUID
 from optparse import OptionParser, BadOptionError, Option, IndentedHelpFormatter
 
+import _environ as ENV
+# installed before the other obd modules are imported, so that all of them are recorded
+if __name__ == '__main__' and os.environ.get(ENV.ENV_PROFILE_STARTUP) == '1':
+    import atexit
+    from _importtime import ImportTimeProfiler
+    atexit.register(ImportTimeProfiler().install().report)
+
 import const
-from core import ObdHome
+# core and ssh pull in paramiko, requests and all the managers, they are imported on first use
 from _stdio import IO, FormatText
 from _lock import LockMode
 from _types import Capacity
 from tool import DirectoryUtil, FileUtil, NetUtil, COMMAND_ENV
 from _errno import DOC_LINK_MSG, LockError
-import _environ as ENV
-from ssh import LocalClient
 from const import (
     CONST_OBD_HOME,
     VERSION, REVISION, BUILD_BRANCH, BUILD_TIME, FORBIDDEN_VARS, COMP_OB_CE, COMP_ODP_CE, COMP_ODP, COMP_OCP_SERVER_CE, COMP_OB_STANDALONE,
@@ -304,6 +309,7 @@ If you want to view detailed obd logs, please run: obd display-trace {trace_id}'
             else:
                 ROOT_IO.verbose('cmd: %s' % self.cmds)
             ROOT_IO.verbose('opts: %s' % self.opts)
+            from core import ObdHome
             obd = ObdHome(home_path=self.OBD_PATH, dev_mode=self.dev_mode, lock_mode=self.lock_mode, stdio=ROOT_IO)
             obd.set_options(self.opts)
             obd.set_cmds(self.cmds)
@@ -766,6 +772,7 @@ class ClusterMirrorCommand(ObdCommand):
     def background_telemetry_task(self, obd, demploy_name=None):
         if demploy_name is None:
             demploy_name = self.cmds[0]
+        from ssh import LocalClient
         data = json.dumps(self.get_obd_namespaces_data(obd))
         LocalClient.execute_command_background("nohup obd telemetry post %s --data='%s' >/dev/null 2>&1 &" % (demploy_name, data))
 
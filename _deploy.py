@@ -19,6 +19,7 @@ from collections.abc import Iterable, Iterator
 import os
 import re
 import sys
+import json
 import getpass
 import hashlib
 from copy import deepcopy
@@ -479,8 +480,67 @@ class DefaultConfigParser(ConfigParser):
         return conf
 
 
+IMMUTABLE_CONF_TYPES = (str, bytes, int, float, bool, type(None))
+
+
+def copy_conf(conf, memo=None):
+    """
+    Copy a config dict like deepcopy, but the values of immutable types are shared instead of copied.
+    """
+    if conf is None:
+        return None
+    conf = conf.copy()
+    for key in conf:
+        if not isinstance(conf[key], IMMUTABLE_CONF_TYPES):
+            conf[key] = deepcopy(conf[key], memo)
+    return conf
+
+
+class ConfSnapshot(object):
+
+    """
+    A config dict which is never changed in place once built, such as the defaults of the parameter template.
+    It is shared by the copies of a cluster config, and copy() only deep copies the container values,
+    which are kept as builtin dicts and lists because copying the yaml containers is much slower.
+    """
+
+    def __init__(self, conf=None):
+        self._conf = conf if conf is not None else {}
+        self._mutable_keys = [key for key in self._conf if not isinstance(self._conf[key], IMMUTABLE_CONF_TYPES)]
+        for key in self._mutable_keys:
+            self._conf[key] = self._to_builtin(self._conf[key])
+
+    @classmethod
+    def _to_builtin(cls, value):
+        if isinstance(value, dict):
+            return {key: cls._to_builtin(value[key]) for key in value}
+        if isinstance(value, list):
+            return [cls._to_builtin(item) for item in value]
+        return value
+
+    def __contains__(self, key):
+        return key in self._conf
+
+    def __len__(self):
+        return len(self._conf)
+
+    def get(self, key, default=None):
+        return self._conf.get(key, default)
+
+    def copy(self):
+        conf = dict(self._conf)
+        for key in self._mutable_keys:
+            conf[key] = deepcopy(conf[key])
+        return conf
+
+
 class ClusterConfig(object):
 
+    """
+    The config of a component is resolved in layers: defaults -> include -> global -> server, then formatted by the parameter template.
+    The defaults come from the parameter template and are kept in ConfSnapshot, so they are shared by every copy of the cluster config.
+    """
+
     def __init__(self, servers, name, version, tag, release, package_hash, comp_type, image_name, parser=None):
         if comp_type == 'docker':
             version = Version('1.0.0')
@@ -500,8 +560,8 @@ class ClusterConfig(object):
         self.origin_package_hash = package_hash
         self._package_hash = package_hash
         self._temp_conf = {}
-        self._all_default_conf = {}
-        self._default_conf = {}
+        self._all_default_conf = ConfSnapshot()
+        self._default_conf = ConfSnapshot()
         self._global_conf = None
         self._server_conf = {}
         self._cache_server = {}
@@ -573,13 +633,21 @@ class ClusterConfig(object):
         return True
 
     def __deepcopy__(self, memo):
-        cluster_config = self.__class__(deepcopy(self.servers), self.name, self.version, self.tag, self.release, self.package_hash, self.image_name, self.parser)
-        copy_attrs = ['origin_tag', 'origin_version', 'origin_package_hash', 'parser', 'added_servers']
-        deepcopy_attrs = ['_temp_conf', '_all_default_conf', '_default_conf', '_global_conf', '_server_conf', '_cache_server', '_original_global_conf', '_depends', '_original_servers', '_inner_config']
+        cluster_config = self.__class__(self.servers, self.name, self.version, self.tag, self.release, self.package_hash, self.comp_type, self.image_name, self.parser)
+        memo[id(self)] = cluster_config
+        # the parameter template and the defaults are never changed in place, so they are shared
+        copy_attrs = ['origin_tag', 'origin_version', 'origin_package_hash', 'parser', 'added_servers', '_temp_conf', '_all_default_conf', '_default_conf']
+        deepcopy_attrs = ['_depends', '_inner_config']
         for attr in copy_attrs:
             setattr(cluster_config, attr, getattr(self, attr))
         for attr in deepcopy_attrs:
-            setattr(cluster_config, attr, deepcopy(getattr(self, attr)))
+            setattr(cluster_config, attr, deepcopy(getattr(self, attr), memo))
+        cluster_config._original_servers = list(self._original_servers)
+        cluster_config._global_conf = copy_conf(self._global_conf, memo)
+        cluster_config._original_global_conf = copy_conf(self._original_global_conf, memo)
+        for server in self._server_conf:
+            cluster_config._server_conf[server] = copy_conf(self._server_conf[server], memo)
+            cluster_config._cache_server[server] = copy_conf(self._cache_server.get(server), memo)
         return cluster_config
 
     def set_deploy_config(self, _deploy_config):
@@ -711,7 +779,7 @@ class ClusterConfig(object):
             config = cluster_config.get_server_conf_with_default(server) if server else cluster_config.get_global_conf_with_default()
         else:
             config = cluster_config.get_server_conf(server) if server else cluster_config.get_global_conf()
-        return deepcopy(config)
+        return copy_conf(config)
 
     def get_be_depend_config(self, name, server=None, with_default=True):
         if name not in self._be_depends:
@@ -721,7 +789,7 @@ class ClusterConfig(object):
             config = cluster_config.get_server_conf_with_default(server) if server else cluster_config.get_global_conf_with_default()
         else:
             config = cluster_config.get_server_conf(server) if server else cluster_config.get_global_conf()
-        return deepcopy(config)
+        return copy_conf(config)
 
     def update_server_conf(self, server, key, value, save=True):
         if self._deploy_config is None:
@@ -787,7 +855,7 @@ class ClusterConfig(object):
     def get_server_conf_with_default(self, server):
         if server not in self._server_conf:
             return None
-        config = deepcopy(self._all_default_conf)
+        config = self._all_default_conf.copy()
         server_config = self.get_server_conf(server)
         if server_config:
             config.update(server_config)
@@ -824,14 +892,16 @@ class ClusterConfig(object):
         return items
         
     def update_temp_conf(self, temp_conf):
-        self._default_conf = {}
-        self._all_default_conf = {}
+        default_conf = {}
+        all_default_conf = {}
         self._temp_conf = temp_conf
         for key in self._temp_conf:
             if self._temp_conf[key].require and self._temp_conf[key].default is not None:
-                self._default_conf[key] = self._temp_conf[key].default
+                default_conf[key] = self._temp_conf[key].default
             if self._temp_conf[key].default is not None:
-                self._all_default_conf[key] = self._temp_conf[key].default
+                all_default_conf[key] = self._temp_conf[key].default
+        self._default_conf = ConfSnapshot(default_conf)
+        self._all_default_conf = ConfSnapshot(all_default_conf)
         self._global_conf = None
         self._unprocessed_global_conf = None
         self._clear_cache_server()
@@ -870,7 +940,7 @@ class ClusterConfig(object):
         if self._temp_conf:
             global_config = self._get_unprocessed_global_conf()
             for server in self._server_conf:
-                config = deepcopy(self._server_conf[server])
+                config = copy_conf(self._server_conf[server])
                 config.update(global_config)
                 errors, items = self._check_param(config)
                 check_res[server] = {'errors': errors, 'items': items}
@@ -892,7 +962,7 @@ class ClusterConfig(object):
     def set_global_conf(self, conf):
         if not isinstance(conf, dict):
             raise Exception('%s global config is not a dictionary. Please check the syntax of your configuration file.\n See https://github.com/oceanbase/obdeploy/blob/master/docs/zh-CN/4.configuration-file-description.md' % self.name)
-        self._original_global_conf = deepcopy(conf)
+        self._original_global_conf = copy_conf(conf)
         self._global_conf = None
         self._clear_cache_server()
 
@@ -922,7 +992,7 @@ class ClusterConfig(object):
 
     def _get_unprocessed_global_conf(self):
         if self._unprocessed_global_conf is None:
-            self._unprocessed_global_conf = deepcopy(self._default_conf)
+            self._unprocessed_global_conf = self._default_conf.copy()
             self._unprocessed_global_conf.update(self._get_include_config('config', {}))
             if self._original_global_conf:
                 self._unprocessed_global_conf.update(self._original_global_conf)
@@ -940,7 +1010,7 @@ class ClusterConfig(object):
         return self._receivers_conf.get(key)
 
     def get_global_conf_with_default(self):
-        config = deepcopy(self._all_default_conf)
+        config = self._all_default_conf.copy()
         config.update(self.get_global_conf())
         return config
 
@@ -1043,7 +1113,7 @@ class ClusterConfig(object):
 
     def _get_unprocessed_server_conf(self, server):
         if server not in self._unprocessed_server_conf:
-            conf = deepcopy(self._inner_config.get(server.name, {}))
+            conf = copy_conf(self._inner_config.get(server.name, {}))
             conf.update(self._get_unprocessed_global_conf())
             conf.update(self._server_conf[server])
             self._unprocessed_server_conf[server] = conf
@@ -1057,17 +1127,17 @@ class ClusterConfig(object):
         return self._cache_server[server]
 
     def get_original_global_conf(self, format_conf=False):
-        conf = deepcopy(self._original_global_conf)
+        conf = copy_conf(self._original_global_conf)
         format_conf and self._apply_temp_conf(conf)
         return conf
 
     def get_original_server_conf(self, server, format_conf=False):
-        conf = deepcopy(self._server_conf.get(server))
+        conf = copy_conf(self._server_conf.get(server))
         format_conf and self._apply_temp_conf(conf)
         return conf
 
     def get_original_server_conf_with_global(self, server, format_conf=False):
-        config = deepcopy(self.get_original_global_conf())
+        config = self.get_original_global_conf()
         config.update(self._server_conf.get(server, {}))
         format_conf and self._apply_temp_conf(config)
         return config
@@ -1151,9 +1221,22 @@ class DeployConfig(SafeStdio):
         self._auto_decrypt_password()
 
     def __deepcopy__(self, memo):
-        deploy_config = self.__class__(self.yaml_path, self.yaml_loader, self._inner_config, self.config_parser_manager, self.stdio)
+        # copy the loaded config instead of loading the yaml file again
+        deploy_config = self.__class__.__new__(self.__class__)
+        deploy_config.__dict__.update(self.__dict__)
+        memo[id(self)] = deploy_config
+        deploy_config._src_data = deepcopy(self._src_data)
+        deploy_config._user = deepcopy(self._user)
+        deploy_config._added_components = list(self._added_components)
+        deploy_config._changed_components = list(self._changed_components)
+        deploy_config._removed_components = set(self._removed_components)
+        deploy_config.components = OrderedDict()
         for component_name in self.components:
-            deploy_config.components[component_name] = deepcopy(self.components[component_name])
+            deploy_config.components[component_name] = deepcopy(self.components[component_name], memo)
+        for component_name in deploy_config.components:
+            cluster_config = deploy_config.components[component_name]
+            for depend in cluster_config.depends:
+                cluster_config._depends[depend]._be_depends[component_name] = cluster_config
         return deploy_config
 
     def set_undumpable(self):
@@ -1779,9 +1862,10 @@ class Deploy(object):
     INNER_CONFIG_NAME = 'inner_config.yaml'
     UPRADE_META_NAME = '.upgrade'
 
-    def __init__(self, config_dir, config_parser_manager=None, stdio=None):
+    def __init__(self, config_dir, config_parser_manager=None, stdio=None, catalog=None):
         self.config_dir = config_dir
         self.name = os.path.split(config_dir)[1]
+        self.catalog = catalog
         self._info = None
         self._config = None
         self.stdio = stdio
@@ -1915,6 +1999,7 @@ class Deploy(object):
                     'create_date': self.deploy_info.create_date,
                 }
                 yaml.dump(data, f)
+            self.catalog and self.catalog.update(self)
             return True
         except:
             self.stdio and getattr(self.stdio, 'exception', print)('dump deploy info to %s failed' % path)
@@ -2077,6 +2162,90 @@ class ConfigParserManager(Manager):
         return parser
 
 
+class DeployCatalog(object):
+
+    """
+    The name, status and components of every deployment, kept in one file under the cluster directory,
+    so the deploy list does not parse the .data of each deployment.
+    It is updated when a deploy info is dumped. An entry is used only if the mtime of the .data is unchanged,
+    so the deployments changed without the catalog are loaded from their .data again.
+    """
+
+    FILE_NAME = '.catalog'
+
+    def __init__(self, path, stdio=None):
+        self.path = path
+        self.catalog_path = os.path.join(path, self.FILE_NAME)
+        self.stdio = stdio
+        self.entries = {}
+
+    def load(self):
+        try:
+            with open(self.catalog_path, 'r') as f:
+                self.entries = json.load(f)
+        except:
+            self.entries = {}
+        return self.entries
+
+    def dump(self):
+        tmp_path = '%s.%s' % (self.catalog_path, os.getpid())
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(self.entries, f)
+            os.rename(tmp_path, self.catalog_path)
+            return True
+        except:
+            self.stdio and getattr(self.stdio, 'exception', print)('dump deploy catalog to %s failed' % self.catalog_path)
+            FileUtil.rm(tmp_path)
+        return False
+
+    @staticmethod
+    def _get_mtime(deploy):
+        try:
+            return os.stat(Deploy.get_deploy_file_path(deploy.config_dir)).st_mtime
+        except OSError:
+            return None
+
+    def get_deploy_info(self, deploy):
+        entry = self.entries.get(deploy.name)
+        if not entry or entry['mtime'] is None or entry['mtime'] != self._get_mtime(deploy):
+            return None
+        return DeployInfo(
+            deploy.name,
+            getattr(DeployStatus, entry['status'], DeployStatus.STATUS_CONFIGURED),
+            OrderedDict(entry['components']),
+            getattr(DeployConfigStatus, entry['config_status'], DeployConfigStatus.UNCHNAGE),
+            entry['create_date'],
+        )
+
+    def set_deploy_info(self, deploy):
+        deploy_info = deploy.deploy_info
+        entry = {
+            'status': deploy_info.status.name,
+            'config_status': deploy_info.config_status.name,
+            'components': OrderedDict([(name, dict(deploy_info.components[name])) for name in deploy_info.components]),
+            'create_date': deploy_info.create_date,
+            'mtime': self._get_mtime(deploy),
+        }
+        if self.entries.get(deploy.name) == entry:
+            return False
+        self.entries[deploy.name] = entry
+        return True
+
+    def update(self, deploy):
+        # load the catalog again to keep the entries updated by the other processes
+        self.load()
+        self.set_deploy_info(deploy)
+        return self.dump()
+
+    def remove(self, name):
+        self.load()
+        if name in self.entries:
+            del self.entries[name]
+            return self.dump()
+        return True
+
+
 class DeployManager(Manager):
 
     RELATIVE_PATH = 'cluster/'
@@ -2085,6 +2254,7 @@ class DeployManager(Manager):
         super(DeployManager, self).__init__(home_path, stdio)
         self.lock_manager = lock_manager
         self.config_parser_manager = ConfigParserManager(home_path, stdio)
+        self.catalog = DeployCatalog(self.path, stdio)
 
     def _lock(self, name, read_only=False):
         if self.lock_manager:
@@ -2096,18 +2266,32 @@ class DeployManager(Manager):
 
     def get_deploy_configs(self, read_only=True):
         configs = []
+        changed = False
+        entries = self.catalog.load()
         for name in os.listdir(self.path):
             path = os.path.join(self.path, name)
             if os.path.isdir(path):
                 self._lock(name, read_only)
-                configs.append(Deploy(path, config_parser_manager=self.config_parser_manager, stdio=self.stdio))
+                deploy = Deploy(path, config_parser_manager=self.config_parser_manager, stdio=self.stdio, catalog=self.catalog)
+                deploy_info = self.catalog.get_deploy_info(deploy)
+                if deploy_info:
+                    deploy._info = deploy_info
+                elif self.catalog.set_deploy_info(deploy):
+                    changed = True
+                configs.append(deploy)
+        names = set([deploy.name for deploy in configs])
+        for name in list(entries.keys()):
+            if name not in names:
+                del entries[name]
+                changed = True
+        changed and self.catalog.dump()
         return configs
 
     def get_deploy_config(self, name, read_only=False):
         self._lock(name, read_only)
         path = os.path.join(self.path, name)
         if os.path.isdir(path):
-            return Deploy(path, config_parser_manager=self.config_parser_manager, stdio=self.stdio)
+            return Deploy(path, config_parser_manager=self.config_parser_manager, stdio=self.stdio, catalog=self.catalog)
         return None
 
     def create_deploy_config(self, name, src_yaml_path):
@@ -2116,7 +2300,7 @@ class DeployManager(Manager):
         target_src_path = Deploy.get_deploy_yaml_path(config_dir)
         self._mkdir(config_dir)
         if FileUtil.copy(src_yaml_path, target_src_path, self.stdio):
-            return Deploy(config_dir, config_parser_manager=self.config_parser_manager, stdio=self.stdio)
+            return Deploy(config_dir, config_parser_manager=self.config_parser_manager, stdio=self.stdio, catalog=self.catalog)
         else:
             self._rm(config_dir)
             return None
@@ -2125,3 +2309,4 @@ class DeployManager(Manager):
         self._lock(name)
         config_dir = os.path.join(self.path, name)
         self._rm(config_dir)
+        self.catalog.remove(name)
@@ -33,8 +33,37 @@ ENV_REPO_INSTALL_MODE = "OBD_REPO_INSTALL_MODE"
 # disable rsync mode even if the rsync exists. {0/1}
 ENV_DISABLE_RSYNC = "OBD_DISABLE_RSYNC"
 
+# disable the tar stream transfer of directories even if the remote tar exists. {0/1}
+ENV_DISABLE_TAR_TRANSFER = "OBD_DISABLE_TAR_TRANSFER"
+
+# compress the tar stream of directory transfer. {none/zstd}. default none
+ENV_TAR_TRANSFER_COMPRESS = "OBD_TAR_TRANSFER_COMPRESS"
+
+# the number of ssh connections opened at the same time. default 32
+ENV_SSH_CONNECT_WORKERS = "OBD_SSH_CONNECT_WORKERS"
+
+# the number of hosts which every host having a repository forwards it to. default 0 - obd sends the repository to every host itself.
+# The hosts forward the repository by http servers without authentication, bound to their addresses on random ports: anyone on
+# the network who learns the random path in the urls may download the repository until the distribution is over.
+ENV_REPO_DISTRIBUTE_FANOUT = "OBD_REPO_DISTRIBUTE_FANOUT"
+
+# forward the repository between hosts only when it is installed to at least so many hosts. default 8
+ENV_REPO_DISTRIBUTE_MIN_HOSTS = "OBD_REPO_DISTRIBUTE_MIN_HOSTS"
+
+# run the plugins of independent components in the same workflow stage at the same time. {0/1}
+ENV_CONCURRENT_STAGE = "OBD_CONCURRENT_STAGE"
+
+# the number of http range connections used to download a package. default 4
+ENV_DOWNLOAD_CONNECTIONS = "OBD_DOWNLOAD_CONNECTIONS"
+
+# print the time spent on importing each obd module when obd exits. {0/1}. Only read from the process environment.
+ENV_PROFILE_STARTUP = "OBD_PROFILE_STARTUP"
+
 ENV_DISABLE_PARALLER_EXTRACT = "OBD_DISALBE_PARALLER_EXTRACT"
 
+# Disable single-pass stream extraction of rpm payloads. {0/1} 0 - stream extraction is used by default. 1 - fall back to the chunked extractors.
+ENV_DISABLE_STREAM_EXTRACT = "OBD_DISABLE_STREAM_EXTRACT"
+
 # telemetry mode. 0 - disable, 1 - enable.
 ENV_TELEMETRY_MODE = "TELEMETRY_MODE"
 
@@ -68,3 +97,12 @@ ENV_CUSTOM_CLUSTER_ID = "CUSTOM_CLUSTER_ID"
 
 # obdeploy web type
 ENV_OBD_WEB_TYPE = "OBD_WEB_TYPE"
+
+# obd web task worker threads. default 8
+ENV_WEB_TASK_WORKERS = "OBD_WEB_TASK_WORKERS"
+
+# seconds to keep the status of a finished obd web task. default 86400
+ENV_WEB_TASK_TTL = "OBD_WEB_TASK_TTL"
+
+# keep obd web task status on disk to survive a restart. {0/1} 0 - disable, 1 - enable. default 1
+ENV_WEB_TASK_JOURNAL = "OBD_WEB_TASK_JOURNAL"
@@ -0,0 +1,95 @@
+# coding: utf-8
+# Copyright (c) 2025 OceanBase.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import, division, print_function
+
+import os
+import sys
+import time
+
+try:
+    import builtins
+except ImportError:
+    import __builtin__ as builtins
+
+
+class ImportTimeProfiler(object):
+
+    """
+    Record the time spent on imports, like `python -X importtime`, but aggregated per obd module:
+    the time of a third-party module is charged to the nearest obd module which imports it.
+    Only the standard library may be used here, it is installed before any other import.
+    """
+
+    def __init__(self, source_path=None):
+        self.source_path = os.path.abspath(source_path or os.path.dirname(__file__))
+        self.start_time = time.time()
+        self.stack = []
+        self.records = {}
+        self._import = None
+
+    def install(self):
+        if self._import is None:
+            self._import = builtins.__import__
+            builtins.__import__ = self._profile_import
+        return self
+
+    def uninstall(self):
+        if self._import is not None:
+            builtins.__import__ = self._import
+            self._import = None
+
+    def _is_obd_module(self, name):
+        module = sys.modules.get(name)
+        path = getattr(module, '__file__', None)
+        return bool(path) and os.path.abspath(path).startswith(self.source_path)
+
+    def _owner(self, name):
+        if self._is_obd_module(name):
+            return name
+        for frame in reversed(self.stack):
+            if self._is_obd_module(frame[0]):
+                return frame[0]
+        return '__main__'
+
+    def _profile_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            return self._import(name, globals, locals, fromlist, level)
+        # [module name, time spent on nested imports]
+        frame = [name, 0]
+        self.stack.append(frame)
+        start_time = time.time()
+        try:
+            return self._import(name, globals, locals, fromlist, level)
+        finally:
+            cost = time.time() - start_time
+            self.stack.pop()
+            if self.stack:
+                self.stack[-1][1] += cost
+            owner = self._owner(name)
+            record = self.records.setdefault(owner, {'self': 0, 'imports': set()})
+            record['self'] += cost - frame[1]
+            if owner != name:
+                record['imports'].add(name.split('.')[0])
+
+    def report(self, stream=None, limit=30):
+        stream = stream or sys.stderr
+        total = time.time() - self.start_time
+        records = sorted(self.records.items(), key=lambda x: x[1]['self'], reverse=True)
+        stream.write('obd startup: %.3fs\n' % total)
+        stream.write('%-24s %10s  %s\n' % ('module', 'import(ms)', 'third-party imports'))
+        for name, record in records[:limit]:
+            stream.write('%-24s %10.1f  %s\n' % (name, record['self'] * 1000, ', '.join(sorted(record['imports']))))
+        stream.flush()
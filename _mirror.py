@@ -19,12 +19,17 @@ from __future__ import absolute_import, division, print_function
 import re
 import os
 import sys
+import json
+import hashlib
 import tempfile
 import time
 import pickle
+import sqlite3
 import string
 import fcntl
 import requests
+from threading import RLock, Lock
+from multiprocessing.pool import ThreadPool
 from glob import glob
 from enum import Enum
 from copy import deepcopy
@@ -42,7 +47,8 @@ from _arch import getBaseArch, getArchList
 from _rpm import Version, Package, PackageInfo
 from tool import ConfigUtil, FileUtil, var_replace
 from _manager import Manager
-from tool import timeout
+from tool import timeout, COMMAND_ENV
+from _environ import ENV_DOWNLOAD_CONNECTIONS
 
 _ARCH = getArchList()
 basearch = getBaseArch()
@@ -142,7 +148,7 @@ class MirrorRepository(SafeStdio):
                 return None
         return pkg
 
-    def get_rpm_pkg_by_info(self, pkg_info):
+    def get_rpm_pkg_by_info(self, pkg_info, progress=True):
         return None
     
     def get_pkgs_info(self, **pattern):
@@ -168,6 +174,328 @@ class MirrorRepository(SafeStdio):
         return pkgs
 
 
+class PackageIndex(object):
+
+    """
+    On-disk package index of a mirror, kept in sqlite.
+    Packages are keyed by md5 and indexed by name/arch. The version is stored as a
+    pre-parsed sortable key so that version conditions can be evaluated by sqlite.
+    The package object itself is pickled and only loaded for the matched rows.
+    """
+
+    __VERSION__ = Version("1.0")
+
+    def __init__(self, path, stdio=None):
+        self.path = path
+        self.stdio = stdio
+        self._conn = None
+        self._lock = RLock()
+
+    @staticmethod
+    def version_key(version):
+        # zero-padded numbers keep the order of Version.__cmp_value__ in string comparison
+        return ''.join(['%020d%s\x00' % (_i, _s) for _i, _s in Version(str(version)).__cmp_value__])
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            with self._lock:
+                if self._conn is None:
+                    conn = sqlite3.connect(self.path, check_same_thread=False)
+                    conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+                    conn.execute('CREATE TABLE IF NOT EXISTS packages (md5 TEXT PRIMARY KEY, name TEXT, arch TEXT, version TEXT, release TEXT, version_key TEXT, data BLOB)')
+                    conn.execute('CREATE INDEX IF NOT EXISTS idx_name_arch ON packages (name, arch, version_key)')
+                    conn.commit()
+                    self._conn = conn
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def is_valid(self, source_path=None):
+        try:
+            if not os.path.exists(self.path):
+                return False
+            if source_path and os.stat(self.path).st_mtime <= os.stat(source_path).st_mtime:
+                return False
+            with self._lock:
+                row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (MirrorRepository.__VERSION_KEY__, )).fetchone()
+            return row is not None and not self.__VERSION__ > Version(row[0])
+        except:
+            self.stdio and getattr(self.stdio, 'exception', print)('')
+            return False
+
+    @classmethod
+    def _row(cls, info):
+        return (info.md5, info.name, info.arch, str(info.version), str(info.release), cls.version_key(info.version), pickle.dumps(info, protocol=2))
+
+    def rebuild(self, infos):
+        self.stdio and getattr(self.stdio, 'verbose', print)('build %s' % self.path)
+        with self._lock:
+            conn = self.conn
+            with conn:
+                conn.execute('DELETE FROM packages')
+                conn.executemany('INSERT OR REPLACE INTO packages VALUES (?, ?, ?, ?, ?, ?, ?)', (self._row(info) for info in infos))
+                conn.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', (MirrorRepository.__VERSION_KEY__, str(self.__VERSION__)))
+        return True
+
+    def put(self, info):
+        with self._lock:
+            with self.conn as conn:
+                conn.execute('INSERT OR REPLACE INTO packages VALUES (?, ?, ?, ?, ?, ?, ?)', self._row(info))
+        return True
+
+    def delete(self, md5):
+        with self._lock:
+            with self.conn as conn:
+                conn.execute('DELETE FROM packages WHERE md5 = ?', (md5, ))
+        return True
+
+    def _query(self, sql, args=()):
+        with self._lock:
+            rows = self.conn.execute(sql, args).fetchall()
+        return [pickle.loads(row[0]) for row in rows]
+
+    def get(self, md5):
+        infos = self._query('SELECT data FROM packages WHERE md5 = ?', (md5, ))
+        return infos[0] if infos else None
+
+    def all(self):
+        return self._query('SELECT data FROM packages')
+
+    def find(self, name=None, name_contains=None, archs=None, version=None, version_prefix=None,
+             min_version=None, min_version_included=True, max_version=None, max_version_included=False):
+        conditions = []
+        args = []
+        if name is not None:
+            conditions.append('name = ?')
+            args.append(name)
+        if name_contains is not None:
+            conditions.append('instr(name, ?) > 0')
+            args.append(name_contains)
+        if archs:
+            conditions.append('arch IN (%s)' % ', '.join(['?'] * len(archs)))
+            args += list(archs)
+        if version:
+            conditions.append('version_key = ?')
+            args.append(self.version_key(version))
+        if version_prefix:
+            conditions.append("substr(version || '.', 1, ?) = ?")
+            args += [len(version_prefix), version_prefix]
+        if min_version:
+            conditions.append('version_key %s ?' % ('>=' if min_version_included else '>'))
+            args.append(self.version_key(min_version))
+        if max_version:
+            conditions.append('version_key %s ?' % ('<=' if max_version_included else '<'))
+            args.append(self.version_key(max_version))
+        sql = 'SELECT data FROM packages'
+        if conditions:
+            sql += ' WHERE %s' % ' AND '.join(conditions)
+        return self._query(sql, args)
+
+
+class RangeDownloader(object):
+
+    """
+    Download a file with several HTTP Range connections.
+    Data is written to `save_path.part` and the finished segments are recorded in
+    `save_path.part.state`, so an interrupted download resumes from where it stopped.
+    The file is moved to `save_path` only after the checksum is verified.
+    """
+
+    PART_SUFFIX = '.part'
+    STATE_SUFFIX = '.part.state'
+    BUFFER_SIZE = 1 << 20
+    MIN_SEGMENT_SIZE = 8 << 20
+    CONNECTIONS = 4
+    RETRY = 3
+    TIMEOUT = (5, 60)
+    HASH_TYPES = {'sha': 'sha1'}
+
+    def __init__(self, url, save_path, checksum=None, connections=None, progress=True, stdio=None):
+        self.url = url
+        self.save_path = save_path
+        self.part_path = save_path + self.PART_SUFFIX
+        self.state_path = save_path + self.STATE_SUFFIX
+        self.checksum = checksum if checksum and checksum[0] and checksum[1] else None
+        if connections is None:
+            connections = int(COMMAND_ENV.get(ENV_DOWNLOAD_CONNECTIONS, self.CONNECTIONS))
+        self.connections = max(1, connections)
+        self.progress = progress
+        self.stdio = stdio
+        self.file_size = 0
+        self.segments = []
+        self._lock = Lock()
+        self._print_bar = False
+
+    def _probe(self):
+        with requests.get(self.url, stream=True, headers={'Range': 'bytes=0-0'}, timeout=self.TIMEOUT) as resp:
+            resp.raise_for_status()
+            content_range = resp.headers.get('Content-Range', '')
+            if resp.status_code == 206 and '/' in content_range:
+                total = content_range.split('/')[-1]
+                if total.isdigit():
+                    return int(total), True
+            return int(resp.headers.get('Content-Length', 0)), False
+
+    def _load_state(self):
+        try:
+            if os.path.exists(self.part_path) and os.path.exists(self.state_path):
+                with open(self.state_path, 'r') as f:
+                    state = json.load(f)
+                if state.get('url') == self.url and state.get('size') == self.file_size and os.path.getsize(self.part_path) == self.file_size:
+                    return state['segments']
+        except:
+            self.stdio and getattr(self.stdio, 'exception', print)('')
+        return None
+
+    def _dump_state(self):
+        with open(self.state_path, 'w') as f:
+            json.dump({'url': self.url, 'size': self.file_size, 'segments': self.segments}, f)
+
+    def _split(self):
+        num = max(1, min(self.connections, self.file_size // self.MIN_SEGMENT_SIZE))
+        size = self.file_size // num
+        segments = []
+        for i in range(num):
+            start = i * size
+            end = self.file_size - 1 if i == num - 1 else start + size - 1
+            # [start, end, downloaded]
+            segments.append([start, end, 0])
+        return segments
+
+    @property
+    def downloaded(self):
+        return sum([segment[2] for segment in self.segments])
+
+    def _start_progressbar(self):
+        stdio = self.stdio
+        self._print_bar = False
+        if self.progress and stdio:
+            for func in ['start_progressbar', 'update_progressbar', 'finish_progressbar']:
+                if getattr(stdio, func, False) is False:
+                    break
+            else:
+                self._print_bar = True
+        if self._print_bar:
+            _, file_name = os.path.split(self.save_path)
+            units = {"B": 1, "K": 1<<10, "M": 1<<20, "G": 1<<30, "T": 1<<40}
+            for unit in units:
+                num = self.file_size / units[unit]
+                if num < 1024:
+                    break
+            stdio.start_progressbar('Download %s (%.2f %s)' % (file_name, num, unit), max(self.file_size, 1))
+            self.downloaded and stdio.update_progressbar(self.downloaded)
+
+    def _update_progressbar(self):
+        self._print_bar and self.stdio.update_progressbar(min(self.downloaded, self.file_size))
+
+    def _fetch_segment(self, segment):
+        for retry in range(self.RETRY):
+            if segment[0] + segment[2] > segment[1]:
+                return True
+            try:
+                headers = {'Range': 'bytes=%d-%d' % (segment[0] + segment[2], segment[1])}
+                with requests.get(self.url, stream=True, headers=headers, timeout=self.TIMEOUT) as resp:
+                    if resp.status_code != 206:
+                        raise Exception('server returns %s for range request' % resp.status_code)
+                    with open(self.part_path, 'r+b') as f:
+                        f.seek(segment[0] + segment[2])
+                        for chunk in resp.iter_content(self.BUFFER_SIZE):
+                            f.write(chunk)
+                            with self._lock:
+                                segment[2] += len(chunk)
+                                self._update_progressbar()
+                return segment[0] + segment[2] > segment[1]
+            except:
+                self.stdio and getattr(self.stdio, 'verbose', print)('download %s range %s-%s failed, retry %s' % (self.url, segment[0] + segment[2], segment[1], retry + 1))
+                self.stdio and getattr(self.stdio, 'exception', print)('')
+            finally:
+                with self._lock:
+                    self._dump_state()
+        return False
+
+    def _download_ranges(self):
+        self.segments = self._load_state()
+        if self.segments:
+            self.stdio and getattr(self.stdio, 'verbose', print)('resume %s from %s bytes' % (self.part_path, self.downloaded))
+        else:
+            self.segments = self._split()
+            with open(self.part_path, 'wb') as f:
+                f.truncate(self.file_size)
+            self._dump_state()
+        pending = [segment for segment in self.segments if segment[0] + segment[2] <= segment[1]]
+        self._start_progressbar()
+        if len(pending) > 1:
+            pool = ThreadPool(len(pending))
+            try:
+                results = pool.map(self._fetch_segment, pending)
+            finally:
+                pool.close()
+        else:
+            results = [self._fetch_segment(segment) for segment in pending]
+        return all(results)
+
+    def _download_stream(self):
+        self.segments = [[0, self.file_size - 1, 0]]
+        self._start_progressbar()
+        with requests.get(self.url, stream=True, timeout=self.TIMEOUT) as resp:
+            resp.raise_for_status()
+            with open(self.part_path, 'wb') as f:
+                for chunk in resp.iter_content(self.BUFFER_SIZE):
+                    f.write(chunk)
+                    self.segments[0][2] += len(chunk)
+                    self._update_progressbar()
+        return True
+
+    def _verify(self):
+        if not self.checksum:
+            return True
+        hash_type = self.HASH_TYPES.get(self.checksum[0], self.checksum[0])
+        digest = hashlib.new(hash_type)
+        with open(self.part_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.BUFFER_SIZE), b''):
+                digest.update(chunk)
+        if digest.hexdigest() != self.checksum[1]:
+            self.stdio and getattr(self.stdio, 'warn', print)('%s checksum mismatch: %s is required, but got %s' % (self.url, self.checksum[1], digest.hexdigest()))
+            return False
+        return True
+
+    def _clear(self):
+        for path in [self.part_path, self.state_path]:
+            if os.path.exists(path):
+                FileUtil.rm(path)
+
+    def download(self):
+        ret = False
+        try:
+            self.file_size, accept_ranges = self._probe()
+            if accept_ranges and self.file_size:
+                ret = self._download_ranges()
+            else:
+                ret = self._download_stream()
+            if ret:
+                if self._verify():
+                    os.rename(self.part_path, self.save_path)
+                    FileUtil.rm(self.state_path)
+                else:
+                    ret = False
+                    self._clear()
+        except:
+            self.stdio and getattr(self.stdio, 'exception', print)('')
+            ret = False
+        finally:
+            if self._print_bar:
+                if ret:
+                    self.stdio.finish_progressbar()
+                else:
+                    getattr(self.stdio, 'interrupt_progressbar', self.stdio.finish_progressbar)()
+        return ret
+
+
 class RemotePackageInfo(PackageInfo):
 
     def __init__(self, elem):
@@ -286,6 +614,7 @@ class RemoteMirrorRepository(MirrorRepository):
     OTHER_DB_FILE = 'other_db.xml'
     REPO_AGE_FILE = '.rege_age'
     DB_CACHE_FILE = '.db'
+    DB_INDEX_FILE = '.index.db'
     PRIMARY_REPOMD_TYPE = 'primary'
     __VERSION__ = Version("1.0")
 
@@ -296,6 +625,7 @@ class RemoteMirrorRepository(MirrorRepository):
         self.priority = 1
         self.gpgcheck = False
         self._db = None
+        self._index = None
         self._repomds = None
         self._available = None
         super(RemoteMirrorRepository, self).__init__(mirror_path, stdio=stdio)
@@ -327,65 +657,48 @@ class RemoteMirrorRepository(MirrorRepository):
         return self._available
 
     @property
-    def db(self):
-        if self._db is not None:
-            return self._db
+    def index(self):
+        if self._index is not None:
+            return self._index
         primary_repomd = self._get_repomd_by_type(self.PRIMARY_REPOMD_TYPE)
         if not primary_repomd:
-            return []
+            return None
         file_path = self._get_repomd_data_file(primary_repomd)
         if not file_path:
-            return []
-        self._load_db_cache(file_path)
-        if self._db is None:
+            return None
+        index = PackageIndex(self.get_db_index_file(self.mirror_path), stdio=self.stdio)
+        if index.is_valid(file_path):
+            self.stdio and getattr(self.stdio, 'verbose', print)('load %s' % index.path)
+        else:
             fp = FileUtil.unzip(file_path, stdio=self.stdio)
             if not fp:
                 FileUtil.rm(file_path, stdio=self.stdio)
-                return []
-            self._db = {}
+                return None
             try:
+                infos = []
                 parser = cElementTree.iterparse(fp)
                 for event, elem in parser:
                     if RemoteMirrorRepository.ns_cleanup(elem.tag) == 'package' and elem.attrib.get('type') == 'rpm':
-                        info = RemotePackageInfo(elem)
-                        self._db[info.md5] = info
-                self._dump_db_cache()
+                        infos.append(RemotePackageInfo(elem))
+                index.rebuild(infos)
             except:
+                index.close()
                 FileUtil.rm(file_path, stdio=self.stdio)
                 self.stdio and self.stdio.critical('failed to parse file %s, please retry later.' % file_path)
-                return []
-        return self._db
-
-    def _load_db_cache(self, path):
-        try:
-            db_cacahe_path = self.get_db_cache_file(self.mirror_path)
-            repomd_time = os.stat(path)[8]
-            cache_time = os.stat(db_cacahe_path)[8]
-            if cache_time > repomd_time:
-                self.stdio and getattr(self.stdio, 'verbose', print)('load %s' % db_cacahe_path)
-                with open(db_cacahe_path, 'rb') as f:
-                    self._db = pickle.load(f)
-                    if self.__VERSION__ > Version(self.db.get(self.__VERSION_KEY__, '0')):
-                        self._db = None
-                    else:
-                        del self._db[self.__VERSION_KEY__]
-        except:
-            pass
+                return None
+        self._index = index
+        return self._index
 
-    def _dump_db_cache(self):
-        if self._db:
-            data = deepcopy(self.db)
-            data[self.__VERSION_KEY__] = self.__VERSION__
-            try:
-                db_cacahe_path = self.get_db_cache_file(self.mirror_path)
-                self.stdio and getattr(self.stdio, 'verbose', print)('dump %s' % db_cacahe_path)
-                with open(db_cacahe_path, 'wb') as f:
-                    pickle.dump(data, f)
-                return True
-            except:
-                self.stdio.exception('')
-                pass
-            return False
+    @property
+    def db(self):
+        if self._db is not None:
+            return self._db
+        if not self.index:
+            return {}
+        self._db = {}
+        for info in self.index.all():
+            self._db[info.md5] = info
+        return self._db
 
     @staticmethod
     def ns_cleanup(qn):
@@ -407,6 +720,10 @@ class RemoteMirrorRepository(MirrorRepository):
     def get_db_cache_file(mirror_path):
         return os.path.join(mirror_path, RemoteMirrorRepository.DB_CACHE_FILE)
 
+    @staticmethod
+    def get_db_index_file(mirror_path):
+        return os.path.join(mirror_path, RemoteMirrorRepository.DB_INDEX_FILE)
+
     def _load_repo_age(self):
         try:
             with open(self.get_repo_age_file(self.mirror_path), 'r') as f:
@@ -454,6 +771,9 @@ class RemoteMirrorRepository(MirrorRepository):
             self.stdio and getattr(self.stdio, 'stop_loading')('fail')
             return False
         self._db = None
+        if self._index is not None:
+            self._index.close()
+            self._index = None
         self.repo_age = int(time.time())
         self._dump_repo_age_data()
         self.stdio and getattr(self.stdio, 'stop_loading')('succeed')
@@ -479,26 +799,22 @@ class RemoteMirrorRepository(MirrorRepository):
         return self._repomds
 
     def get_all_pkg_info(self):
-        return [self.db[key] for key in self.db]
+        return self.index.all() if self.index else []
 
     def get_rpm_info_by_md5(self, md5, **pattern):
-        if md5 in self.db:
-            return self._pattern_check(self.db[md5], **pattern)
-        for key in self.db:
-            info = self.db[key]
-            if info.md5 == md5:
-                self.stdio and getattr(self.stdio, 'verbose', print)('%s translate info %s' % (md5, info.md5))
-                return self._pattern_check(info, **pattern)
+        info = self.index.get(md5) if self.index else None
+        if info:
+            return self._pattern_check(info, **pattern)
         return None
 
-    def get_rpm_pkg_by_info(self, pkg_info):
+    def get_rpm_pkg_by_info(self, pkg_info, progress=True):
         file_name = pkg_info.location[1]
         file_path = os.path.join(self.mirror_path, file_name)
         self.stdio and getattr(self.stdio, 'verbose', print)('get RPM package by %s' % pkg_info)
         if not os.path.exists(file_path) or os.stat(file_path)[8] < pkg_info.time[1] or os.path.getsize(file_path) != pkg_info.package_size:
             base_url = pkg_info.location[0] if pkg_info.location[0] else self.baseurl
             url = '%s/%s' % (base_url, pkg_info.location[1])
-            if not self.download_file(url, file_path, self.stdio):
+            if not self.download_file(url, file_path, self.stdio, checksum=pkg_info.checksum, progress=progress):
                 return None
         return Package(file_path)
     
@@ -537,13 +853,9 @@ class RemoteMirrorRepository(MirrorRepository):
         only_download = pattern['only_download'] if 'only_download' in pattern else False
         self.stdio and getattr(self.stdio, 'verbose', print)('only_download is %s' % only_download)
         pkgs = []
-        for key in self.db:
-            info = self.db[key]
-            if info.name != name:
-                continue
-            if info.arch not in arch:
-                continue
-           
+        if not self.index:
+            return None
+        for info in self.index.find(name=name, archs=arch, version=version, min_version=min_version, max_version=max_version):
             if const.COMP_OB in info.name:
                 if _NO_LSE:
                     if 'nonlse' not in info.release:
@@ -580,9 +892,9 @@ class RemoteMirrorRepository(MirrorRepository):
         matchs = []
         if 'md5' in pattern and pattern['md5']:
             self.stdio and getattr(self.stdio, 'verbose', print)('md5 is %s' % pattern['md5'])
-            info = None
-            if pattern['md5'] in self.db:
-                info = self._pattern_check(self.db[pattern['md5']], **pattern)
+            info = self.index.get(pattern['md5']) if self.index else None
+            if info:
+                info = self._pattern_check(info, **pattern)
             return [info, (0xfffffffff, )] if info else matchs
         self.stdio and getattr(self.stdio, 'verbose', print)('md5 is None')
         if 'name' not in pattern and not pattern['name']:
@@ -601,8 +913,14 @@ class RemoteMirrorRepository(MirrorRepository):
         else:
             pattern['version'] = None
         self.stdio and getattr(self.stdio, 'verbose', print)('version is %s' % pattern['version'])
-        for key in self.db:
-            info = self.db[key]
+        if not self.index:
+            return matchs
+        infos = self.index.find(
+            name_contains=pattern['name'], archs=pattern['arch'], version_prefix=pattern['version'],
+            min_version=pattern.get('min_version'), min_version_included=False,
+            max_version=pattern.get('max_version'), max_version_included=True
+        )
+        for info in infos:
             if pattern['name'] in info.name:
                 score = self.match_score(info, **pattern)
                 if score[0]:
@@ -647,52 +965,23 @@ class RemoteMirrorRepository(MirrorRepository):
             return None
 
     @staticmethod
-    def download_file(url, save_path, stdio=None):
-        try:
-            with requests.get(url, stream=True) as fget:
-                file_size = int(fget.headers["Content-Length"])
-                if stdio:
-                    print_bar = True
-                    for func in ['start_progressbar', 'update_progressbar', 'finish_progressbar']:
-                        if getattr(stdio, func, False) is False:
-                            print_bar = False
-                            break
-                else:
-                    print_bar = False
-                if print_bar:
-                    _, fine_name = os.path.split(save_path)
-                    units = {"B": 1, "K": 1<<10, "M": 1<<20, "G": 1<<30, "T": 1<<40}
-                    for unit in units:
-                        num = file_size / units[unit]
-                        if num < 1024:
-                            break
-                    stdio.start_progressbar('Download %s (%.2f %s)' % (fine_name, num, unit), file_size)
-                chunk_size = 512
-                file_done = 0
-                with FileUtil.open(save_path, "wb", stdio=stdio) as fw:
-                    for chunk in fget.iter_content(chunk_size):
-                        fw.write(chunk)
-                        file_done = file_done + chunk_size
-                        if print_bar and file_done <= file_size:
-                            stdio.update_progressbar(file_done)
-                    print_bar and stdio.finish_progressbar()
+    def download_file(url, save_path, stdio=None, checksum=None, progress=True):
+        if RangeDownloader(url, save_path, checksum=checksum, progress=progress, stdio=stdio).download():
             return True
-        except:
-            FileUtil.rm(save_path)
-            stdio and getattr(stdio, 'warn', print)('Failed to download %s to %s' % (url, save_path))
-            stdio and getattr(stdio, 'exception', print)('')
+        stdio and getattr(stdio, 'warn', print)('Failed to download %s to %s' % (url, save_path))
         return False
 
 class LocalMirrorRepository(MirrorRepository):
 
     MIRROR_TYPE = MirrorRepositoryType.LOCAL
     _DB_FILE = '.db'
+    _DB_INDEX_FILE = '.index.db'
     __VERSION__ = Version("1.0")
 
     def __init__(self, mirror_path, stdio=None):
         super(LocalMirrorRepository, self).__init__(mirror_path, stdio=stdio)
-        self.db = {}
         self.db_path = os.path.join(mirror_path, self._DB_FILE)
+        self.index = PackageIndex(os.path.join(mirror_path, self._DB_INDEX_FILE), stdio=stdio)
         self.enabled = '-'
         self.available = True
         self._load_db()
@@ -701,18 +990,31 @@ class LocalMirrorRepository(MirrorRepository):
     def repo_age(self):
         return int(time.time())
 
+    @property
+    def db(self):
+        db = {}
+        for info in self._valid_infos(self.index.all()):
+            db[info.md5] = info
+        return db
+
     def _load_db(self):
         try:
-            if os.path.isfile(self.db_path):
+            # the pickled db is still written by the older versions of obd, the index is rebuilt when it is newer
+            has_db = os.path.isfile(self.db_path)
+            if self.index.is_valid(self.db_path if has_db else None):
+                return
+            db = {}
+            if has_db:
                 with open(self.db_path, 'rb') as f:
                     db = pickle.load(f)
-                    self._flush_db(db)
+            self._flush_db(db)
         except:
             self.stdio.exception('')
             pass
-        
+
     def _flush_db(self, db):
-        need_flush = self.__VERSION__ > Version(db.get(self.__VERSION_KEY__, '0')) 
+        need_flush = self.__VERSION__ > Version(db.get(self.__VERSION_KEY__, '0'))
+        infos = {}
         for key in db:
             data = db[key]
             path = getattr(data, 'path', False)
@@ -720,14 +1022,15 @@ class LocalMirrorRepository(MirrorRepository):
                 continue
             if need_flush:
                 data = Package(path)
-            self.db[key] = data
+            infos[key] = data
         if need_flush:
-            self._dump_db()
+            self._dump_db(infos)
+        self.index.rebuild(infos.values())
 
-    def _dump_db(self):
-        # 所有 dump方案都为临时
+    def _dump_db(self, db):
+        # keep the pickled db for the older versions of obd, it is written before the index so that the index stays newer
         try:
-            data = deepcopy(self.db)
+            data = dict(db)
             data[self.__VERSION_KEY__] = self.__VERSION__
             with open(self.db_path, 'wb') as f:
                 pickle.dump(data, f)
@@ -737,8 +1040,18 @@ class LocalMirrorRepository(MirrorRepository):
             pass
         return False
 
+    def _valid_infos(self, infos):
+        # the rpm file may be removed by `obd mirror clean`
+        return [info for info in infos if os.path.exists(info.path)]
+
+    def _get_info(self, md5):
+        info = self.index.get(md5)
+        if info and os.path.exists(info.path):
+            return info
+        return None
+
     def exist_pkg(self, pkg):
-        return pkg.md5 in self.db
+        return self._get_info(pkg.md5) is not None
 
     def add_pkg(self, pkg):
         target_path = os.path.join(self.mirror_path, pkg.file_name)
@@ -746,11 +1059,11 @@ class LocalMirrorRepository(MirrorRepository):
             src_path = pkg.path
             self.stdio and getattr(self.stdio, 'verbose', print)('RPM hash check')
             if target_path != src_path:
-                if pkg.md5 in self.db:
-                    t_info = self.db[pkg.md5]
+                t_info = self._get_info(pkg.md5)
+                if t_info:
                     self.stdio and getattr(self.stdio, 'verbose', print)('copy %s to %s' % (src_path, target_path))
                     if t_info.path == target_path:
-                        del self.db[t_info.md5]
+                        self.index.delete(t_info.md5)
                         FileUtil.copy(src_path, target_path)
                     else:
                         FileUtil.copy(src_path, target_path)
@@ -765,9 +1078,10 @@ class LocalMirrorRepository(MirrorRepository):
             else:
                 self.stdio and getattr(self.stdio, 'error', print)('same file')
                 return None
-            self.db[pkg.md5] = pkg
             self.stdio and getattr(self.stdio, 'verbose', print)('dump PackageInfo')
-            if self._dump_db():
+            db = self.db
+            db[pkg.md5] = pkg
+            if self._dump_db(db) and self.index.put(pkg):
                 self.stdio and getattr(self.stdio, 'print', print)('add %s to local mirror', src_path)
                 return pkg
         except IOError:
@@ -779,9 +1093,9 @@ class LocalMirrorRepository(MirrorRepository):
         return None
 
     def get_all_pkg_info(self):
-        return [self.db[key] for key in self.db]
+        return self._valid_infos(self.index.all())
 
-    def get_rpm_pkg_by_info(self, pkg_info):
+    def get_rpm_pkg_by_info(self, pkg_info, progress=True):
         self.stdio and getattr(self.stdio, 'verbose', print)('get RPM package by %s' % pkg_info)
         return Package(pkg_info.path)
 
@@ -800,9 +1114,9 @@ class LocalMirrorRepository(MirrorRepository):
     def get_exact_pkg_info(self, **pattern):
         if 'md5' in pattern and pattern['md5']:
             self.stdio and getattr(self.stdio, 'verbose', print)('md5 is %s' % pattern['md5'])
-            info = None
-            if pattern['md5'] in self.db:
-                info = self._pattern_check(self.db[pattern['md5']], **pattern)
+            info = self._get_info(pattern['md5'])
+            if info:
+                info = self._pattern_check(info, **pattern)
             return info
         self.stdio and getattr(self.stdio, 'verbose', print)('md5 is None')
         if 'name' not in pattern and not pattern['name']:
@@ -821,12 +1135,7 @@ class LocalMirrorRepository(MirrorRepository):
         max_version = ConfigUtil.get_value_from_dict(pattern, 'max_version', transform_func=Version)
         self.stdio and getattr(self.stdio, 'verbose', print)('max_version is %s' % max_version)
         pkgs = []
-        for key in self.db:
-            info = self.db[key]
-            if info.name != name:
-                continue
-            if info.arch not in arch:
-                continue
+        for info in self._valid_infos(self.index.find(name=name, archs=arch, version=version, min_version=min_version, max_version=max_version)):
             if const.COMP_OB in info.name:
                 if _NO_LSE:
                     if 'nonlse' not in info.release:
@@ -861,9 +1170,9 @@ class LocalMirrorRepository(MirrorRepository):
         matchs = []
         if 'md5' in pattern and pattern['md5']:
             self.stdio and getattr(self.stdio, 'verbose', print)('md5 is %s' % pattern['md5'])
-            info = None
-            if pattern['md5'] in self.db:
-                info = self._pattern_check(self.db[pattern['md5']], **pattern)
+            info = self._get_info(pattern['md5'])
+            if info:
+                info = self._pattern_check(info, **pattern)
             return [info, (0xfffffffff, )] if info else matchs
         self.stdio and getattr(self.stdio, 'verbose', print)('md5 is None')
         if 'name' not in pattern and not pattern['name']:
@@ -881,8 +1190,12 @@ class LocalMirrorRepository(MirrorRepository):
         else:
             pattern['version'] = None
         self.stdio and getattr(self.stdio, 'verbose', print)('version is %s' % pattern['version'])
-        for key in self.db:
-            info = self.db[key]
+        infos = self.index.find(
+            name_contains=pattern['name'], archs=pattern['arch'], version_prefix=pattern['version'],
+            min_version=pattern.get('min_version'), min_version_included=False,
+            max_version=pattern.get('max_version'), max_version_included=True
+        )
+        for info in self._valid_infos(infos):
             if pattern['name'] in info.name:
                 score = self.match_score(info, **pattern)
                 if score[0]:
@@ -906,7 +1219,7 @@ class LocalMirrorRepository(MirrorRepository):
         return c
 
     def get_info_list(self):
-        return [self.db[key] for key in self.db]
+        return self.get_all_pkg_info()
 
 
 class MirrorRepositoryConfig(object):
@@ -1064,8 +1377,7 @@ class MirrorRepositoryManager(Manager):
         mirrors.insert(0, self.local_mirror)
         return mirrors
 
-    def get_exact_pkg(self, **pattern):
-        only_info = 'only_info' in pattern and pattern['only_info']
+    def _get_exact_pkg_info(self, **pattern):
         mirrors = self.get_mirrors()
         info = [None, None]
         for mirror in mirrors:
@@ -1073,12 +1385,11 @@ class MirrorRepositoryManager(Manager):
             self.stdio.verbose('%s found pkg: %s' % (mirror, new_one))
             if new_one and new_one > info[0]:
                 info = [new_one, mirror]
-        return info[0] if info[0] is None or only_info else info[1].get_rpm_pkg_by_info(info[0])
+        return info
 
-    def get_best_pkg(self, **pattern):
+    def _get_best_pkg_info(self, **pattern):
         if 'fuzzy' not in pattern or not pattern['fuzzy']:
-            return self.get_exact_pkg(**pattern)
-        only_info = 'only_info' in pattern and pattern['only_info']
+            return self._get_exact_pkg_info(**pattern)
         mirrors = self.get_mirrors()
         best = None
         source_mirror = None
@@ -1092,7 +1403,57 @@ class MirrorRepositoryManager(Manager):
                 best = t_best
                 source_mirror = mirror
         if best:
-            return best[0] if only_info else source_mirror.get_rpm_pkg_by_info(best[0])
+            return [best[0], source_mirror]
+        return [None, None]
+
+    def get_exact_pkg(self, **pattern):
+        only_info = 'only_info' in pattern and pattern['only_info']
+        info = self._get_exact_pkg_info(**pattern)
+        return info[0] if info[0] is None or only_info else info[1].get_rpm_pkg_by_info(info[0])
+
+    def get_best_pkg(self, **pattern):
+        if 'fuzzy' not in pattern or not pattern['fuzzy']:
+            return self.get_exact_pkg(**pattern)
+        only_info = 'only_info' in pattern and pattern['only_info']
+        best = self._get_best_pkg_info(**pattern)
+        if best[0]:
+            return best[0] if only_info else best[1].get_rpm_pkg_by_info(best[0])
+
+    def get_best_pkgs(self, patterns, workers=4):
+        """
+        Search the best package of each pattern and download the missing rpm files concurrently.
+
+        :param patterns: dict of key => pattern of get_best_pkg
+        :return: dict of key => Package or None
+        """
+        pkgs = {}
+        infos = {}
+        for key in patterns:
+            info = self._get_best_pkg_info(**patterns[key])
+            if info[0] is None:
+                pkgs[key] = None
+            else:
+                infos[key] = info
+        downloads = [key for key in infos if infos[key][1].mirror_type == MirrorRepositoryType.REMOTE and not infos[key][1].is_download(infos[key][0])]
+        if len(downloads) < 2:
+            for key in infos:
+                pkgs[key] = infos[key][1].get_rpm_pkg_by_info(infos[key][0])
+            return pkgs
+
+        # progress bars can not be shared between threads, so show a loading instead
+        self.stdio.start_loading('Download %s' % ', '.join(['%s-%s' % (infos[key][0].name, infos[key][0].version) for key in downloads]))
+        pool = ThreadPool(min(workers, len(downloads)))
+        try:
+            results = pool.map(lambda key: infos[key][1].get_rpm_pkg_by_info(infos[key][0], progress=False), downloads)
+        finally:
+            pool.close()
+        for key, pkg in zip(downloads, results):
+            pkgs[key] = pkg
+        self.stdio.stop_loading('succeed' if all(results) else 'fail')
+        for key in infos:
+            if key not in pkgs:
+                pkgs[key] = infos[key][1].get_rpm_pkg_by_info(infos[key][0])
+        return pkgs
 
     def get_pkgs_info(self, name, **pattern):
         pkgs = set()
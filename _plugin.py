@@ -19,15 +19,22 @@ import os
 import re
 import sys
 import time
+import pickle
+import hashlib
 import inspect2
+from bisect import bisect_right
 from enum import Enum
+from threading import RLock, Condition, local
+from collections import deque
 from glob import glob
 from copy import deepcopy, copy
 
 from _manager import Manager
 from _rpm import Version, get_prefix_version, add_sub_version
-from ssh import ConcurrentExecutor
-from tool import ConfigUtil, DynamicLoading, YamlLoader, FileUtil
+from multiprocessing.pool import ThreadPool
+
+from ssh import ConcurrentExecutor, SshReturn, gather_host_facts
+from tool import ConfigUtil, DynamicLoading, YamlLoader, FileUtil, OrderedDict, Waiter
 from _types import *
 
 
@@ -56,6 +63,8 @@ class Plugin(object):
         self.plugin_path = plugin_path
         self.version = Version(version)
         self.dev_mode = dev_mode
+        # the directory to keep the compiled data of the plugin, set by the plugin loader
+        self.cache_path = None
 
     def __str__(self):
         return '%s-%s-%s' % (self.component_name, self.PLUGIN_TYPE.name.lower(), self.version)
@@ -65,6 +74,86 @@ class Plugin(object):
         return self.PLUGIN_TYPE
 
 
+class PluginEvents(object):
+
+    """
+    The latest plugin completion events, for subscribers which follow the progress of tasks.
+    Each event has an increasing `id`, a subscriber resumes from the last id it has seen.
+    """
+
+    def __init__(self, size=2048):
+        self._events = deque(maxlen=size)
+        self._last_id = 0
+        self._condition = Condition()
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def publish(self, **event):
+        with self._condition:
+            self._last_id += 1
+            event['id'] = self._last_id
+            event['time'] = time.time()
+            self._events.append(event)
+            self._condition.notify_all()
+        return event
+
+    def read(self, cursor=0, timeout=None):
+        """
+        Wait for the events after `cursor`.
+
+        :return: (events, lost). `lost` is true if some events after `cursor` have been dropped,
+            or `cursor` is ahead of the last id, as the ids of a restarted process start over
+        """
+        with self._condition:
+            if cursor > self._last_id:
+                return list(self._events), True
+            if self._last_id <= cursor and timeout != 0:
+                self._condition.wait(timeout)
+            if self._last_id <= cursor:
+                return [], False
+            lost = bool(self._events) and self._events[0]['id'] > cursor + 1
+            return [event for event in self._events if event['id'] > cursor], lost
+
+
+PLUGIN_EVENTS = PluginEvents()
+
+
+class PluginCancelled(BaseException):
+    # not an Exception, so that the `except Exception` in plugins do not swallow it
+    pass
+
+
+class PluginCancellation(object):
+
+    """
+    Cooperative cancellation of the plugins run by a thread.
+    The owner of the thread binds an event, and the next plugin run in the thread raises PluginCancelled
+    once the event is set, so a plugin is never interrupted in the middle.
+    """
+
+    def __init__(self):
+        self._local = local()
+
+    @property
+    def event(self):
+        return getattr(self._local, 'event', None)
+
+    def bind(self, event):
+        old = self.event
+        self._local.event = event
+        return old
+
+    def check(self):
+        event = self.event
+        if event is not None and event.is_set():
+            raise PluginCancelled()
+
+
+PLUGIN_CANCELLATION = PluginCancellation()
+
+
 class PluginContextNamespace:
 
     def __init__(self, spacename):
@@ -144,6 +233,19 @@ class PluginReturn(object):
         self.set_kwargs(**kwargs)
 
 
+class FanOutReturn(SshReturn):
+
+    def __init__(self, server, value=None, elapsed=0):
+        if isinstance(value, SshReturn):
+            code, stdout, stderr = value.code, value.stdout, value.stderr
+        else:
+            code, stdout, stderr = 0 if value else 1, '', ''
+        super(FanOutReturn, self).__init__(code, stdout, stderr)
+        self.server = server
+        self.value = value
+        self.elapsed = elapsed
+
+
 class PluginContext(object):
 
     def __init__(self, plugin_name, namespace, namespaces, deploy_name, deploy_status, repositories, components, clients, cluster_config, cmd, options, dev_mode, stdio):
@@ -163,6 +265,82 @@ class PluginContext(object):
         self.concurrent_executor = ConcurrentExecutor(32)
         self._return = PluginReturn()
 
+    def fan_out(self, commands, timeout=None, workers=32):
+        """
+        Run a command on every server at the same time over `self.clients`.
+
+        :param commands: {server: command}. The command is a shell command or a callable `func(server, client)`.
+        :param timeout: the timeout of shell commands, the same as `execute_command`
+        :param workers: the maximum number of servers handled at the same time
+        :return: OrderedDict {server: FanOutReturn} in the order of commands. `value` is what the command returned
+                 and `elapsed` is the time it took on the server.
+        :raise: the exception of the first server whose command raised one, after all the servers are done,
+                as running the commands one by one would
+        """
+        servers = list(commands.keys())
+        rets = OrderedDict()
+        if not servers:
+            return rets
+        exceptions = {}
+
+        def _run(server):
+            command = commands[server]
+            client = self.clients[server]
+            start_time = time.time()
+            try:
+                if callable(command):
+                    value = command(server, client)
+                else:
+                    value = client.execute_command(command, timeout=timeout)
+                return FanOutReturn(server, value, time.time() - start_time)
+            except Exception as e:
+                self.stdio.exception('%s: %s' % (server, e))
+                exceptions[server] = e
+                return FanOutReturn(server, elapsed=time.time() - start_time)
+
+        pool = ThreadPool(processes=min(workers, len(servers)))
+        try:
+            for ret in pool.map(_run, servers):
+                self.stdio.verbose('%s done in %.3fs' % (ret.server, ret.elapsed))
+                rets[ret.server] = ret
+        finally:
+            pool.close()
+        for server in servers:
+            if server in exceptions:
+                raise exceptions[server]
+        return rets
+
+    def host_facts(self, servers=None, refresh=False):
+        """
+        Get the HostFacts of servers in parallel. The facts are cached on the clients, see SshClient.host_facts.
+
+        :param servers: default to the servers of the cluster
+        :param refresh: collect the facts again instead of using the cached ones
+        :return: OrderedDict {server: HostFacts}
+        """
+        if servers is None:
+            servers = self.cluster_config.servers
+        servers = list(servers)
+        facts = gather_host_facts([self.clients[server] for server in servers], refresh=refresh, stdio=self.stdio)
+        return OrderedDict(zip(servers, facts))
+
+    def wait_until(self, condition, timeout=None, interval=0.5, max_interval=3, name=None, progress=None, **kwargs):
+        """
+        Poll `condition` with adaptive backoff until it holds or `timeout` seconds passed. See tool.Waiter.
+
+        :param condition: a callable, or {name: callable} to poll several conditions in each round
+        :param progress: `func(result)` called after each failed round, a returned text is shown in the loading
+        :return: WaitResult, true if the condition holds. The wait is recorded in the `wait_metrics` variable.
+        """
+        name = name or self.plugin_name
+        ret = Waiter(timeout=timeout, interval=interval, max_interval=max_interval, name=name, progress=progress, stdio=self.stdio, **kwargs).wait(condition)
+        wait_metrics = self.get_variable('wait_metrics', default=None)
+        if wait_metrics is None:
+            wait_metrics = []
+            self.set_variable('wait_metrics', wait_metrics)
+        wait_metrics.append({'name': name, 'ok': ret.ok, 'elapsed': ret.elapsed, 'rounds': ret.rounds})
+        return ret
+
     def get_return(self, plugin_name=None, spacename=None):
         if spacename:
             namespace = self.namespaces.get(spacename)
@@ -227,6 +405,8 @@ class ScriptPlugin(Plugin):
     def __init__(self, component_name, plugin_path, version, dev_mode):
         super(ScriptPlugin, self).__init__(component_name, plugin_path, version, dev_mode)
         self.context = None
+        # the context is bound to the plugin object, so one object runs one call at a time
+        self.lock = RLock()
 
     def __call__(self):
         raise NotImplementedError
@@ -270,6 +450,19 @@ def pyScriptPluginExec(func):
         repositories, components, clients, cluster_config, cmd,
         options, stdio, *arg, **kwargs
         ):
+        with self.lock:
+            return _exec(
+                self, namespace, namespaces, deploy_name, deploy_status,
+                repositories, components, clients, cluster_config, cmd,
+                options, stdio, *arg, **kwargs
+            )
+
+    def _exec(
+        self, namespace, namespaces, deploy_name, deploy_status,
+        repositories, components, clients, cluster_config, cmd,
+        options, stdio, *arg, **kwargs
+        ):
+        PLUGIN_CANCELLATION.check()
         self.before_do(self.name, namespace, namespaces, deploy_name, deploy_status,
         repositories, components, clients, cluster_config, cmd,
         options, stdio, *arg, **kwargs)
@@ -277,46 +470,57 @@ def pyScriptPluginExec(func):
         run_result = self.context.get_variable('run_result', default={})
         run_result[method_name] = {'result': True}
         start_time = time.time()
-        if self.module:
-            method = getattr(self.module, method_name, False)
-            namespace_vars = copy(self.context.namespace.variables)
-            namespace_vars.update(kwargs)
-            if arg:
-                idx = 0
-                params = list(inspect2.signature(method).parameters.keys())[1:-2]
-                num = min(len(arg), len(params))
-                while idx < num:
-                    key = params[idx]
-                    if key in namespace_vars:
-                        del namespace_vars[key]
-                    idx += 1
-            kwargs = namespace_vars
-            if method:
-                target_servers = None
-                if cluster_config:
-                    servers = cluster_config.servers
-                    target_servers = kwargs.get('target_servers')
-                    if target_servers is not None:
-                        cluster_config.servers = target_servers
-                        stdio and getattr(stdio, 'verbose', print)('plugin %s target_servers: %s' % (self, target_servers))
-                        del kwargs['target_servers']
-                try:
-                    ret = method(self.context, *arg, **kwargs)
-                    if ret is None and self.context and self.context.get_return().value == False:
+        finished = False
+        try:
+            if self.module:
+                method = getattr(self.module, method_name, False)
+                namespace_vars = copy(self.context.namespace.variables)
+                namespace_vars.update(kwargs)
+                if arg:
+                    idx = 0
+                    params = list(inspect2.signature(method).parameters.keys())[1:-2]
+                    num = min(len(arg), len(params))
+                    while idx < num:
+                        key = params[idx]
+                        if key in namespace_vars:
+                            del namespace_vars[key]
+                        idx += 1
+                kwargs = namespace_vars
+                if method:
+                    target_servers = None
+                    if cluster_config:
+                        servers = cluster_config.servers
+                        target_servers = kwargs.get('target_servers')
+                        if target_servers is not None:
+                            cluster_config.servers = target_servers
+                            stdio and getattr(stdio, 'verbose', print)('plugin %s target_servers: %s' % (self, target_servers))
+                            del kwargs['target_servers']
+                    try:
+                        ret = method(self.context, *arg, **kwargs)
+                        if ret is None and self.context and self.context.get_return().value == False:
+                            run_result[method_name]['result'] = False
+                            if not self.context.get_return().kwargs:
+                                self.context.return_false()
+                    except Exception as e:
                         run_result[method_name]['result'] = False
-                        if not self.context.get_return().kwargs:
-                            self.context.return_false()
-                except Exception as e:
-                    run_result[method_name]['result'] = False
-                    self.context.return_false(exception=e)
-                    stdio and getattr(stdio, 'exception', print)('%s RuntimeError: %s' % (self, e))
-                finally:
-                    if target_servers:
-                        cluster_config.servers = servers
-                        stdio and getattr(stdio, 'verbose', print)('plugin %s restore servers: %s' % (self, servers))
-        end_time = time.time()
-        run_result[method_name]['time'] = end_time - start_time
-        self.context.set_variable('run_result', run_result)
+                        self.context.return_false(exception=e)
+                        stdio and getattr(stdio, 'exception', print)('%s RuntimeError: %s' % (self, e))
+                    finally:
+                        if target_servers:
+                            cluster_config.servers = servers
+                            stdio and getattr(stdio, 'verbose', print)('plugin %s restore servers: %s' % (self, servers))
+            finished = True
+        finally:
+            # published for an exception which is not caught above as well, e.g. the task is cancelled
+            if not finished:
+                run_result[method_name]['result'] = False
+            end_time = time.time()
+            run_result[method_name]['time'] = end_time - start_time
+            self.context.set_variable('run_result', run_result)
+            PLUGIN_EVENTS.publish(
+                deploy_name=deploy_name, component=getattr(namespace, 'spacename', None), plugin=method_name,
+                result=run_result[method_name]['result'], elapsed=run_result[method_name]['time']
+            )
         ret = self.context.get_return() if self.context else PluginReturn()
         self.after_do(stdio, *arg, **kwargs)
         stdio and getattr(stdio, 'verbose', print)('plugin %s result: %s' % (self, ret.value))
@@ -354,14 +558,11 @@ class PyScriptPlugin(ScriptPlugin):
             raise NotImplementedError
 
     def _import(self, stdio=None):
-        if self.module is None:
-            DynamicLoading.add_libs_path(self.libs_path)
-            self.module = DynamicLoading.import_module(self.PLUGIN_NAME, stdio)
+        # the compiled source is resident in DynamicLoading, each call runs it in a new module
+        self.module = DynamicLoading.import_module(self.PLUGIN_NAME, stdio, path=self.plugin_path, libs_path=self.libs_path)
 
     def _export(self, stdio=None):
-        if self.module:
-            DynamicLoading.remove_libs_path(self.libs_path)
-            DynamicLoading.export_module(self.PLUGIN_NAME, stdio)
+        self.module = None
 
 # this is PyScriptPlugin demo
 # class InitPlugin(PyScriptPlugin):
@@ -464,6 +665,7 @@ class ParamPlugin(Plugin):
     PLUGIN_TYPE = PluginType.PARAM
     DEF_PARAM_YAML = 'parameter.yaml'
     FLAG_FILE = DEF_PARAM_YAML
+    CACHE_VERSION = 1
 
     def __init__(self, component_name, plugin_path, version, dev_mode):
         super(ParamPlugin, self).__init__(component_name, plugin_path, version, dev_mode)
@@ -474,8 +676,61 @@ class ParamPlugin(Plugin):
         self._need_restart_items = None
         self._params_default = None
 
+    @property
+    def cache_file_path(self):
+        if not self.cache_path:
+            return None
+        return os.path.join(self.cache_path, '%s.pkl' % hashlib.md5(self.def_param_yaml_path.encode('utf-8')).hexdigest())
+
+    def _cache_key(self):
+        stat = os.stat(self.def_param_yaml_path)
+        return (self.CACHE_VERSION, self.def_param_yaml_path, stat.st_mtime, stat.st_size)
+
+    def _load_cache(self):
+        cache_file_path = self.cache_file_path
+        if not cache_file_path or not os.path.exists(cache_file_path):
+            return False
+        try:
+            with open(cache_file_path, 'rb') as f:
+                data = pickle.load(f)
+            if data.get('key') != self._cache_key():
+                return False
+            self._src_data = data['params']
+            self._need_redploy_items = data['redploy_params']
+            self._had_modify_limit_items = data['modify_limit_params']
+            self._need_restart_items = data['restart_params']
+            self._params_default = data['params_default']
+            return True
+        except:
+            return False
+
+    def _dump_cache(self):
+        cache_file_path = self.cache_file_path
+        if not cache_file_path or not self._src_data:
+            return False
+        try:
+            data = {
+                'key': self._cache_key(),
+                'params': self._src_data,
+                'redploy_params': self.redploy_params,
+                'modify_limit_params': self.modify_limit_params,
+                'restart_params': self.restart_params,
+                'params_default': self.params_default
+            }
+            if not os.path.exists(self.cache_path):
+                os.makedirs(self.cache_path)
+            tmp_path = '%s.%s' % (cache_file_path, os.getpid())
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(data, f, protocol=2)
+            os.rename(tmp_path, cache_file_path)
+            return True
+        except:
+            return False
+
     @property
     def params(self):
+        if self._src_data is None and self._load_cache():
+            return self._src_data
         if self._src_data is None:
             try:
                 TYPES = {
@@ -531,6 +786,7 @@ class ParamPlugin(Plugin):
                             pass
             except:
                 pass
+            self._dump_cache()
         return self._src_data
 
     @property
@@ -800,12 +1056,130 @@ class InstallPlugin(Plugin):
         return [requirement_map[k] for k in requirement_map]
 
 
+class PluginIndex(object):
+
+    """
+    The index of a plugin root such as plugins/ or workflows/: {component: {file name: sorted versions}}.
+    The best versions are memoized, so resolving a plugin does not touch the file system.
+    The index is kept under the obd home and built again when the mtime of any directory in the root changes.
+    """
+
+    CACHE_VERSION = 2
+
+    def __init__(self, path, cache_path=None, stdio=None):
+        self.path = path
+        self.cache_path = cache_path
+        self.stdio = stdio
+        # {directory: mtime}
+        self.mtimes = {}
+        # {component: {file name: ([version compare value], [version])}}
+        self.files = {}
+        self._best_versions = {}
+        self._lock = RLock()
+        self._loaded = False
+
+    @property
+    def cache_file_path(self):
+        if not self.cache_path:
+            return None
+        return os.path.join(self.cache_path, 'index-%s.pkl' % hashlib.md5(self.path.encode('utf-8')).hexdigest())
+
+    def _is_valid(self, mtimes):
+        try:
+            for path in mtimes:
+                if os.stat(path).st_mtime != mtimes[path]:
+                    return False
+            return True
+        except OSError:
+            return False
+
+    def _load_cache(self):
+        cache_file_path = self.cache_file_path
+        if not cache_file_path or not os.path.exists(cache_file_path):
+            return False
+        try:
+            with open(cache_file_path, 'rb') as f:
+                data = pickle.load(f)
+            if data.get('key') != (self.CACHE_VERSION, self.path) or not self._is_valid(data['mtimes']):
+                return False
+            self.mtimes = data['mtimes']
+            self.files = data['files']
+            return True
+        except:
+            return False
+
+    def _dump_cache(self):
+        cache_file_path = self.cache_file_path
+        if not cache_file_path:
+            return False
+        try:
+            if not os.path.exists(self.cache_path):
+                os.makedirs(self.cache_path)
+            tmp_path = '%s.%s' % (cache_file_path, os.getpid())
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'key': (self.CACHE_VERSION, self.path), 'mtimes': self.mtimes, 'files': self.files}, f, protocol=2)
+            os.rename(tmp_path, cache_file_path)
+            return True
+        except:
+            return False
+
+    def _build(self):
+        mtimes = {}
+        files = {}
+        mtimes[self.path] = os.stat(self.path).st_mtime
+        for component in os.listdir(self.path):
+            component_path = os.path.join(self.path, component)
+            if not os.path.isdir(component_path):
+                continue
+            mtimes[component_path] = os.stat(component_path).st_mtime
+            component_files = files[component] = {}
+            for version in os.listdir(component_path):
+                version_path = os.path.join(component_path, version)
+                if not os.path.isdir(version_path):
+                    continue
+                mtimes[version_path] = os.stat(version_path).st_mtime
+                for file_name in os.listdir(version_path):
+                    component_files.setdefault(file_name, []).append(version)
+            for file_name in component_files:
+                versions = sorted(component_files[file_name], key=lambda version: Version(version).__cmp_value__)
+                component_files[file_name] = ([Version(version).__cmp_value__ for version in versions], versions)
+        self.mtimes = mtimes
+        self.files = files
+
+    def load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            if not self._load_cache():
+                self.stdio and getattr(self.stdio, 'verbose', print)('build plugin index of %s' % self.path)
+                self._build()
+                self._dump_cache()
+            self._loaded = True
+
+    def get_best_version(self, component, file_name, version):
+        """
+        The version directory of `component` which has `file_name`: the same version, or else the greatest lower one.
+        """
+        key = (component, file_name, version)
+        if key in self._best_versions:
+            return self._best_versions[key]
+        self.load()
+        best_version = None
+        if component in self.files and file_name in self.files[component]:
+            cmp_values, versions = self.files[component][file_name]
+            idx = bisect_right(cmp_values, Version(version).__cmp_value__)
+            if idx:
+                best_version = versions[idx - 1]
+        self._best_versions[key] = best_version
+        return best_version
+
+
 class ComponentPluginLoader(object):
 
     PLUGIN_TYPE = None
     MODULE_NAME = __name__
 
-    def __init__(self, home_path, plugin_type=PLUGIN_TYPE, dev_mode=False, stdio=None):
+    def __init__(self, home_path, plugin_type=PLUGIN_TYPE, dev_mode=False, stdio=None, cache_path=None, index=None):
         if plugin_type:
             self.PLUGIN_TYPE = plugin_type
         if not self.PLUGIN_TYPE:
@@ -816,23 +1190,29 @@ class ComponentPluginLoader(object):
         self.dev_mode = dev_mode
         self.stdio = stdio
         self.path = home_path
+        self.cache_path = cache_path
         self.component_name = os.path.split(self.path)[1]
+        self.index = index
         self._plugins = {}
 
+    def _get_plugin(self, flag_path):
+        if flag_path not in self._plugins:
+            path, _ = os.path.split(flag_path)
+            _, version = os.path.split(path)
+            plugin = self.plguin_cls(self.component_name, path, version, self.dev_mode)
+            plugin.cache_path = self.cache_path
+            self._plugins[flag_path] = plugin
+        return self._plugins[flag_path]
+
     def get_plugins(self):
-        plugins = []
-        for flag_path in glob('%s/*/%s' % (self.path, self.plguin_cls.FLAG_FILE)):
-            if flag_path in self._plugins:
-                plugins.append(self._plugins[flag_path])
-            else:
-                path, _ = os.path.split(flag_path)
-                _, version = os.path.split(path)
-                plugin = self.plguin_cls(self.component_name, path, version, self.dev_mode)
-                self._plugins[flag_path] = plugin
-                plugins.append(plugin)
-        return plugins
+        return [self._get_plugin(flag_path) for flag_path in glob('%s/*/%s' % (self.path, self.plguin_cls.FLAG_FILE))]
 
     def get_best_plugin(self, version):
+        if self.index is not None:
+            best_version = self.index.get_best_version(os.path.split(self.path)[1], self.plguin_cls.FLAG_FILE, version)
+            if best_version is None:
+                return None
+            return self._get_plugin(os.path.join(self.path, best_version, self.plguin_cls.FLAG_FILE))
         version = Version(version)
         plugins = []
         for plugin in self.get_plugins():
@@ -860,7 +1240,7 @@ class PyScriptPluginLoader(ComponentPluginLoader):
 
     PLUGIN_TYPE = PluginType.PY_SCRIPT
 
-    def __init__(self, home_path, script_name=None, dev_mode=False, stdio=None):
+    def __init__(self, home_path, script_name=None, dev_mode=False, stdio=None, index=None):
         if not script_name:
             raise NotImplementedError
         type_name = 'PY_SCRIPT_%s' % script_name.upper()
@@ -868,43 +1248,37 @@ class PyScriptPluginLoader(ComponentPluginLoader):
         self.PLUGIN_TYPE = PyScriptPluginLoader.PyScriptPluginType(type_name, type_value)
         if not getattr(sys.modules[__name__], type_value, False):
             self._create_(script_name)
-        super(PyScriptPluginLoader, self).__init__(home_path, dev_mode=dev_mode, stdio=stdio)
+        super(PyScriptPluginLoader, self).__init__(home_path, dev_mode=dev_mode, stdio=stdio, index=index)
 
     def _create_(self, script_name):
-        exec('''
-class %s(PyScriptPlugin):
-
-    FLAG_FILE = '%s.py'
-    PLUGIN_NAME = '%s'
-
-    def __init__(self, component_name, plugin_path, version, dev_mode):
-        super(%s, self).__init__(component_name, plugin_path, version, dev_mode)
-
-    @staticmethod
-    def set_plugin_type(plugin_type):
-        %s.PLUGIN_TYPE = plugin_type
-
-    @pyScriptPluginExec
-    def %s(
-        self, namespace, namespaces, deploy_name, deploy_status,
-        repositories, components, clients, cluster_config, cmd,
-        options, stdio, *arg, **kwargs):
-        pass
-        ''' % (self.PLUGIN_TYPE.value, script_name, script_name, self.PLUGIN_TYPE.value, self.PLUGIN_TYPE.value, script_name))
-        clz = locals()[self.PLUGIN_TYPE.value]
+        def _func(
+            self, namespace, namespaces, deploy_name, deploy_status,
+            repositories, components, clients, cluster_config, cmd,
+            options, stdio, *arg, **kwargs):
+            pass
+        _func.__name__ = script_name
+        clz = type(self.PLUGIN_TYPE.value, (PyScriptPlugin, ), {
+            '__module__': __name__,
+            'FLAG_FILE': '%s.py' % script_name,
+            'PLUGIN_NAME': script_name,
+            'PLUGIN_TYPE': self.PLUGIN_TYPE,
+            script_name: pyScriptPluginExec(_func)
+        })
         setattr(sys.modules[__name__], self.PLUGIN_TYPE.value, clz)
-        clz.set_plugin_type(self.PLUGIN_TYPE)
         return clz
 
 
 class PluginManager(Manager):
 
     RELATIVE_PATH = 'plugins'
+    CACHE_RELATIVE_PATH = '.cache/plugins'
     # The directory structure for plugin is ./plugins/{component_name}/{version}
 
     def __init__(self, home_path, dev_mode=False, stdio=None):
         super(PluginManager, self).__init__(home_path, stdio=stdio)
         self.dev_mode = dev_mode
+        self.cache_path = os.path.join(home_path, self.CACHE_RELATIVE_PATH)
+        self.index = PluginIndex(self.path, self.cache_path, stdio=stdio)
         self.component_plugin_loaders = {}
         self.py_script_plugin_loaders = {}
         for plugin_type in PluginType:
@@ -918,7 +1292,7 @@ class PluginManager(Manager):
             return None
         loaders = self.component_plugin_loaders[plugin_type]
         if component_name not in loaders:
-            loaders[component_name] = ComponentPluginLoader(os.path.join(self.path, component_name), plugin_type, self.dev_mode, self.stdio)
+            loaders[component_name] = ComponentPluginLoader(os.path.join(self.path, component_name), plugin_type, self.dev_mode, self.stdio, cache_path=self.cache_path, index=self.index)
         loader = loaders[component_name]
         return loader.get_best_plugin(version)
 
@@ -931,6 +1305,6 @@ class PluginManager(Manager):
             self.py_script_plugin_loaders[script_name] = {}
         loaders = self.py_script_plugin_loaders[script_name]
         if component_name not in loaders:
-            loaders[component_name] = PyScriptPluginLoader(os.path.join(self.path, component_name), script_name, self.dev_mode, self.stdio)
+            loaders[component_name] = PyScriptPluginLoader(os.path.join(self.path, component_name), script_name, self.dev_mode, self.stdio, index=self.index)
         loader = loaders[component_name]
         return loader.get_best_plugin(version)
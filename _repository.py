@@ -18,18 +18,28 @@ from __future__ import absolute_import, division, print_function
 import os
 import sys
 import time
+import uuid
+import shlex
+import shutil
 import hashlib
+import tempfile
 from glob import glob
+from threading import Thread
 from multiprocessing import cpu_count
-from multiprocessing.pool import Pool
+from multiprocessing.pool import Pool, ThreadPool
 
 from _deploy import DeployStatus
 from _rpm import Package, PackageInfo, Version
 from _arch import getBaseArch
-from _environ import ENV_DISABLE_PARALLER_EXTRACT
+from _environ import ENV_DISABLE_PARALLER_EXTRACT, ENV_DISABLE_STREAM_EXTRACT, ENV_REPO_DISTRIBUTE_FANOUT, ENV_REPO_DISTRIBUTE_MIN_HOSTS
 from const import PKG_REPO_FILE
 from ssh import LocalClient
 from tool import DirectoryUtil, FileUtil, YamlLoader, COMMAND_ENV
+
+if sys.version_info.major == 2:
+    from Queue import Queue
+else:
+    from queue import Queue
 from _manager import Manager
 from _plugin import InstallPlugin
 
@@ -180,6 +190,117 @@ class Extractor(object):
         return True
 
 
+class StreamExtractor(object):
+
+    """
+    Decompress the rpm payload once and walk the cpio entries in order,
+    writing the needed files while they go past. Decompression runs in the
+    caller thread, disk writes are handed to a writer thread behind a bounded queue.
+    """
+
+    CPIO_NEWC_MAGIC = b'070701'
+    CPIO_HEADER_SIZE = 110
+    CPIO_TRAILER = 'TRAILER!!!'
+    CHUNK_SIZE = 1024 * 1024
+    QUEUE_SIZE = 64
+
+    def __init__(self, pkg, files, stdio=None):
+        self.pkg = pkg
+        self.files = files
+        self.stdio = stdio
+        self._error = None
+
+    @staticmethod
+    def _pad(offset):
+        return (4 - offset % 4) % 4
+
+    def _writer(self, queue):
+        # info is kept until its file is complete so that a broken file can be removed
+        fd = None
+        info = None
+        while True:
+            item = queue.get()
+            if item is None:
+                break
+            if self._error:
+                continue
+            try:
+                if isinstance(item, ExtractFileInfo):
+                    info = item
+                    fd = FileUtil.open(info.target_path, 'wb', stdio=self.stdio)
+                elif item is True:
+                    fd.close()
+                    fd = None
+                    if info.mode != 0o744:
+                        os.chmod(info.target_path, info.mode)
+                    info = None
+                else:
+                    fd.write(item)
+            except Exception as e:
+                self._error = e
+        if fd:
+            fd.close()
+        if info and os.path.exists(info.target_path):
+            os.remove(info.target_path)
+
+    def extract(self):
+        need_files = {}
+        for info in self.files:
+            if not os.path.exists(info.target_path):
+                need_files[info.src_path] = info
+        if not need_files:
+            return True
+
+        queue = Queue(self.QUEUE_SIZE)
+        writer = Thread(target=self._writer, args=(queue, ))
+        writer.daemon = True
+        writer.start()
+        try:
+            with self.pkg.open() as rpm:
+                stream = rpm.data_file
+                offset = 0
+                while need_files and not self._error:
+                    header = stream.read(self.CPIO_HEADER_SIZE)
+                    if len(header) < self.CPIO_HEADER_SIZE:
+                        break
+                    if header[:6] != self.CPIO_NEWC_MAGIC:
+                        raise Exception('bad cpio magic number %r in %s' % (header[:6], self.pkg.path))
+                    file_size = int(header[54:62], 16)
+                    name_size = int(header[94:102], 16)
+                    offset += self.CPIO_HEADER_SIZE
+                    name = stream.read(name_size)[:-1].decode('utf-8')
+                    offset += name_size
+                    stream.read(self._pad(offset))
+                    offset += self._pad(offset)
+                    if name == self.CPIO_TRAILER:
+                        break
+
+                    info = need_files.pop(name, None)
+                    if info:
+                        queue.put(info)
+                    remain = file_size
+                    while remain > 0:
+                        data = stream.read(min(remain, self.CHUNK_SIZE))
+                        if not data:
+                            raise Exception('unexpected end of payload in %s' % self.pkg.path)
+                        remain -= len(data)
+                        if info:
+                            queue.put(data)
+                    if info:
+                        queue.put(True)
+                    offset += file_size
+                    stream.read(self._pad(offset))
+                    offset += self._pad(offset)
+        finally:
+            queue.put(None)
+            writer.join()
+        if self._error:
+            raise self._error
+        if need_files:
+            raise Exception('%s not found in %s' % (', '.join(need_files), self.pkg.path))
+        return True
+
+
 class ParallerExtractor(object):
 
     MAX_PARALLER = cpu_count() * 2 if cpu_count() else 8
@@ -199,11 +320,26 @@ class ParallerExtractor(object):
         if not self.files:
             return
         
+        if not isinstance(self.pkg, LocalPackage) and not COMMAND_ENV.get(ENV_DISABLE_STREAM_EXTRACT, False):
+            if self._stream():
+                return True
         if sys.version_info.major == 2 or COMMAND_ENV.get(ENV_DISABLE_PARALLER_EXTRACT, False):
             return self._single()
         else:
             return self._paraller()
 
+    def _stream(self):
+        self.stdio and getattr(self.stdio, 'verbose', print)('extract mode: stream')
+        try:
+            return StreamExtractor(
+                self.pkg,
+                self.files,
+                stdio=self.stdio
+            ).extract()
+        except:
+            self.stdio and getattr(self.stdio, 'exception', print)('stream extract failed, fall back')
+        return False
+
     def _single(self):
         self.stdio and getattr(self.stdio, 'verbose', print)('extract mode: single')
         return Extractor(
@@ -247,6 +383,122 @@ class ParallerExtractor(object):
         return False
 
 
+class RepositoryManifest(object):
+
+    """
+    The digests of the files in a repository, so that a remote copy is brought up to date by sending only the files it misses.
+    Each line of the manifest file is `F<TAB>md5<TAB>mode<TAB>path`, `L<TAB>link to<TAB>path` or `D<TAB>mode<TAB>path`.
+    The paths are relative to the repository directory.
+    """
+
+    FILE_NAME = '.manifest'
+    BUFFER_SIZE = 1 << 20
+
+    def __init__(self, files=None, links=None, dirs=None):
+        # {path: (md5, mode)}
+        self.files = files if files is not None else {}
+        # {path: link to}
+        self.links = links if links is not None else {}
+        # {path: mode}
+        self.dirs = dirs if dirs is not None else {}
+
+    def __len__(self):
+        return len(self.files) + len(self.links) + len(self.dirs)
+
+    @staticmethod
+    def digest(path, size=None):
+        m = hashlib.md5()
+        with open(path, 'rb') as f:
+            while size is None or size > 0:
+                buf = f.read(RepositoryManifest.BUFFER_SIZE if size is None else min(size, RepositoryManifest.BUFFER_SIZE))
+                if not buf:
+                    break
+                m.update(buf)
+                if size is not None:
+                    size -= len(buf)
+        return m.hexdigest()
+
+    @classmethod
+    def build(cls, repository_dir):
+        manifest = cls()
+        for root, dirs, files in os.walk(repository_dir):
+            for name in dirs + files:
+                path = os.path.join(root, name)
+                rel_path = os.path.relpath(path, repository_dir)
+                if os.path.islink(path):
+                    manifest.links[rel_path] = os.readlink(path)
+                elif name in dirs:
+                    manifest.dirs[rel_path] = os.stat(path).st_mode & 0o777
+                elif rel_path not in (Repository._DATA_FILE, cls.FILE_NAME):
+                    manifest.files[rel_path] = (cls.digest(path), os.stat(path).st_mode & 0o777)
+        return manifest
+
+    def select(self, target_paths):
+        """
+        The part of the manifest under `target_paths`.
+        """
+        prefixes = []
+        for target_path in target_paths:
+            target_path = os.path.normpath(target_path)
+            if target_path == '.':
+                return self
+            prefixes.append(target_path)
+
+        def selected(path):
+            for prefix in prefixes:
+                if path == prefix or path.startswith(prefix + '/'):
+                    return True
+            return False
+        return self.__class__(
+            {path: value for path, value in self.files.items() if selected(path)},
+            {path: value for path, value in self.links.items() if selected(path)},
+            {path: value for path, value in self.dirs.items() if selected(path)}
+        )
+
+    def dumps(self):
+        lines = []
+        for path in sorted(self.dirs):
+            lines.append('D\t%o\t%s' % (self.dirs[path], path))
+        for path in sorted(self.files):
+            lines.append('F\t%s\t%o\t%s' % (self.files[path][0], self.files[path][1], path))
+        for path in sorted(self.links):
+            lines.append('L\t%s\t%s' % (self.links[path], path))
+        return '\n'.join(lines) + '\n'
+
+    @classmethod
+    def loads(cls, content):
+        manifest = cls()
+        for line in content.split('\n'):
+            items = line.split('\t')
+            try:
+                if items[0] == 'F' and len(items) == 4:
+                    manifest.files[items[3]] = (items[1], int(items[2], 8))
+                elif items[0] == 'L' and len(items) == 3:
+                    manifest.links[items[2]] = items[1]
+                elif items[0] == 'D' and len(items) == 3:
+                    manifest.dirs[items[2]] = int(items[1], 8)
+            except ValueError:
+                continue
+        return manifest
+
+    def dump(self, path, stdio=None):
+        try:
+            with open(path, 'w') as f:
+                f.write(self.dumps())
+            return True
+        except:
+            stdio and getattr(stdio, 'exception', print)('dump manifest to %s failed' % path)
+        return False
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, 'r') as f:
+                return cls.loads(f.read())
+        except:
+            return None
+
+
 class Repository(PackageInfo):
     
     _DATA_FILE = '.data'
@@ -255,6 +507,7 @@ class Repository(PackageInfo):
         self.repository_dir = repository_dir
         super(Repository, self).__init__(name, None, None, None, None, None)
         self.stdio = stdio
+        self._manifest = None
         self._load()
     
     @property
@@ -277,6 +530,23 @@ class Repository(PackageInfo):
         path = os.readlink(self.repository_dir) if os.path.islink(self.repository_dir) else self.repository_dir
         return os.path.join(path, Repository._DATA_FILE)
 
+    @property
+    def manifest_path(self):
+        return os.path.join(os.path.dirname(self.data_file_path), RepositoryManifest.FILE_NAME)
+
+    @property
+    def manifest(self):
+        """
+        The RepositoryManifest of this repository. It is generated by load_pkg, or on the first use for the repositories loaded before.
+        """
+        if self._manifest is None:
+            manifest = RepositoryManifest.load(self.manifest_path)
+            if manifest is None:
+                manifest = RepositoryManifest.build(self.repository_dir)
+                manifest.dump(self.manifest_path, stdio=self.stdio)
+            self._manifest = manifest
+        return self._manifest
+
     def bin_list(self, plugin):
         files = []
         if self.version and self.hash:
@@ -442,7 +712,8 @@ class Repository(PackageInfo):
             self.arch = pkg.arch
             self.size = pkg.size
             self.install_time = time.time()
-            if self._dump():
+            self._manifest = RepositoryManifest.build(self.repository_dir)
+            if self._manifest.dump(self.manifest_path, stdio=self.stdio) and self._dump():
                 return True
             else:
                 self.clear()
@@ -467,10 +738,250 @@ class Repository(PackageInfo):
         self._dump(**kwargs)
 
     def clear(self):
+        self._manifest = None
         if os.path.exists(self.repository_dir):
             return DirectoryUtil.rm(self.repository_dir, self.stdio) and DirectoryUtil.mkdir(self.repository_dir, stdio=self.stdio)
         return True
 
+class RepositoryDistributor(object):
+
+    """
+    Stage a repository in the obd home of many hosts through a tree. obd sends the repository to `fanout` hosts,
+    then every host having it serves the tar of the repository to `fanout` more hosts by a temporary http server,
+    so the uplink of obd does not bound the time. Every copy is verified by the digests of the manifest.
+    A host which fails in the tree is left to the install, which sends the repository from obd as before.
+    The http servers have no authentication: they serve only under a random path which obd passes to the fetching
+    hosts, and every server exits by itself when the estimated time of the distribution is over, in case obd is killed.
+    """
+
+    DEFAULT_MIN_HOSTS = 8
+    # the distribution is expected to send at least so many bytes per second through every level of the tree
+    SERVER_MIN_RATE = 5 << 20
+    # the least time a server lives, in seconds
+    SERVER_MIN_TTL = 60
+    SERVER_SCRIPT = '''import os, sys, signal
+try:
+    from http.server import HTTPServer, SimpleHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import HTTPServer
+    from SimpleHTTPServer import SimpleHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+class Handler(SimpleHTTPRequestHandler):
+    def send_head(self):
+        # only the files under the token dir are served, and no dir is listed
+        path = self.translate_path(self.path)
+        if not path.startswith(os.path.join(os.getcwd(), sys.argv[3], '')) or not os.path.isfile(path):
+            self.send_error(404)
+            return None
+        return SimpleHTTPRequestHandler.send_head(self)
+    def log_message(self, *args):
+        pass
+signal.alarm(int(sys.argv[2]))
+httpd = Server((sys.argv[1], 0), Handler)
+with open('port.tmp', 'w') as f:
+    f.write(str(httpd.server_address[1]))
+os.rename('port.tmp', 'port')
+httpd.serve_forever()
+'''
+    ARCHIVE_NAME = 'repository.tar'
+    DATA_NAME = 'data'
+    STAGING_NAME = 'repository'
+    STAGED_DATA_FILE = Repository._DATA_FILE + '.tmp'
+
+    def __init__(self, repository, home_path, stdio=None):
+        self.repository = repository
+        self.home_path = home_path
+        self.stdio = stdio
+        self.local_dir = os.path.dirname(repository.data_file_path)
+        self.rel_path = os.path.relpath(repository.repository_dir, home_path)
+        self.manifest_digest = None
+        self.fanout = self.get_fanout()
+        try:
+            self.min_hosts = int(COMMAND_ENV.get(ENV_REPO_DISTRIBUTE_MIN_HOSTS, self.DEFAULT_MIN_HOSTS))
+        except ValueError:
+            self.min_hosts = self.DEFAULT_MIN_HOSTS
+        # {client: remote repository dir}
+        self.remote_dirs = {}
+        # {client: (tmp dir, port)}
+        self.servers = {}
+        # the random path under which the servers serve the repository
+        self.token = None
+        # the time when the servers exit by themselves
+        self.deadline = 0
+        # the temporary dir which has a copy of the repository dir without .data, made of hard links
+        self.staging_dir = None
+
+    @staticmethod
+    def get_fanout():
+        try:
+            return int(COMMAND_ENV.get(ENV_REPO_DISTRIBUTE_FANOUT, 0))
+        except ValueError:
+            return 0
+
+    @property
+    def enabled(self):
+        return self.fanout > 0
+
+    def _prepare_command(self, remote_dir):
+        # the repository is not installed until the copy is verified, whatever a broken copy has left
+        return 'mkdir -p %(dir)s && rm -f %(dir)s/%(data)s %(dir)s/%(staged)s' % {
+            'dir': shlex.quote(remote_dir), 'data': Repository._DATA_FILE, 'staged': self.STAGED_DATA_FILE}
+
+    def _verify_command(self, remote_dir):
+        # .data marks the repository installed, so it is put in place only after the files pass the check
+        return "cd %(dir)s && { [ -f %(staged)s ] && awk -F'\\t' '$1==\"F\"{print $2\"  \"$4}' %(manifest)s | md5sum -c --status " \
+               "&& mv -f %(staged)s %(data)s || { rm -f %(staged)s %(data)s; exit 1; }; }" % {
+            'dir': shlex.quote(remote_dir), 'staged': self.STAGED_DATA_FILE, 'data': Repository._DATA_FILE,
+            'manifest': RepositoryManifest.FILE_NAME}
+
+    def _probe(self, client):
+        # the remote repository dir, and whether the same repository is there
+        rets = client.execute_commands([
+            'echo ${OBD_HOME:-"$HOME"}/.obd',
+            'cd ${OBD_HOME:-"$HOME"}/.obd/%s 2>/dev/null && [ -f %s ] && md5sum %s' % (shlex.quote(self.rel_path), Repository._DATA_FILE, RepositoryManifest.FILE_NAME)
+        ])
+        if not rets[0]:
+            return None, False
+        remote_dir = os.path.join(rets[0].stdout.strip(), self.rel_path)
+        return remote_dir, bool(rets[1]) and rets[1].stdout[:32] == self.manifest_digest
+
+    def _push(self, client):
+        remote_dir = self.remote_dirs[client]
+        sub_io = self.stdio.sub_io() if self.stdio else None
+        if not client.execute_command(self._prepare_command(remote_dir)):
+            return False
+        # the staging dir has no .data, which is sent under another name and put in place only after the check
+        for name, remote_name in [(None, None), (RepositoryManifest.FILE_NAME, RepositoryManifest.FILE_NAME), (Repository._DATA_FILE, self.STAGED_DATA_FILE)]:
+            if name is None:
+                ret = client.put_dir(os.path.join(self.staging_dir, self.STAGING_NAME), remote_dir, stdio=sub_io)
+            else:
+                ret = client.put_file(os.path.join(self.local_dir, name), os.path.join(remote_dir, remote_name), stdio=sub_io)
+            if not ret:
+                return False
+        return bool(client.execute_command(self._verify_command(remote_dir)))
+
+    def _start_server(self, client):
+        remote_dir = self.remote_dirs[client]
+        # .data is served apart from the archive, so that a fetching host stages it until verified
+        command = 'tmp=$(mktemp -d) && mkdir $tmp/%(token)s && tar -c -f $tmp/%(token)s/%(archive)s -C %(dir)s --exclude=./%(data)s . ' \
+                  '&& cp %(dir)s/%(data)s $tmp/%(token)s/%(data_name)s && cd $tmp && ' \
+                  'py=$(command -v python3 || command -v python) && ' \
+                  '(nohup $py -c %(script)s %(ip)s %(ttl)s %(token)s >/dev/null 2>&1 & echo $! > pid) && ' \
+                  'for i in $(seq 100); do [ -f port ] && break; sleep 0.1; done; echo $tmp; cat port' % {
+                      'archive': self.ARCHIVE_NAME, 'dir': shlex.quote(remote_dir), 'script': shlex.quote(self.SERVER_SCRIPT),
+                      'data': Repository._DATA_FILE, 'data_name': self.DATA_NAME, 'token': self.token,
+                      'ip': shlex.quote(client.config.host), 'ttl': max(int(self.deadline - time.time()), self.SERVER_MIN_TTL)}
+        ret = client.execute_command(command)
+        lines = ret.stdout.strip().split('\n') if ret else []
+        if len(lines) == 2 and lines[1].isdigit():
+            self.servers[client] = (lines[0], int(lines[1]))
+            self.stdio and getattr(self.stdio, 'verbose', print)('%s serves %s on port %s' % (client.config.host, self.repository, lines[1]))
+            return True
+        self.stdio and getattr(self.stdio, 'verbose', print)('%s can not serve %s' % (client.config.host, self.repository))
+        return False
+
+    def _stop_servers(self):
+        for client, (tmp_dir, _) in self.servers.items():
+            client.execute_command('kill $(cat %(tmp)s/pid); rm -rf %(tmp)s' % {'tmp': shlex.quote(tmp_dir)})
+        self.servers = {}
+
+    def _stage(self):
+        # hard links cost no space, a copy is made only when the obd home is on another file system
+        def link(src, dst):
+            try:
+                os.link(src, dst)
+            except OSError:
+                shutil.copy2(src, dst)
+        self.staging_dir = tempfile.mkdtemp(prefix='.distribute.', dir=self.home_path)
+        # .manifest is sent by itself too
+        shutil.copytree(self.local_dir, os.path.join(self.staging_dir, self.STAGING_NAME), symlinks=True, copy_function=link,
+                        ignore=lambda path, names: [Repository._DATA_FILE, RepositoryManifest.FILE_NAME] if path == self.local_dir else [])
+
+    def _get_ttl(self, hosts):
+        # the levels of the tree, each of which sends the repository once more
+        levels, count = 0, 1
+        while count < hosts:
+            count *= self.fanout + 1
+            levels += 1
+        size = sum(os.path.getsize(path) for path in DirectoryUtil.list_dir(self.local_dir) if os.path.isfile(path))
+        return self.SERVER_MIN_TTL + levels * size // self.SERVER_MIN_RATE
+
+    def _fetch(self, args):
+        client, parent = args
+        remote_dir = self.remote_dirs[client]
+        url = 'http://%s:%s/%s/' % (parent.config.host, self.servers[parent][1], self.token)
+        download = '(if command -v curl >/dev/null; then curl -sSf %(url)s; else wget -qO- %(url)s; fi)'
+        command = '%(archive)s | tar -x -p --no-same-owner -C %(dir)s -f - && %(data)s > %(dir)s/%(staged)s' % {
+            'dir': shlex.quote(remote_dir), 'staged': self.STAGED_DATA_FILE,
+            'archive': download % {'url': url + self.ARCHIVE_NAME}, 'data': download % {'url': url + self.DATA_NAME}}
+        return client.execute_command(self._prepare_command(remote_dir)) and client.execute_command(command) \
+            and client.execute_command(self._verify_command(remote_dir))
+
+    def distribute(self, clients):
+        """
+        :param clients: the clients of the hosts to install the repository to, one host may have many clients
+        :return: the clients of the hosts which have the repository now
+        """
+        if not self.enabled:
+            return []
+        hosts = {}
+        for client in clients:
+            hosts.setdefault((client.config.host, client.config.username), client)
+        if len(hosts) < self.min_hosts:
+            return []
+        self.manifest_digest = hashlib.md5(self.repository.manifest.dumps().encode('utf-8')).hexdigest()
+        self.repository.manifest.dump(self.repository.manifest_path, stdio=self.stdio)
+        self.token = uuid.uuid4().hex
+        self.deadline = time.time() + self._get_ttl(len(hosts))
+
+        stdio = self.stdio
+        stdio and getattr(stdio, 'start_loading', print)('Distribute %s to %s hosts' % (self.repository, len(hosts)))
+        pool = ThreadPool(processes=min(32, len(hosts)))
+        try:
+            self._stage()
+            pending = []
+            ready = []
+            for client, (remote_dir, staged) in zip(hosts.values(), pool.map(self._probe, hosts.values())):
+                if remote_dir is None:
+                    continue
+                self.remote_dirs[client] = remote_dir
+                (ready if staged else pending).append(client)
+            seeds, pending = pending[:self.fanout], pending[self.fanout:]
+            for client, ret in zip(seeds, pool.map(self._push, seeds)):
+                if ret:
+                    ready.append(client)
+            parents = [client for client in ready if self._start_server(client)]
+            while pending and parents:
+                tasks = []
+                for parent in parents:
+                    for _ in range(self.fanout):
+                        if pending:
+                            tasks.append((pending.pop(0), parent))
+                # every host fetched in this round serves in the next rounds too
+                for (client, _), ret in zip(tasks, pool.map(self._fetch, tasks)):
+                    if ret:
+                        ready.append(client)
+                        if self._start_server(client):
+                            parents.append(client)
+                    else:
+                        stdio and getattr(stdio, 'verbose', print)('%s failed to fetch %s' % (client.config.host, self.repository))
+            stdio and getattr(stdio, 'stop_loading', print)('succeed')
+            return ready
+        except:
+            stdio and getattr(stdio, 'exception', print)('')
+            stdio and getattr(stdio, 'stop_loading', print)('fail')
+            return []
+        finally:
+            self._stop_servers()
+            pool.close()
+            if self.staging_dir:
+                shutil.rmtree(self.staging_dir, ignore_errors=True)
+                self.staging_dir = None
+
+
 class RepositoryVO(object):
 
     def __init__(self, name, version, release, arch, md5, path, tags=[], size=0):
@@ -35,48 +35,102 @@ if sys.version_info.major == 2:
 
 class Version(str):
 
-    def __init__(self, bytes_or_buffer, encoding=None, errors=None):
+    """
+    The version strings are interned: Version(value) returns the same object for the same class and value,
+    and the compare value is parsed once when the object is created.
+    A Version equals the strings of the same compare value, e.g. Version('1.0') == '1.00', but it is hashed
+    by the compare value, not as a str. So the keys of a dict or set must be all Version or all str, never mixed:
+    Version('1.0') in {'1.0'} is False.
+    """
+
+    # {(class, value): instance}
+    _INSTANCES = {}
+    MAX_INSTANCES = 65536
+
+    def __new__(cls, bytes_or_buffer='', encoding=None, errors=None):
+        if bytes_or_buffer.__class__ is cls:
+            return bytes_or_buffer
+        if encoding is not None or errors is not None:
+            return cls._create(str(bytes_or_buffer, encoding or sys.getdefaultencoding(), errors or 'strict'))
+        key = (cls, str(bytes_or_buffer))
+        instance = cls._INSTANCES.get(key)
+        if instance is None:
+            if len(cls._INSTANCES) >= cls.MAX_INSTANCES:
+                cls._INSTANCES.clear()
+            instance = cls._INSTANCES[key] = cls._create(key[1])
+        return instance
+
+    @classmethod
+    def _create(cls, value):
+        instance = super(Version, cls).__new__(cls, value)
+        instance._cmp_value = cls._parse(value)
+        return instance
+
+    def __init__(self, bytes_or_buffer='', encoding=None, errors=None):
         super(Version, self).__init__()
 
+    def __getattr__(self, name):
+        # the objects restored by the old pickle protocols are not created by __new__
+        if name == '_cmp_value':
+            self._cmp_value = self._parse(str(self))
+            return self._cmp_value
+        raise AttributeError(name)
+
+    @staticmethod
+    def _parse(value):
+        return tuple((int(_i), _s) for _i, _s in re.findall(r'(\d+)([^\._]*)', value))
+
     @property
     def __cmp_value__(self):
-        return [(int(_i), _s) for _i, _s in re.findall('(\d+)([^\._]*)', self.__str__())]
+        return self._cmp_value
+
+    def _other_cmp_value(self, value):
+        if value.__class__ is not self.__class__:
+            value = self.__class__(value)
+        return value._cmp_value
+
+    def __hash__(self):
+        # consistent with __eq__ among Versions only, see the class docstring
+        return hash(self._cmp_value)
 
     def __eq__(self, value):
         if value is None:
             return False
-        return self.__cmp_value__ == self.__class__(value).__cmp_value__
+        return self._cmp_value == self._other_cmp_value(value)
+
+    def __ne__(self, value):
+        return not self.__eq__(value)
 
     def __gt__(self, value):
         if value is None:
             return True
-        return self.__cmp_value__ > self.__class__(value).__cmp_value__
+        return self._cmp_value > self._other_cmp_value(value)
 
     def __ge__(self, value):
         if value is None:
             return True
-        return self.__eq__(value) or self.__gt__(value)
+        return self._cmp_value >= self._other_cmp_value(value)
 
     def __lt__(self, value):
         if value is None:
             return False
-        return self.__cmp_value__ < self.__class__(value).__cmp_value__
+        return self._cmp_value < self._other_cmp_value(value)
 
     def __le__(self, value):
         if value is None:
             return False
-        return self.__eq__(value) or self.__lt__(value)
+        return self._cmp_value <= self._other_cmp_value(value)
 
 
 class Release(Version):
 
-    @property
-    def __cmp_value__(self):
-        m = re.search('(\d+)', self.__str__())
+    @staticmethod
+    def _parse(value):
+        m = re.search(r'(\d+)', value)
         return int(m.group(0)) if m else -1
 
     def simple(self):
-        m = re.search('(\d+)', self.__str__())
+        m = re.search(r'(\d+)', self.__str__())
         return m.group(0) if m else ""
 
 class PackageInfo(object):
@@ -177,7 +231,7 @@ def add_sub_version(version, offset=1, add=1):
     :param add: the add value
     :return: the new version after adding
     """
-    version_array = version.__cmp_value__
+    version_array = list(version.__cmp_value__)
     version_array[offset-1] = (version_array[offset-1][0] + add, version_array[offset-1][1])
     return get_version_from_array(version_array)
 
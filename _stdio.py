@@ -26,17 +26,16 @@ import six
 import logging
 import ast
 from copy import deepcopy
-from logging import handlers
 
 from enum import Enum
 from halo import Halo, cursor
 from colorama import Fore
 from prettytable import PrettyTable
 from progressbar import AdaptiveETA, Bar, SimpleProgress, ETA, FileTransferSpeed, Percentage, ProgressBar
-from types import MethodType
+from types import FunctionType
 from inspect2 import Parameter
 
-from log import Logger
+from log import Logger, TraceFileHandler, TRACE_LOG_INDEX
 
 
 if sys.version_info.major == 3:
@@ -366,6 +365,103 @@ class MsgLevel(object):
     NOTSET = 0
 
 
+class LogMasking(object):
+
+    """
+    Mask the sensitive information in log messages.
+    All patterns are compiled once. A message is only scanned by the rules when
+    one of the keywords is found in it, and the rules are tried in a fixed order,
+    the first rule that matches decides the output.
+    """
+
+    KEYWORDS = ["IDENTIFIED", "PASSWORD", "CONNECT", "EXECUTER", "CLIENT", "PASSWD", "_PASSKEY", "SUDO", "ACCESS_", "HOST INIT", "CHPASSWD"]
+    KEYWORDS_PATTERN = re.compile('|'.join([re.escape(keyword) for keyword in KEYWORDS]))
+
+    PROMPT_PATTERN = re.compile(r"((-P\s*\S+\s+.*?)-p\s*['\"]+)([^\s'\"']+)(['\"]*)")
+    BASE_PATTERNS = [
+        re.compile(r"((-P\s*\S+\s+.*?)-p\s*['\"]?)([^\s'\"']+)(['\"]*)"),
+        re.compile(r"(_PASSWORD\s*(=|to)\s*['\"]*)([^\s'\"']+)(['\"]*)"),
+        re.compile(r'(?i)(password([:|=]))(?! \S)(.*?)(,|\s)')
+    ]
+    IPV4_PATTERN = re.compile(r'\b(?:\d{1,3}\.){2}\d{1,3}\.\d{1,3}\b')
+    PRINT_PASSWORD_PATTERN = re.compile(r'(?i)(password([:|=]))(?! \S)(.*?)(,|\s)')
+    TABLE_PASSWORD_PATTERN = re.compile(r"(\|\s*http://[^\s]+\s*\|\s*\S+\s*\|\s*')([^']*)('\s*\|\s*active\s*\|)")
+    TABLE_ACCESS_PATTERN = re.compile(r"(access_id=)[^&]*|(access_key=)[^&,| ]*")
+
+    def __init__(self, access_regex, cdcro=True):
+        # (triggers, pattern, replacement), the rule is skipped when none of the triggers is in the message
+        self.rules = [
+            (("access_id", "access_key"), re.compile(access_regex), r'\1******'),
+            (("_passkey", ), re.compile(r"([\"']?[\w]*_passkey[\w]*[\"']?\s*:\s*)(?:'([^']*)'|(None))"), r'\1******'),
+            (("IDENTIFIED BY", ), None, desensitize_sql_pwd),
+            (("host init", ), re.compile(r'(obd host init\s+.*?)(-p\s+)([^\s\'\"\`]+)'), r'\1\2******'),
+            (("chpasswd", ), re.compile(r'(echo\s*"[^:]+:)([^"]+)(".*chpasswd)'), r'\1******\3'),
+        ]
+        if cdcro:
+            self.rules.append((("cdcro", ), re.compile(r'(?i)(PASSWORD\s+`)([^`]+)(`)'), r"\1******\3"))
+        self.rules += [
+            (None, re.compile(r"(_password \S+.*args:\s*\[['\"]?)([^\s'\"']+)(['\"]*)"), r"\1******\3"),
+            (None, re.compile(r'(?i)((password|passwd)[:|=]\s*)(.*)'), r"\1******"),
+            (None, re.compile(r'(?i)((password)\s*\":\s*\")(.*?)(\")'), r"\1******\4"),
+            (None, re.compile(r"(.*echo\s+)(.*)(\s+\|\s+sudo\s+-S)"), r"\1******\3"),
+            (None, re.compile(r'(\'password\':\s*\')([^\']+)(\')'), r"\1******\3"),
+        ]
+
+    @classmethod
+    def contains_keys(cls, msg):
+        return cls.KEYWORDS_PATTERN.search(msg.upper()) is not None
+
+    def mask(self, msg, ip_masking=False):
+        if isinstance(msg, str) and self.contains_keys(msg):
+            if "--prompt" in msg:
+                return self.PROMPT_PATTERN.sub(r"\1******\4", msg)
+            count = 0
+            for pattern in self.BASE_PATTERNS:
+                msg, count = pattern.subn(r"\1******\4", msg)
+            # only the last base pattern decides whether to stop here
+            if count:
+                return msg
+            for triggers, pattern, replacement in self.rules:
+                if triggers and not any(trigger in msg for trigger in triggers):
+                    continue
+                if pattern is None:
+                    return replacement(msg)
+                masked_msg, count = pattern.subn(replacement, msg)
+                if count:
+                    return masked_msg
+
+        if ip_masking:
+            msg = self.IPV4_PATTERN.sub("***.***.***.***", msg)
+
+        return msg
+
+    @classmethod
+    def print_masking(cls, msg):
+        is_match = cls.PRINT_PASSWORD_PATTERN.search(msg)
+        if is_match:
+            password_length = len(is_match.group(3))
+            replacement = r"\1" + '*' * password_length + r"\4"
+            msg = cls.PRINT_PASSWORD_PATTERN.sub(replacement, msg)
+        return msg
+
+    @classmethod
+    def table_masking(cls, msg):
+        str_msg = str(msg)
+        if 'active' in str_msg:
+            match = cls.TABLE_PASSWORD_PATTERN.search(str_msg)
+            if match:
+                masked_password = "*"*len(match.group(2))
+                str_msg = cls.TABLE_PASSWORD_PATTERN.sub(rf"\1{masked_password}\3", str_msg)
+        elif 'access_' in str_msg:
+            def replace_with_stars(match):
+                full_match = match.group(0)  # Full match including prefix
+                key, value = full_match.split('=', 1)  # Split into key and value
+                masked_value = '*' * len(value)  # Create the mask
+                return f"{key}={masked_value}"
+            str_msg = cls.TABLE_ACCESS_PATTERN.sub(replace_with_stars, str_msg)
+        return str_msg
+
+
 class IO(object):
 
     WIDTH = 64
@@ -454,7 +550,7 @@ class IO(object):
             return self._root_io.trace_logger
         if self.log_path and self._trace_logger is None:
             self._trace_logger = Logger(self.log_name)
-            handler = handlers.TimedRotatingFileHandler(self.log_path, when='midnight', interval=1, backupCount=30)
+            handler = TraceFileHandler(self.log_path, trace_id=self.trace_id, when='midnight', interval=1, backupCount=30)
             if self.trace_id:
                 handler.setFormatter(logging.Formatter("[%%(asctime)s.%%(msecs)03d] [%s] [%%(levelname)s] %%(message)s" % self.trace_id, "%Y-%m-%d %H:%M:%S"))
             else:
@@ -468,6 +564,19 @@ class IO(object):
             return self._root_io.trace_id
         return self._trace_id
 
+    def read_trace_log(self, trace_id=None, offset=0):
+        """
+        Read the log lines of `trace_id` written by this process after `offset`.
+
+        :return: (content, offset for the next read), None if the trace is unknown
+        """
+        if self._root_io:
+            return self._root_io.read_trace_log(trace_id, offset)
+        trace_id = trace_id or self.trace_id
+        if not trace_id or not self.log_path:
+            return None
+        return TRACE_LOG_INDEX.read(trace_id, self.log_path, offset)
+
     @property
     def log_path(self):
         if self._root_io:
@@ -483,7 +592,7 @@ class IO(object):
     @property
     def log_cache(self):
         if self._root_io:
-            self._root_io.log_cache
+            return self._root_io.log_cache
         return self._log_cache
 
     def before_close(self):
@@ -765,13 +874,7 @@ class IO(object):
         print_msg = str(print_msg)
         if "PASSWORD" in print_msg and "IP_LIST=" not in print_msg:
             print_msg = self._format(print_msg, *args)
-            pk_regex = r'(?i)(password([:|=]))(?! \S)(.*?)(,|\s)'
-            pattern = re.compile(pk_regex)
-            is_match = pattern.search(print_msg)
-            if is_match:
-                password_length = len(is_match.group(3))
-                replacement = r"\1" + '*' * password_length + r"\4"
-                print_msg = pattern.sub(replacement, print_msg)
+            print_msg = LogMasking.print_masking(print_msg)
         kwargs['file'] and print(self._format(print_msg, *args), **kwargs)
         del kwargs['file']
         enaable_log and self.log(msg_lv, print_msg, *args, **kwargs)
@@ -833,197 +936,17 @@ class IO(object):
             self.exit(code)
 
     def contains_keys(self, msg):
-        keywords = ["IDENTIFIED", "PASSWORD", "CONNECT", "EXECUTER", "CLIENT", "PASSWD", "_PASSKEY", "SUDO", "ACCESS_", "HOST INIT", "CHPASSWD"]
-        return any(keyword in msg.upper() for keyword in keywords)
-    
+        return LogMasking.contains_keys(msg)
+
     def table_log_masking(self, msg):
-        regex = r"(\|\s*http://[^\s]+\s*\|\s*\S+\s*\|\s*')([^']*)('\s*\|\s*active\s*\|)"
-        pattern = re.compile(regex)
-        str_msg = str(msg)
-        if 'active' in str_msg:
-            match = re.search(pattern, str_msg)
-            if match:
-                masked_password = "*"*len(match.group(2))
-                str_msg = pattern.sub(rf"\1{masked_password}\3", str_msg)
-        elif 'access_' in str_msg:
-            access_regex = r"(access_id=)[^&]*|(access_key=)[^&,| ]*"
-            access_pattern = re.compile(access_regex)
-            def replace_with_stars(match):
-                full_match = match.group(0)  # Full match including prefix
-                key, value = full_match.split('=', 1)  # Split into key and value
-                masked_value = '*' * len(value)  # Create the mask
-                return f"{key}={masked_value}"
-            match = re.search(access_pattern, str_msg)
-            if match:
-                str_msg = re.sub(access_pattern, replace_with_stars, str_msg)
-        return str_msg
+        return LogMasking.table_masking(msg)
 
     @staticmethod
     def log_masking_static(msg):
-        def contains_keys(msg):
-            keywords = ["IDENTIFIED", "PASSWORD", "CONNECT", "EXECUTER", "CLIENT", "PASSWD", "_PASSKEY", "SUDO",
-                        "ACCESS_", "HOST INIT", "CHPASSWD"]
-            return any(keyword in msg.upper() for keyword in keywords)
-
-        log_regex = [
-            r"((-P\s*\S+\s+.*?)-p\s*['\"]?)([^\s'\"']+)(['\"]*)",
-            r"(_PASSWORD\s*(=|to)\s*['\"]*)([^\s'\"']+)(['\"]*)",
-            r'(?i)(password([:|=]))(?! \S)(.*?)(,|\s)'
-        ]
-        patterns = []
-        is_match = False
-
-        for regex in log_regex:
-            patterns.append(re.compile(regex))
-        if isinstance(msg, str) and contains_keys(msg):
-            if "--prompt" in msg:
-                prompt_regex = r"((-P\s*\S+\s+.*?)-p\s*['\"]+)([^\s'\"']+)(['\"]*)"
-                pattern = re.compile(prompt_regex)
-                return pattern.sub(r"\1******\4", msg)
-            for pattern in patterns:
-                is_match = pattern.search(msg)
-                msg = pattern.sub(r"\1******\4", msg)
-            if is_match:
-                return msg
-            if "access_id" in msg or "access_key" in msg:
-                access_regex = r'(access_id=|access_key=)([^&\']+)'
-                access_pattern = re.compile(access_regex)
-                if access_pattern.search(msg):
-                    return access_pattern.sub(r'\1******', msg)
-
-            if "_passkey" in msg:
-                passkey_regex = r"([\"']?[\w]*_passkey[\w]*[\"']?\s*:\s*)(?:'([^']*)'|(None))"
-                passkey_pattern = re.compile(passkey_regex)
-                if passkey_pattern.search(msg):
-                    return passkey_pattern.sub(r'\1******', msg)
-            
-            if "IDENTIFIED BY" in msg:
-                return desensitize_sql_pwd(msg)
-
-            if "host init" in msg:
-                host_reg = r'(obd host init\s+.*?)(-p\s+)([^\s\'\"\`]+)'
-                host_pattern = re.compile(host_reg)
-                if host_pattern.search(msg):
-                    return host_pattern.sub(r'\1\2******', msg)
-
-            if "chpasswd" in msg:
-                chpasswd_reg = r'(echo\s*"[^:]+:)([^"]+)(".*chpasswd)'
-                chpasswd_pattern = re.compile(chpasswd_reg)
-                if chpasswd_pattern.search(msg):
-                    return chpasswd_pattern.sub(r'\1******\3', msg)
-
-            pwd_args_regex = r"(_password \S+.*args:\s*\[['\"]?)([^\s'\"']+)(['\"]*)"
-            arg_pattern = re.compile(pwd_args_regex)
-            if arg_pattern.search(msg):
-                return arg_pattern.sub(r"\1******\3", msg)
-
-            passwd_regex = r'(?i)((password|passwd)[:|=]\s*)(.*)'
-            pwd_pattern = re.compile(passwd_regex)
-            if pwd_pattern.search(msg):
-                return pwd_pattern.sub(r"\1******", msg)
-
-            http_regex = r'(?i)((password)\s*\":\s*\")(.*?)(\")'
-            http_pattern = re.compile(http_regex)
-            if http_pattern.search(msg):
-                return http_pattern.sub(r"\1******\4", msg)
-
-            echo_pwd_regex = r"(.*echo\s+)(.*)(\s+\|\s+sudo\s+-S)"
-            pwd_pattern = re.compile(echo_pwd_regex)
-            if pwd_pattern.search(msg):
-                return pwd_pattern.sub(r"\1******\3", msg)
-
-            opts_regex = r'(\'password\':\s*\')([^\']+)(\')'
-            opts_pattern = re.compile(opts_regex)
-            if opts_pattern.search(msg):
-                return opts_pattern.sub(r"\1******\3", msg)
-
-        return msg
+        return STATIC_LOG_MASKING.mask(msg)
 
     def log_masking(self, msg, ip_masking=False):
-        log_regex = [
-            r"((-P\s*\S+\s+.*?)-p\s*['\"]?)([^\s'\"']+)(['\"]*)",
-            r"(_PASSWORD\s*(=|to)\s*['\"]*)([^\s'\"']+)(['\"]*)",
-            r'(?i)(password([:|=]))(?! \S)(.*?)(,|\s)'
-        ]
-        patterns = []
-        is_match = False
-
-        for regex in log_regex:
-            patterns.append(re.compile(regex))
-        if isinstance(msg, str) and self.contains_keys(msg):
-            if "--prompt" in msg:
-                prompt_regex = r"((-P\s*\S+\s+.*?)-p\s*['\"]+)([^\s'\"']+)(['\"]*)"
-                pattern = re.compile(prompt_regex)
-                return pattern.sub(r"\1******\4", msg)
-            for pattern in patterns:
-                is_match = pattern.search(msg)
-                msg = pattern.sub(r"\1******\4", msg)
-            if is_match:
-                return msg
-            if "access_id" in msg or "access_key" in msg:
-                access_regex = r'(access_id=|access_key=)([^&\',]+)'
-                access_pattern = re.compile(access_regex)
-                if access_pattern.search(msg):
-                    return access_pattern.sub(r'\1******', msg)
-
-            if "_passkey" in msg:
-                passkey_regex = r"([\"']?[\w]*_passkey[\w]*[\"']?\s*:\s*)(?:'([^']*)'|(None))"
-                passkey_pattern = re.compile(passkey_regex)
-                if passkey_pattern.search(msg):
-                    return passkey_pattern.sub(r'\1******', msg)
-
-            if "IDENTIFIED BY" in msg:
-                return desensitize_sql_pwd(msg)
-
-            if "host init" in msg:
-                host_reg = r'(obd host init\s+.*?)(-p\s+)([^\s\'\"\`]+)'
-                host_pattern = re.compile(host_reg)
-                if host_pattern.search(msg):
-                    return host_pattern.sub(r'\1\2******', msg)
-
-            if "chpasswd" in msg:
-                chpasswd_reg = r'(echo\s*"[^:]+:)([^"]+)(".*chpasswd)'
-                chpasswd_pattern = re.compile(chpasswd_reg)
-                if chpasswd_pattern.search(msg):
-                    return chpasswd_pattern.sub(r'\1******\3', msg)
-
-            if "cdcro" in msg:
-                cdcr_reg = r'(?i)(PASSWORD\s+`)([^`]+)(`)'
-                cdcr_pattern = re.compile(cdcr_reg)
-                if cdcr_pattern.search(msg):
-                    return cdcr_pattern.sub(r"\1******\3", msg)
-
-
-            pwd_args_regex = r"(_password \S+.*args:\s*\[['\"]?)([^\s'\"']+)(['\"]*)"
-            arg_pattern = re.compile(pwd_args_regex)
-            if arg_pattern.search(msg):
-                return arg_pattern.sub(r"\1******\3", msg)
-
-            passwd_regex = r'(?i)((password|passwd)[:|=]\s*)(.*)'
-            pwd_pattern = re.compile(passwd_regex)
-            if pwd_pattern.search(msg):
-                return pwd_pattern.sub(r"\1******", msg)
-
-            http_regex = r'(?i)((password)\s*\":\s*\")(.*?)(\")'
-            http_pattern = re.compile(http_regex)
-            if http_pattern.search(msg):
-                return http_pattern.sub(r"\1******\4", msg)
-
-            echo_pwd_regex = r"(.*echo\s+)(.*)(\s+\|\s+sudo\s+-S)"
-            pwd_pattern = re.compile(echo_pwd_regex)
-            if pwd_pattern.search(msg):
-                return pwd_pattern.sub(r"\1******\3", msg)
-
-            opts_regex = r'(\'password\':\s*\')([^\']+)(\')'
-            opts_pattern = re.compile(opts_regex)
-            if opts_pattern.search(msg):
-                return opts_pattern.sub(r"\1******\3", msg)
-
-        if ip_masking:
-            ipv4_pattern = r'\b(?:\d{1,3}\.){2}\d{1,3}\.\d{1,3}\b'
-            msg = re.sub(ipv4_pattern, "***.***.***.***", msg)
-
-        return msg
+        return LOG_MASKING.mask(msg, ip_masking=ip_masking)
 
     def verbose(self, msg, *args, **kwargs):
         if self.level > self.VERBOSE_LEVEL:
@@ -1083,6 +1006,61 @@ class IO(object):
             print_stack(''.join(lines))
 
 
+class BufferedIO(IO):
+    """
+    A detached IO for plugins running at the same time. Output and log records are held back
+    and replayed on the parent IO by `flush`, so that concurrent output stays in order.
+    """
+
+    def __init__(self, parent):
+        super(BufferedIO, self).__init__(
+            parent.level,
+            msg_lv=parent.msg_lv,
+            use_cache=True,
+            track_limit=parent.track_limit,
+            output_stream=BufferIO(False)
+        )
+        self.parent = parent
+        self.default_confirm = parent.default_confirm
+
+    @property
+    def trace_logger(self):
+        return self.parent.trace_logger
+
+    def sub_io(self, msg_lv=None):
+        if msg_lv is None:
+            msg_lv = self.msg_lv
+        return IO(
+            self.level + 1,
+            msg_lv=msg_lv,
+            track_limit=self.track_limit,
+            root_io=self
+        )
+
+    def read(self, msg='', blocked=False):
+        return self.parent.read(msg, blocked=blocked)
+
+    def confirm(self, msg, default_option=''):
+        return self.parent.confirm(msg, default_option)
+
+    def exit(self, code):
+        # leave the buffers to be flushed by the owner thread
+        raise SystemExit(code)
+
+    def flush(self):
+        if self.sync_obj:
+            self._clear_sync_ctx()
+        text = self._out_obj.read()
+        self._out_obj.clear()
+        text and self.parent.print(text, end='', _disable_log=True)
+        log_cache, self._log_cache = self._log_cache, []
+        for levelno, line, args, kwargs in log_cache:
+            self.parent._cache_log(levelno, line, *args, **kwargs)
+
+    def _close(self):
+        self.flush()
+
+
 class _Empty(object):
     pass
 
@@ -1155,10 +1133,9 @@ def safe_stdio_decorator(default_stdio=None):
             default_stdio_in_params = all_parameters["stdio"].default
             if not isinstance(default_stdio_in_params, Parameter.empty):
                 _default_stdio = default_stdio_in_params or default_stdio
+            _index = list(all_parameters.keys()).index("stdio")
 
             def func_wrapper(*args, **kwargs):
-                _params_keys = list(all_parameters.keys())
-                _index = _params_keys.index("stdio")
                 if "stdio" not in kwargs and len(args) > _index:
                     stdio = get_stdio(args[_index])
                     tmp_args = list(args)
@@ -1173,6 +1150,39 @@ def safe_stdio_decorator(default_stdio=None):
             return _type(func) if is_bond_method else func
     return decorated
 
+
+def safe_stdio_method(func):
+    """
+    Wrap a method with a `stdio` parameter, the stdio defaults to `self.stdio`.
+    The parameter lookup is done once here instead of on each call.
+    """
+    if getattr(func, '_safe_stdio', False):
+        return func
+    parameters = list(inspect2.signature(func).parameters.values())
+    names = [parameter.name for parameter in parameters]
+    if "stdio" not in names:
+        return func
+    parameter = parameters[names.index("stdio")]
+    default_stdio = None if parameter.default is Parameter.empty else parameter.default
+    # the position of stdio in args, without self
+    index = names.index("stdio") - 1 if parameter.kind == Parameter.POSITIONAL_OR_KEYWORD else None
+
+    def wrapper(self, *args, **kwargs):
+        if index is not None and len(args) > index:
+            args = args[:index] + (get_stdio(args[index]), ) + args[index + 1:]
+        elif "stdio" in kwargs:
+            kwargs["stdio"] = get_stdio(kwargs["stdio"])
+        else:
+            kwargs["stdio"] = get_stdio(default_stdio or getattr(self, "stdio", None))
+        return func(self, *args, **kwargs)
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    wrapper.__module__ = func.__module__
+    wrapper.__wrapped__ = func
+    wrapper._safe_stdio = True
+    return wrapper
+
+
 def desensitize_sql_pwd(sql_str):
     if 'IDENTIFIED BY "' in sql_str:
         pattern = r'(IDENTIFIED BY\s*)"[^"]*"'
@@ -1204,16 +1214,16 @@ class SafeStdioMeta(type):
 
     @staticmethod
     def _init_wrapper_func(func):
+        if getattr(func, '_safe_stdio', False):
+            return func
+        init = safe_stdio_decorator(FAKE_IO)(func)
+
         def wrapper(*args, **kwargs):
-            setattr(args[0], "_wrapper_func", {})
-            safe_stdio_decorator(FAKE_IO)(func)(*args, **kwargs)
+            init(*args, **kwargs)
             if "stdio" in args[0].__dict__:
                 args[0].__dict__["stdio"] = get_stdio(args[0].__dict__["stdio"])
-
-        if func.__name__ != wrapper.__name__:
-            return wrapper
-        else:
-            return func
+        wrapper._safe_stdio = True
+        return wrapper
 
     def __new__(mcs, name, bases, attrs):
 
@@ -1222,36 +1232,25 @@ class SafeStdioMeta(type):
                 continue
             if isinstance(attr, (staticmethod, classmethod)):
                 attrs[key] = safe_stdio_decorator()(attr)
+            elif isinstance(attr, FunctionType):
+                attrs[key] = safe_stdio_method(attr)
         cls = type.__new__(mcs, name, bases, attrs)
+        # methods from bases which are not SafeStdio
+        for base in cls.__mro__[1:]:
+            if isinstance(base, SafeStdioMeta) or base is object:
+                continue
+            for key, attr in base.__dict__.items():
+                if key.startswith("__") and key.endswith("__") or not isinstance(attr, FunctionType):
+                    continue
+                if getattr(cls, key, None) is getattr(base, key, None):
+                    setattr(cls, key, safe_stdio_method(attr))
         cls.__init__ = mcs._init_wrapper_func(cls.__init__)
         return cls
 
 
-class _StayTheSame(object):
+class SafeStdio(six.with_metaclass(SafeStdioMeta)):
     pass
 
 
-STAY_THE_SAME = _StayTheSame()
-
-
-class SafeStdio(six.with_metaclass(SafeStdioMeta)):
-    _wrapper_func = {}
-
-    def __getattribute__(self, item):
-        _wrapper_func = super(SafeStdio, self).__getattribute__("_wrapper_func")
-        if item not in _wrapper_func:
-            attr = super(SafeStdio, self).__getattribute__(item)
-            if (not item.startswith("__") or not item.endswith("__")) and isinstance(attr, MethodType):
-                if "stdio" in inspect2.signature(attr).parameters:
-                    _wrapper_func[item] = safe_stdio_decorator(default_stdio=getattr(self, "stdio", None))(attr)
-                    return _wrapper_func[item]
-            _wrapper_func[item] = STAY_THE_SAME
-            return attr
-        if _wrapper_func[item] is STAY_THE_SAME:
-            return super(SafeStdio, self).__getattribute__(item)
-        return _wrapper_func[item]
-
-    def __setattr__(self, key, value):
-        if key in self._wrapper_func:
-            del self._wrapper_func[key]
-        return super(SafeStdio, self).__setattr__(key, value)
+LOG_MASKING = LogMasking(r'(access_id=|access_key=)([^&\',]+)')
+STATIC_LOG_MASKING = LogMasking(r'(access_id=|access_key=)([^&\']+)', cdcro=False)
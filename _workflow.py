@@ -20,7 +20,7 @@ import sys
 from copy import deepcopy
 
 from _manager import Manager
-from _plugin import ComponentPluginLoader, pyScriptPluginExec, PyScriptPluginLoader, PyScriptPlugin
+from _plugin import ComponentPluginLoader, pyScriptPluginExec, PyScriptPluginLoader, PyScriptPlugin, PluginIndex
 from tool import OrderedDict
 
 
@@ -206,7 +206,7 @@ def workflowTemplateExec(func):
 
 class WorkflowLoader(ComponentWorkflowLoader):
 
-    def __init__(self, home_path, workflow_name=None, dev_mode=False, stdio=None):
+    def __init__(self, home_path, workflow_name=None, dev_mode=False, stdio=None, index=None):
         if not workflow_name:
             raise NotImplementedError
         type_name = 'PY_SCRIPT_WORKFLOW_%s' % workflow_name.upper()
@@ -214,41 +214,32 @@ class WorkflowLoader(ComponentWorkflowLoader):
         self.PLUGIN_TYPE = PyScriptPluginLoader.PyScriptPluginType(type_name, type_value)
         if not getattr(sys.modules[__name__], type_value, False):
             self._create_(workflow_name)
-        super(WorkflowLoader, self).__init__(home_path, dev_mode=dev_mode, stdio=stdio)
+        super(WorkflowLoader, self).__init__(home_path, dev_mode=dev_mode, stdio=stdio, index=index)
         self.workflow_name = workflow_name
 
     def _create_(self, workflow_name):
-        exec('''
-class %s(PyScriptPlugin):
-
-    FLAG_FILE = '%s.py'
-    PLUGIN_NAME = '%s'
-
-    def __init__(self, component_name, plugin_path, version, dev_mode):
-        super(%s, self).__init__(component_name, plugin_path, version, dev_mode)
-
-    @staticmethod
-    def set_plugin_type(plugin_type):
-        %s.PLUGIN_TYPE = plugin_type
-
-    @workflowTemplateExec
-    def %s(
-        self, namespace, namespaces, deploy_name, deploy_status,
-        repositories, components, clients, cluster_config, cmd,
-        options, stdio, *arg, **kwargs):
-        pass
-        ''' % (self.PLUGIN_TYPE.value, workflow_name, workflow_name, self.PLUGIN_TYPE.value, self.PLUGIN_TYPE.value, workflow_name))
-        clz = locals()[self.PLUGIN_TYPE.value]
+        def _func(
+            self, namespace, namespaces, deploy_name, deploy_status,
+            repositories, components, clients, cluster_config, cmd,
+            options, stdio, *arg, **kwargs):
+            pass
+        _func.__name__ = workflow_name
+        clz = type(self.PLUGIN_TYPE.value, (PyScriptPlugin, ), {
+            '__module__': __name__,
+            'FLAG_FILE': '%s.py' % workflow_name,
+            'PLUGIN_NAME': workflow_name,
+            'PLUGIN_TYPE': self.PLUGIN_TYPE,
+            workflow_name: workflowTemplateExec(_func)
+        })
         setattr(sys.modules[__name__], self.PLUGIN_TYPE.value, clz)
-        clz.set_plugin_type(self.PLUGIN_TYPE)
         return clz
 
 
 class ComponentWorkflowLoader(WorkflowLoader):
 
-    def __init__(self, home_path, component_name, workflow_name=None, dev_mode=False, stdio=None):
-        super(ComponentWorkflowLoader, self).__init__(os.path.join(home_path, component_name), workflow_name, dev_mode=dev_mode, stdio=stdio)
-        self._general_loader = WorkflowLoader(os.path.join(home_path, "general"), workflow_name, dev_mode=dev_mode, stdio=stdio)
+    def __init__(self, home_path, component_name, workflow_name=None, dev_mode=False, stdio=None, index=None):
+        super(ComponentWorkflowLoader, self).__init__(os.path.join(home_path, component_name), workflow_name, dev_mode=dev_mode, stdio=stdio, index=index)
+        self._general_loader = WorkflowLoader(os.path.join(home_path, "general"), workflow_name, dev_mode=dev_mode, stdio=stdio, index=index)
         self._general_loader.component_name = component_name
 
 
@@ -264,10 +255,12 @@ class ComponentWorkflowLoader(WorkflowLoader):
 class WorkflowManager(Manager):
 
     RELATIVE_PATH = 'workflows'
+    CACHE_RELATIVE_PATH = '.cache/workflows'
     # The directory structure for plugin is ./workflows/{component_name}/{version}
 
     def __init__(self, home_path, dev_mode=False, stdio=None):
         super(WorkflowManager, self).__init__(home_path, stdio=stdio)
+        self.index = PluginIndex(self.path, os.path.join(home_path, self.CACHE_RELATIVE_PATH), stdio=stdio)
         self.workflow_loaders = {}
         self.dev_mode = dev_mode
 
@@ -275,7 +268,7 @@ class WorkflowManager(Manager):
         if component_name not in self.workflow_loaders:
             self.workflow_loaders[component_name] = {}
         if workflow_name not in self.workflow_loaders[component_name]:
-            self.workflow_loaders[component_name][workflow_name] = ComponentWorkflowLoader(self.path, component_name, workflow_name, self.dev_mode, stdio=self.stdio)
+            self.workflow_loaders[component_name][workflow_name] = ComponentWorkflowLoader(self.path, component_name, workflow_name, self.dev_mode, stdio=self.stdio, index=self.index)
         return self.workflow_loaders[component_name][workflow_name]
 
     def get_workflow_template(self, workflow_name, component_name, version):
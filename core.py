@@ -25,23 +25,24 @@ from copy import deepcopy, copy
 
 import tempfile
 from subprocess import call as subprocess_call
+from concurrent.futures import ThreadPoolExecutor
 
 import const
 import tool
-from ssh import SshClient, SshConfig, get_root_permission_localclient
+from ssh import SshClient, SshConfig, get_root_permission_localclient, concurrent_connect
 from tool import FileUtil, DirectoryUtil, YamlLoader, timeout, COMMAND_ENV, OrderedDict, NetUtil
-from _stdio import MsgLevel, FormatText
+from _stdio import MsgLevel, FormatText, BufferedIO
 from _rpm import Version
 from _mirror import MirrorRepositoryManager, PackageInfo, _NO_LSE
-from _plugin import PluginManager, PluginType, InstallPlugin, PluginContextNamespace
+from _plugin import PluginManager, PluginType, InstallPlugin, PluginContextNamespace, PLUGIN_CANCELLATION
 from _deploy import DeployManager, DeployStatus, DeployConfig, DeployConfigStatus, Deploy, ClusterStatus
 from _workflow import WorkflowManager, Workflows, SubWorkflowTemplate, SubWorkflows
 from _tool import ToolManager
-from _repository import RepositoryManager, LocalPackage, Repository, RepositoryVO
+from _repository import RepositoryManager, LocalPackage, Repository, RepositoryVO, RepositoryDistributor
 import _errno as err
 from _lock import LockManager, LockMode
 from _optimize import OptimizeManager
-from _environ import ENV_REPO_INSTALL_MODE, ENV_BASE_DIR
+from _environ import ENV_REPO_INSTALL_MODE, ENV_BASE_DIR, ENV_CONCURRENT_STAGE
 from _types import Capacity
 from const import COMP_OCEANBASE_DIAGNOSTIC_TOOL, COMP_OBCLIENT, PKG_RPM_FILE, TEST_TOOLS, COMPS_OB, COMPS_ODP, PKG_REPO_FILE, TOOL_TPCC, TOOL_TPCH, TOOL_SYSBENCH, COMP_OB_STANDALONE, TPCC_PATH, TPCH_PATH, COMP_JRE, LOCATION_MODE, SERVICE_MODE, COMP_OB_SEEKDB
 from ssh import LocalClient
@@ -50,6 +51,8 @@ from ssh import LocalClient
 class ObdHome(object):
 
     HOME_LOCK_RELATIVE_PATH = 'obd.conf'
+    # the workflows which check the hosts, they collect the host facts again
+    HOST_CHECK_WORKFLOWS = ('start_check', 'precheck')
 
     def __init__(self, home_path, dev_mode=False, lock_mode=None, stdio=None):
         self.home_path = home_path
@@ -213,6 +216,8 @@ class ObdHome(object):
     def get_workflows(self, workflow_name, repositories=None, no_found_act='exit', **component_kwargs):
         if not repositories:
             repositories = self.repositories
+        if workflow_name in self.HOST_CHECK_WORKFLOWS:
+            self.invalidate_host_facts()
         workflows = Workflows(workflow_name)
         for repository in repositories:
             template = self.get_workflow(repository, workflow_name, repository.name, repository.version, no_found_act=no_found_act, component_kwargs=component_kwargs)
@@ -252,9 +257,14 @@ class ObdHome(object):
         if not sorted_components:
             sorted_components = [repository.name for repository in repositories]
 
+        concurrent = COMMAND_ENV.get(ENV_CONCURRENT_STAGE) == '1'
         for stages in workflows(sorted_components):
             if not self.hanlde_sub_workflows(stages, sorted_components, repositories, no_found_act=no_found_act, **kwargs):
                 return False
+            if concurrent:
+                if not self.run_stage_concurrently(stages, repositories_map, no_found_act=no_found_act, error_exit=error_exit, **kwargs):
+                    return False
+                continue
             for component_name in stages:
                 for template in stages[component_name]:
                     if isinstance(template, SubWorkflowTemplate):
@@ -265,6 +275,90 @@ class ObdHome(object):
                         return False
         return True
 
+    def get_independent_component_groups(self, component_names):
+        # components in the same group do not depend on each other and share no host,
+        # for the plugins of a component may change the clients of its hosts. Without the deploy, every component runs alone.
+        if not self.deploy:
+            return [[component_name] for component_name in component_names]
+        components = self.deploy.deploy_config.components
+        levels = OrderedDict()
+        for component_name in component_names:
+            level = 0
+            if component_name in components:
+                for depend in components[component_name].depends:
+                    if depend in levels:
+                        level = max(level, levels[depend] + 1)
+            levels[component_name] = level
+        # [[(component names, hosts)]], a component with unknown hosts runs alone
+        level_groups = []
+        for component_name in levels:
+            while len(level_groups) <= levels[component_name]:
+                level_groups.append([])
+            hosts = set([server.ip for server in components[component_name].servers]) if component_name in components else None
+            for names, group_hosts in level_groups[levels[component_name]]:
+                if hosts is not None and group_hosts is not None and not (hosts & group_hosts):
+                    names.append(component_name)
+                    group_hosts.update(hosts)
+                    break
+            else:
+                level_groups[levels[component_name]].append(([component_name], hosts))
+        return [names for groups in level_groups for names, _ in groups]
+
+    def run_stage_concurrently(self, stages, repositories_map, no_found_act='exit', error_exit=True, **kwargs):
+        component_templates = OrderedDict()
+        for component_name in stages:
+            templates = [template for template in stages[component_name] if not isinstance(template, SubWorkflowTemplate)]
+            if not templates:
+                continue
+            if component_name in kwargs:
+                for template in templates:
+                    template.kwargs.update(kwargs[component_name])
+            component_templates[component_name] = templates
+
+        def run_templates(obd, component_name):
+            for template in component_templates[component_name]:
+                if not obd.run_plugin_template(template, component_name, repositories_map, no_found_act=no_found_act) and error_exit:
+                    return False
+            return True
+
+        cancel_event = PLUGIN_CANCELLATION.event
+
+        def run_fork(obd, component_name):
+            # the forks stop along with the task running the stage
+            PLUGIN_CANCELLATION.bind(cancel_event)
+            return run_templates(obd, component_name)
+
+        for group in self.get_independent_component_groups(list(component_templates.keys())):
+            if len(group) == 1 or not self.stdio:
+                if not all([run_templates(self, component_name) for component_name in group]):
+                    return False
+                continue
+            # everything shared by the forks is created here, the threads only read it
+            for name in repositories_map:
+                self.get_namespace(name)
+            if self.deploy and self.repositories:
+                self.get_clients(self.deploy.deploy_config, self.repositories)
+            for manager in ['mirror_manager', 'repository_manager', 'plugin_manager', 'deploy_manager', 'optimize_manager', 'tool_manager']:
+                getattr(self, manager)
+            self._call_stdio('verbose', 'Run %s at the same time' % ', '.join(group))
+            stdios = [BufferedIO(self.stdio) for _ in group]
+            with ThreadPoolExecutor(max_workers=len(group)) as executor:
+                futures = [executor.submit(run_fork, self.fork(stdio=stdio), component_name) for component_name, stdio in zip(group, stdios)]
+            success = True
+            exception = None
+            for future, stdio in zip(futures, stdios):
+                stdio.flush()
+                try:
+                    if not future.result():
+                        success = False
+                except BaseException as e:
+                    exception = exception or e
+            if exception:
+                raise exception
+            if not success:
+                return False
+        return True
+
     def hanlde_sub_workflows(self, stages, sorted_components, repositories, no_found_act='exit', **kwargs):
         sub_workflows = SubWorkflows()
         for repository in repositories:
@@ -425,6 +519,12 @@ class ObdHome(object):
                 check_status[server] = status
         return param_check_status, check_pass
     
+    def invalidate_host_facts(self):
+        # the clients live as long as obd web, and the hosts may change between two checks
+        for ssh_clients in self.ssh_clients.values():
+            for client in ssh_clients.values():
+                client.invalidate_host_facts()
+
     def get_clients(self, deploy_config, repositories):
         ssh_clients, _ = self.get_clients_with_connect_status(deploy_config, repositories, True)
         return ssh_clients
@@ -465,33 +565,40 @@ class ObdHome(object):
 
     def ssh_clients_connect(self, servers, ssh_clients, user_config, fail_exit=False):
         self._call_stdio('start_loading', 'Open ssh connection')
-        connect_io = self.stdio if fail_exit else self.stdio.sub_io(msg_lv=MsgLevel.CRITICAL)
+        connect_io = self.stdio.sub_io(msg_lv=MsgLevel.CRITICAL)
         connect_status = {}
         success = True
-        for server in servers:
-            if server not in ssh_clients:
-                client = SshClient(
-                    SshConfig(
-                        server.ip,
-                        user_config.username,
-                        user_config.password,
-                        user_config.key_file,
-                        user_config.port,
-                        user_config.timeout
-                    ),
-                    self.stdio
-                )
-                error = client.connect(stdio=connect_io, exit=fail_exit)
-                connect_status[server] = status = err.CheckStatus()
-                if error is not True:
-                    success = False
-                    status.status = err.CheckStatus.FAIL
-                    status.error = error
-                    status.suggests.append(err.SUG_SSH_FAILED.format())
-                else:
-                    status.status = err.CheckStatus.PASS
-                    ssh_clients[server] = client
+        servers = [server for server in servers if server not in ssh_clients]
+        clients = [
+            SshClient(
+                SshConfig(
+                    server.ip,
+                    user_config.username,
+                    user_config.password,
+                    user_config.key_file,
+                    user_config.port,
+                    user_config.timeout
+                ),
+                self.stdio
+            ) for server in servers
+        ]
+        errors = concurrent_connect(clients, stdio=connect_io)
+        for server, client, error in zip(servers, clients, errors):
+            connect_status[server] = status = err.CheckStatus()
+            if error is not True:
+                success = False
+                status.status = err.CheckStatus.FAIL
+                status.error = error
+                status.suggests.append(err.SUG_SSH_FAILED.format())
+            else:
+                status.status = err.CheckStatus.PASS
+                ssh_clients[server] = client
         self._call_stdio('stop_loading', 'succeed' if success else 'fail')
+        if fail_exit:
+            for server in servers:
+                if connect_status[server].status == err.CheckStatus.FAIL:
+                    self._call_stdio('critical', connect_status[server].error)
+                    break
         return connect_status
 
     def search_plugin(self, repository, plugin_type, no_found_exit=True):
@@ -587,6 +694,15 @@ class ObdHome(object):
         self._call_stdio('info', 'Search package for components...')
         if components is None:
             components = deploy_config.components.keys()
+        download_pkgs = {}
+        if not only_info:
+            # search the packages first and download the rpm files of all components at the same time
+            patterns = {}
+            for component in components:
+                config = deploy_config.components.get(component)
+                if config and not config.tag:
+                    patterns[component] = dict(name=component, version=config.version, md5=config.package_hash, release=config.release, fuzzy=fuzzy_match, only_info=only_info)
+            download_pkgs = self.mirror_manager.get_best_pkgs(patterns)
         for component in components:
             if component not in deploy_config.components:
                 errors.append('No such component name: {}'.format(component))
@@ -598,7 +714,9 @@ class ObdHome(object):
             repository = self.repository_manager.get_repository(name=component, version=config.version, tag=config.tag, release=config.release, package_hash=config.package_hash)
             if repository and not repository.hash:
                 repository = None
-            if not config.tag:
+            if component in download_pkgs:
+                pkg = download_pkgs[component]
+            elif not config.tag:
                 self._call_stdio('verbose', 'Search %s package from mirror' % component)
                 pkg = self.mirror_manager.get_best_pkg(
                     name=component, version=config.version, md5=config.package_hash, release=config.release, fuzzy=fuzzy_match, only_info=only_info)
@@ -1281,7 +1399,13 @@ class ObdHome(object):
             pass
         return False
 
+    def distribute_repository(self, ssh_clients, servers, repository):
+        # stage the repository in the obd home of the servers through a tree of hosts, see RepositoryDistributor
+        distributor = RepositoryDistributor(repository, self.home_path, stdio=self.stdio)
+        return distributor.distribute([ssh_clients[server] for server in servers])
+
     def servers_repository_install(self, ssh_clients, servers, repository, install_plugin):
+        self.distribute_repository(ssh_clients, servers, repository)
         self._call_stdio('start_loading', 'Remote %s repository install' % repository)
         self._call_stdio('verbose', 'Remote %s repository integrity check' % repository)
         for server in servers:
@@ -2080,6 +2204,9 @@ class ObdHome(object):
 
             requirement_map = install_plugin.requirement_map(repository)
             target_servers = cluster_config.added_servers if cluster_config.added_servers else None
+            if RepositoryDistributor.get_fanout() > 0:
+                ssh_clients = self.get_clients(deploy_config, [repository])
+                self.distribute_repository(ssh_clients, target_servers or cluster_config.servers, repository)
             ret = self.call_plugin(install_repo_plugin, repository, obd_home=self.home_path, install_repository=repository,
                                    install_plugin=install_plugin, check_repository=repository, check_file_map=check_file_map,
                                    requirement_map = requirement_map,
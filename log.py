@@ -16,7 +16,11 @@
 from __future__ import absolute_import, division, print_function
 
 
+import os
+import glob
 import logging
+import threading
+from collections import OrderedDict
 from logging import handlers
 
 
@@ -28,4 +32,157 @@ class Logger(logging.Logger):
         self.buffer_size = 0
 
     def _log(self, level, msg, args, end='\n', **kwargs):
-        return super(Logger, self)._log(level, msg, args, **kwargs)
\ No newline at end of file
+        return super(Logger, self)._log(level, msg, args, **kwargs)
+
+class TraceLogIndex(object):
+
+    """
+    Where the lines of each trace are in the log files, recorded when they are written.
+    A span is [inode, start, end]: the inode follows a log file when it is rotated.
+    Reading a trace seeks to its spans instead of scanning the whole log history.
+    At most `max_traces` traces are kept, the least recently used one is dropped first.
+    The spans in the log files removed by rotation are merged into one [None, 0, length] span.
+    """
+
+    MAX_TRACES = 1024
+
+    def __init__(self, max_traces=MAX_TRACES):
+        self.max_traces = max_traces
+        self._spans = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_spans(self, trace_id):
+        # with the lock held
+        spans = self._spans.pop(trace_id, None)
+        if spans is None:
+            spans = []
+            while len(self._spans) >= self.max_traces:
+                self._spans.popitem(last=False)
+        self._spans[trace_id] = spans
+        return spans
+
+    def add_trace(self, trace_id):
+        with self._lock:
+            self._get_spans(trace_id)
+
+    def add(self, trace_id, inode, start, end):
+        with self._lock:
+            spans = self._get_spans(trace_id)
+            if spans and spans[-1][0] == inode and spans[-1][2] == start:
+                spans[-1][2] = end
+            else:
+                spans.append([inode, start, end])
+
+    def __contains__(self, trace_id):
+        return trace_id in self._spans
+
+    def __len__(self):
+        return len(self._spans)
+
+    @staticmethod
+    def _get_log_files(log_path):
+        files = {}
+        for path in glob.glob('%s*' % log_path):
+            try:
+                files[os.stat(path).st_ino] = path
+            except OSError:
+                pass
+        return files
+
+    def prune(self, log_path):
+        """
+        Merge the spans in the log files which are removed, called after the log file is rotated.
+        The spans are merged rather than dropped, for the offsets of the reads count them as well.
+        """
+        inodes = self._get_log_files(log_path)
+        with self._lock:
+            for old_spans in self._spans.values():
+                spans = []
+                for span in old_spans:
+                    if span[0] in inodes:
+                        spans.append(span)
+                    elif spans and spans[-1][0] is None:
+                        spans[-1][2] += span[2] - span[1]
+                    else:
+                        spans.append([None, 0, span[2] - span[1]])
+                old_spans[:] = spans
+
+    def read(self, trace_id, log_path, offset=0):
+        """
+        Read the lines of trace `trace_id` after `offset`, with the trace tag removed.
+
+        :param offset: the offset returned by the last read, 0 to read from the beginning
+        :return: (content, offset for the next read), None if the trace is not indexed
+        """
+        with self._lock:
+            if trace_id not in self._spans:
+                return None
+            spans = [list(span) for span in self._get_spans(trace_id)]
+        files = self._get_log_files(log_path)
+        # the offset is counted over all spans, including those of deleted files
+        data = []
+        pos = 0
+        for inode, start, end in spans:
+            length = end - start
+            if pos + length <= offset:
+                pos += length
+                continue
+            skip = max(offset - pos, 0)
+            pos += length
+            path = files.get(inode)
+            if not path:
+                continue
+            try:
+                with open(path, 'rb') as f:
+                    f.seek(start + skip)
+                    data.append(f.read(length - skip))
+            except (IOError, OSError):
+                pass
+        content = b''.join(data).decode('utf-8', errors='replace')
+        return content.replace('[%s] ' % trace_id, ''), max(pos, offset)
+
+
+TRACE_LOG_INDEX = TraceLogIndex()
+
+
+class TraceFileHandler(handlers.TimedRotatingFileHandler):
+
+    """
+    TimedRotatingFileHandler which records the position of each record of `trace_id` in `index`
+    """
+
+    def __init__(self, filename, trace_id=None, index=TRACE_LOG_INDEX, **kwargs):
+        super(TraceFileHandler, self).__init__(filename, **kwargs)
+        self.trace_id = trace_id
+        self.index = index
+        self._record_text = None
+        if trace_id and index is not None:
+            index.add_trace(trace_id)
+
+    def format(self, record):
+        self._record_text = super(TraceFileHandler, self).format(record)
+        return self._record_text
+
+    def emit(self, record):
+        if not self.trace_id or self.index is None:
+            return super(TraceFileHandler, self).emit(record)
+        # the record is written and its offset taken under the handler lock, so no other record comes in between
+        self.acquire()
+        try:
+            self._record_text = None
+            super(TraceFileHandler, self).emit(record)
+            if self._record_text is None or not self.stream:
+                return
+            # the stream is flushed after each record and opened for append, so tell() is the end of the record
+            end = self.stream.tell()
+            length = len((self._record_text + self.terminator).encode(self.stream.encoding or 'utf-8'))
+            self.index.add(self.trace_id, os.fstat(self.stream.fileno()).st_ino, end - length, end)
+        except Exception:
+            pass
+        finally:
+            self.release()
+
+    def doRollover(self):
+        super(TraceFileHandler, self).doRollover()
+        if self.index is not None:
+            self.index.prune(self.baseFilename)
@@ -54,7 +54,8 @@ def destroy(plugin_context, *args, **kwargs):
     stdio = plugin_context.stdio
 
     stdio.start_loading('%s work dir cleaning' % component_name)
-    for server in cluster_config.servers:
+
+    def clean_server(server, client):
         server_config = cluster_config.get_server_conf(server)
         stdio.verbose('%s work path cleaning' % server)
         if server_config.get('home_path'):
@@ -63,6 +64,9 @@ def destroy(plugin_context, *args, **kwargs):
             if server_config.get(key):
                 clean(server, server_config[key])
                 stdio.verbose('%s path cleaning ' % key)
+        return True
+
+    plugin_context.fan_out({server: clean_server for server in cluster_config.servers})
     if global_ret:
         stdio.stop_loading('succeed')
         return plugin_context.return_true()
@@ -17,6 +17,7 @@ from __future__ import absolute_import, division, print_function
 
 import os
 import re
+import shlex
 
 from _plugin import InstallPlugin
 from _deploy import InnerConfigKeywords
@@ -28,6 +29,34 @@ version_compatibility = {
     "17": ("17", "18")
 }
 
+# the files smaller than it are sent again instead of being resumed
+RESUME_MIN_SIZE = 1 << 20
+# one script is passed to the remote shell as one argument, keep it far below the limit
+SCRIPT_SIZE = 64 << 10
+
+
+def run_script(client, commands, stop_on_error=True):
+    success = True
+    output = ''
+    scripts = []
+    script = []
+    size = 0
+    for command in commands:
+        if script and size + len(command) > SCRIPT_SIZE:
+            scripts.append(script)
+            script, size = [], 0
+        script.append(command)
+        size += len(command) + 1
+    if script:
+        scripts.append(script)
+    for script in scripts:
+        if stop_on_error:
+            script = ['set -e'] + script
+        ret = client.execute_command('\n'.join(script))
+        success = bool(ret) and success
+        output += ret.stdout
+    return success, output
+
 
 def install_repo(plugin_context, obd_home, install_repository, install_plugin, check_repository, check_file_map,
                  requirement_map, msg_lv, *args, **kwargs):
@@ -69,7 +98,115 @@ def install_repo(plugin_context, obd_home, install_repository, install_plugin, c
                     success = client.execute_command("sudo chown -R %s ${target}" % launch_user) and success
 
         return success
-    
+
+    def put_all():
+        for file_item in install_file_items:
+            file_path = os.path.join(install_repository.repository_dir, file_item.target_path)
+            remote_file_path = os.path.join(install_path, file_item.target_path)
+            if file_item.type == InstallPlugin.FileItemType.DIR:
+                if os.path.isdir(file_path) and not client.put_dir(file_path, remote_file_path, stdio=sub_io):
+                    return False
+            else:
+                if not client.put_file(file_path, remote_file_path, stdio=sub_io):
+                    return False
+        return True
+
+    def sync_repository():
+        """
+        Send only the files which the remote host does not have. A file is taken from, in order:
+        the same file in install_path, a file with the same digest in another copy of the repository in the remote obd home,
+        the partially sent file in install_path, and at last the local repository.
+        """
+        manifest = install_repository.manifest.select([file_item.target_path for file_item in install_file_items])
+        for file_item in install_file_items:
+            target_path = os.path.normpath(file_item.target_path)
+            if file_item.type != InstallPlugin.FileItemType.DIR and target_path not in manifest.files and target_path not in manifest.links:
+                stdio.error('path: %s is not file' % os.path.join(install_repository.repository_dir, file_item.target_path))
+                return False
+
+        quoted_install_path = shlex.quote(install_path)
+        targets = ' '.join(shlex.quote(os.path.normpath(file_item.target_path)) for file_item in install_file_items)
+        rets = client.execute_commands([
+            'cd %s && find %s -type f -printf "%%s\\t%%p\\n" 2>/dev/null' % (quoted_install_path, targets),
+            'cd %s && find %s -type f -print0 2>/dev/null | xargs -0 -r md5sum' % (quoted_install_path, targets)
+        ])
+        remote_sizes = {}
+        for line in rets[0].stdout.split('\n'):
+            size, _, path = line.partition('\t')
+            if size.isdigit():
+                remote_sizes[os.path.normpath(path)] = int(size)
+        remote_digests = {}
+        for line in rets[1].stdout.split('\n'):
+            if line and not line.startswith('\\'):
+                remote_digests[os.path.normpath(line[34:])] = line[:32]
+
+        missing = [path for path in sorted(manifest.files) if remote_digests.get(path) != manifest.files[path][0]]
+        stdio.verbose('%s misses %s of %s files in %s' % (install_path, len(missing), len(manifest.files), server))
+
+        if missing:
+            # the other versions of the repository in ln mode, and the copy staged by the repository distribution
+            sources = {}
+            component_dir = os.path.dirname(os.path.dirname(os.path.relpath(install_repository.repository_dir, obd_home)))
+            ret = client.execute_command('grep -H "" ${OBD_HOME:-"$HOME"}/.obd/%s/*/*/%s 2>/dev/null' % (shlex.quote(component_dir), manifest.FILE_NAME))
+            for line in ret.stdout.split('\n'):
+                repository_dir, sep, line = line.partition('/%s:' % manifest.FILE_NAME)
+                if not sep or os.path.normpath(repository_dir) == os.path.normpath(install_path):
+                    continue
+                items = line.split('\t')
+                if len(items) == 4 and items[0] == 'F':
+                    sources.setdefault(items[1], os.path.join(repository_dir, items[3]))
+            copy_commands = []
+            for path in missing:
+                source = sources.get(manifest.files[path][0])
+                if source:
+                    # check the source again, the other version may be damaged
+                    copy_commands.append('md5sum %(source)s 2>/dev/null | grep -q ^%(md5)s && mkdir -p %(dir)s && cp -pf %(source)s %(target)s && echo %(path)s' % {
+                        'source': shlex.quote(source), 'md5': manifest.files[path][0], 'dir': shlex.quote(os.path.dirname(os.path.join(install_path, path))),
+                        'target': shlex.quote(os.path.join(install_path, path)), 'path': shlex.quote(path)})
+            if copy_commands:
+                _, output = run_script(client, copy_commands, stop_on_error=False)
+                copied = set(output.split('\n'))
+                stdio.verbose('%s files are copied from the other copies of the repository in %s' % (len(copied & set(missing)), server))
+                missing = [path for path in missing if path not in copied]
+
+        if len(missing) == len(manifest.files) and not remote_sizes:
+            stdio.verbose('%s has none of the files, send all' % install_path)
+            return put_all()
+
+        commands = []
+        for path in sorted(manifest.dirs):
+            remote_path = shlex.quote(os.path.join(install_path, path))
+            commands.append('[ -d %(path)s ] || (mkdir -p %(path)s && chmod %(mode)o %(path)s)' % {'path': remote_path, 'mode': manifest.dirs[path]})
+        success, _ = run_script(client, commands)
+        if not success:
+            return False
+
+        resumable = []
+        for path in missing:
+            size = remote_sizes.get(path, 0)
+            if RESUME_MIN_SIZE <= size < os.path.getsize(os.path.join(install_repository.repository_dir, path)):
+                resumable.append(path)
+        resumed = set()
+        if resumable:
+            rets = client.execute_commands(['head -c %s %s | md5sum' % (remote_sizes[path], shlex.quote(os.path.join(install_path, path))) for path in resumable])
+            for path, ret in zip(resumable, rets):
+                file_path = os.path.join(install_repository.repository_dir, path)
+                if ret and ret.stdout[:32] == manifest.digest(file_path, remote_sizes[path]):
+                    if not client.resume_put_file(file_path, os.path.join(install_path, path), remote_sizes[path], stdio=sub_io):
+                        return False
+                    resumed.add(path)
+
+        for path in missing:
+            if path not in resumed and not client.put_file(os.path.join(install_repository.repository_dir, path), os.path.join(install_path, path), stdio=sub_io):
+                return False
+
+        commands = []
+        for path in sorted(manifest.links):
+            remote_path = shlex.quote(os.path.join(install_path, path))
+            commands.append('rm -rf %s && ln -s %s %s' % (remote_path, shlex.quote(manifest.links[path]), remote_path))
+        success, _ = run_script(client, commands)
+        return success
+
     stdio = plugin_context.stdio
     clients = plugin_context.clients
     servers = cluster_config.servers
@@ -125,19 +262,12 @@ def install_repo(plugin_context, obd_home, install_repository, install_plugin, c
 
         stdio.verbose('%s %s installing' % (server, install_repository))
         sub_io = stdio.sub_io()
-        for file_item in install_file_items:
-            file_path = os.path.join(install_repository.repository_dir, file_item.target_path)
-            remote_file_path = os.path.join(install_path, file_item.target_path)
-            if file_item.type == InstallPlugin.FileItemType.DIR:
-                if os.path.isdir(file_path) and not client.put_dir(file_path, remote_file_path, stdio=sub_io):
-                    stdio.stop_loading('fail')
-                    return False
-            else:
-                if not client.put_file(file_path, remote_file_path, stdio=sub_io):
-                    stdio.stop_loading('fail')
-                    return False
+        if not sync_repository():
+            stdio.stop_loading('fail')
+            return False
         if is_ln_install_mode:
-            # save data file for later comparing
+            # save the manifest for the other versions to copy the same files, and the data file for later comparing
+            client.write_file(install_repository.manifest.dumps(), os.path.join(install_path, install_repository.manifest.FILE_NAME), stdio=sub_io)
             client.put_file(install_repository.data_file_path, remote_repository_data_path, stdio=sub_io)
             # link files to home_path
             install_to_home_path()
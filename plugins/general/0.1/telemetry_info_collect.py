@@ -37,19 +37,26 @@ shell_command_map = {
     "memory_free": 'cat /proc/meminfo | grep MemFree | cut -f2 -d: | uniq',
     "memory_avaiable": 'cat /proc/meminfo | grep MemAvailable | cut -f2 -d: | uniq',
     "os_name": 'cat /etc/os-release | grep "^ID=" | cut -f2 -d=',
-    "os_release": 'cat /etc/os-release | grep "^VERSION_ID=" | cut -f2 -d='
+    "os_release": 'cat /etc/os-release | grep "^VERSION_ID=" | cut -f2 -d=',
+    "disks_info": "df -hP | awk '{if(NR>1)print}'"
 }
 current_client = None
+# results of shell_command_map on current_client, fetched in one batch
+current_results = {}
+
+
+def run_shell_command(name):
+    command = shell_command_map.get(name)
+    assert command, f"{name} is not in shell_command.yaml"
+    assert current_client, "current_client is None"
+    if name in current_results:
+        return current_results[name]
+    return current_client.execute_command(command)
 
 
 def shell_command(func):
     def wrapper(*args, **kwargs):
-        name = func.__name__
-        command = shell_command_map.get(name)
-        assert command, f"{name} is not in shell_command.yaml"
-        assert current_client, "current_client is None"
-
-        res = current_client.execute_command(command)
+        res = run_shell_command(func.__name__)
         kwargs["bash_result"] = res.stdout.strip() if res.code == 0 else None
         return func(*args, **kwargs)
 
@@ -143,7 +150,7 @@ class DiskInfo:
     def get_disks_info():
         data = []
         sha1 = hashlib.sha1()
-        for _ in current_client.execute_command("df -hP | awk '{if(NR>1)print}'").stdout.strip().split('\n'):
+        for _ in run_shell_command('disks_info').stdout.strip().split('\n'):
             _disk_info = {}
             _ = [i for i in _.split(' ') if i != '']
             _disk_info['deviceName'] = _[0]
@@ -229,11 +236,16 @@ def telemetry_base_data():
 
 
 def telemetry_machine_data(data):
+    global current_results
     ip_hash = HostInfo.host_ip_hash(current_client.config.host)
     for host in data['hosts']:
         if host['basic']['hostHash'] == ip_hash:
             return data
 
+    current_results = {}
+    names = list(shell_command_map.keys())
+    current_results = dict(zip(names, current_client.execute_commands([shell_command_map[name] for name in names])))
+
     _hosts = dict(basic={}, cpu={}, memory={}, disks=[], os={}, ulimit={})
     _hosts['basic']['hostHash'] = ip_hash
     _hosts['basic']['hostType'] = HostInfo.host_type()
@@ -232,7 +232,7 @@ def oceanbase_config_input(plugin_context, client, cluster_name=None, *args, **k
         else:
             stdio.print(FormatText.error('The two passwords do not match. Please try again.'))
     while True:
-        default_cpu_count = client.execute_command("grep -e 'processor\s*:' /proc/cpuinfo | wc -l").stdout.strip()
+        default_cpu_count = str(client.host_facts().cpu_count or '')
         cpu_count = stdio.read(f'Enter the OB cpu count (Default: {default_cpu_count}): ', blocked=True).strip() or default_cpu_count
         if not cpu_count.isdigit():
             stdio.print(FormatText.error('Invalid cpu count. Please try again.'))
@@ -37,10 +37,9 @@ def health_check(plugin_context, **kwargs):
     stdio.start_loading('obagent program health check')
     time.sleep(1)
     failed = []
-    servers = cluster_config.servers
-    count = 600
-    while servers and count:
-        count -= 1
+    servers = list(cluster_config.servers)
+
+    def started():
         tmp_servers = []
         for server in servers:
             client = clients[server]
@@ -50,15 +49,15 @@ def health_check(plugin_context, **kwargs):
             if pid:
                 if confirm_port(client, pid, int(server_config["server_port"])):
                     stdio.verbose('%s obagent[pid: %s] started', server, pid)
-                elif count:
-                    tmp_servers.append(server)
                 else:
-                    failed.append('failed to start %s obagent' % server)
+                    tmp_servers.append(server)
             else:
                 failed.append('failed to start %s obagent' % server)
-        servers = tmp_servers
-        if servers and count:
-            time.sleep(1)
+        servers[:] = tmp_servers
+        return not servers
+    plugin_context.wait_until(started, timeout=600, interval=1, name='wait obagent started')
+    for server in servers:
+        failed.append('failed to start %s obagent' % server)
     if failed:
         stdio.stop_loading('fail')
         for msg in failed:
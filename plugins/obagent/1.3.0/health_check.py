@@ -38,30 +38,34 @@ def health_check(plugin_context, **kwargs):
     stdio.start_loading('obagent program health check')
     time.sleep(1)
     failed = []
-    servers = cluster_config.servers
-    count = 600
-    while servers and count:
-        count -= 1
+    servers = list(cluster_config.servers)
+
+    def check(server, client):
+        server_config = start_env[server]
+        home_path = server_config['home_path']
+        stdio.verbose('%s program health check' % server)
+        pid = client.execute_command("cat %s" % pid_path[server]).stdout.strip()
+        if not pid:
+            return 'failed'
+        mgr_pid = client.execute_command("cat %s" % os.path.join(home_path, 'run/ob_mgragent.pid')).stdout.strip()
+        if mgr_pid and confirm_port(client, mgr_pid, int(server_config["mgragent_http_port"])):
+            stdio.verbose('%s obagent[pid: %s] started', server, pid)
+            return 'started'
+        return 'retry'
+
+    def started():
         tmp_servers = []
-        for server in servers:
-            client = clients[server]
-            server_config = start_env[server]
-            home_path = server_config['home_path']
-            stdio.verbose('%s program health check' % server)
-            pid = client.execute_command("cat %s" % pid_path[server]).stdout.strip()
-            if pid:
-                mgr_pid = client.execute_command("cat %s" % os.path.join(home_path, 'run/ob_mgragent.pid')).stdout.strip()
-                if mgr_pid and confirm_port(client, mgr_pid, int(server_config["mgragent_http_port"])):
-                    stdio.verbose('%s obagent[pid: %s] started', server, pid)
-                elif count:
-                    tmp_servers.append(server)
-                else:
-                    failed.append('failed to start %s obagent' % server)
-            else:
+        rets = plugin_context.fan_out({server: check for server in servers})
+        for server in rets:
+            if rets[server].value == 'retry':
+                tmp_servers.append(server)
+            elif rets[server].value != 'started':
                 failed.append('failed to start %s obagent' % server)
-        servers = tmp_servers
-        if servers and count:
-            time.sleep(1)
+        servers[:] = tmp_servers
+        return not servers
+    plugin_context.wait_until(started, timeout=600, interval=1, name='wait obagent started')
+    for server in servers:
+        failed.append('failed to start %s obagent' % server)
     if failed:
         stdio.stop_loading('fail')
         for msg in failed:
@@ -56,18 +56,18 @@ def start(plugin_context, is_reinstall=False, *args, **kwargs):
                 stdio.warn(WC_OBAGENT_SERVER_NAME_ERROR.format(servers=error_servers_msg))
 
     targets = []
+    errors = {}
     for server in cluster_config.servers:
-        client = clients[server]
+        pid_path[server] = '%s/run/ob_agentd.pid' % start_env[server]['home_path']
+        targets.append('{}:{}'.format(server.ip, int(start_env[server]['mgragent_http_port'])))
+
+    def start_server(server, client):
         server_config = start_env[server]
         home_path = server_config['home_path']
-        pid_path[server] = '%s/run/ob_agentd.pid' % home_path
-        mgragent_http_port = int(server_config['mgragent_http_port'])
-        targets.append('{}:{}'.format(server.ip, mgragent_http_port))
         remote_pid = client.execute_command("cat %s" % pid_path[server]).stdout.strip()
         if remote_pid and client.execute_command('ls /proc/%s' % remote_pid):
-            continue
+            return True
 
-        home_path = server_config['home_path']
         use_parameter = True
         config_flag = os.path.join(home_path, '.configured')
 
@@ -113,12 +113,20 @@ def start(plugin_context, is_reinstall=False, *args, **kwargs):
             cmd += '&& touch %s' if not client.execute_command('ls %s' % config_flag) else ''
             res = client.execute_command(cmd)
             if not res:
-                stdio.error('failed to set config to {} obagent.'.format(server))
-                return plugin_context.return_false()
+                errors[server] = 'failed to set config to {} obagent.'.format(server)
+                return False
 
         if not client.execute_command('cd %s;%s/bin/ob_agentctl start' % (home_path, home_path)):
-            stdio.error('failed to start {} obagent.'.format(server))
-            return plugin_context.return_false()
+            errors[server] = 'failed to start {} obagent.'.format(server)
+            return False
+        return True
+
+    rets = plugin_context.fan_out({server: start_server for server in cluster_config.servers})
+    failed = [server for server in rets if not rets[server]]
+    if failed:
+        for server in failed:
+            stdio.error(errors.get(server, 'failed to start {} obagent.'.format(server)))
+        return plugin_context.return_false()
 
     stdio.stop_loading('succeed')
     plugin_context.set_variable('targets', targets)
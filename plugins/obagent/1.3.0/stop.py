@@ -15,8 +15,6 @@
 
 from __future__ import absolute_import, division, print_function
 
-import time
-
 from tool import OrderedDict
 
 
@@ -50,51 +48,55 @@ def stop(plugin_context, *args, **kwargs):
     clients = plugin_context.clients
     stdio = plugin_context.stdio
 
-    servers = {}
     stdio.start_loading('Stop obagent')
-    for server in cluster_config.servers:
+
+    def kill_agents(server, client):
         server_config = cluster_config.get_server_conf(server)
-        client = clients[server]
         if 'home_path' not in server_config:
             stdio.verbose('%s home_path is empty', server)
-            continue
+            return None
         home_path = server_config["home_path"]
         agent_processes = OrderedDict()
         agent_processes['obagentd'] = {'path': '%s/run/ob_agentd.pid' % home_path, 'port': None}
         agent_processes['monagent'] = {'path': '%s/run/ob_monagent.pid' % home_path, 'port': server_config['monagent_http_port']}
         agent_processes['mgragent'] = {'path': '%s/run/ob_mgragent.pid' % home_path, 'port': server_config['mgragent_http_port']}
+        agents_info = {}
         for agent in agent_processes:
             pid = client.execute_command('cat %s' % agent_processes[agent]['path']).stdout.strip()
             if pid:
                 stdio.verbose('%s %s[pid:%s] stopping ...' % (server, agent, pid))
                 client.execute_command('kill -9 %s' % pid)
-                if server not in servers:
-                    servers[server] = {}
-                servers[server][agent] = {'pid': pid, 'port': agent_processes[agent]['port'], 'path':  agent_processes[agent]['path']}
+                agents_info[agent] = {'pid': pid, 'port': agent_processes[agent]['port'], 'path':  agent_processes[agent]['path']}
             else:
                 stdio.verbose('%s %s is not running' % (server, agent))
+        return agents_info
 
-    count = 10
-    time.sleep(1)
-    while count and servers:
-        tmp_servers = {}
-        for server in servers:
-            agents_info = servers[server]
-            client = clients[server]
-            stdio.verbose('%s check whether the port is released' % server)
-            for agent in agents_info:
-                pid = agents_info[agent]['pid']
-                if client.execute_command('ls /proc/%s' % pid) or (agents_info[agent].get('port') and confirm_port(client, pid, agents_info[agent]['port'])):
-                    tmp_servers[server] = agents_info
-                    break
-                client.execute_command('rm -f %s' % agents_info[agent]['path'])
-                agents_info[agent] = {}
-            else:
-                stdio.verbose('%s obagent is stopped', server)
-        servers = tmp_servers
-        count -= 1
-        if count and servers:
-            time.sleep(3)
+    def release_check(server, client):
+        agents_info = servers[server]
+        stdio.verbose('%s check whether the port is released' % server)
+        for agent in agents_info:
+            pid = agents_info[agent]['pid']
+            if client.execute_command('ls /proc/%s' % pid) or (agents_info[agent].get('port') and confirm_port(client, pid, agents_info[agent]['port'])):
+                return False
+            client.execute_command('rm -f %s' % agents_info[agent]['path'])
+            agents_info[agent] = {}
+        stdio.verbose('%s obagent is stopped', server)
+        return True
+
+    rets = plugin_context.fan_out({server: kill_agents for server in cluster_config.servers})
+    servers = OrderedDict((server, rets[server].value) for server in rets if rets[server].value)
+    # the rounds left
+    count = [10]
+
+    def ports_released():
+        rets = plugin_context.fan_out({server: release_check for server in servers})
+        for server in rets:
+            if rets[server]:
+                del servers[server]
+        count[0] -= 1
+        return not servers or not count[0]
+    if servers:
+        plugin_context.wait_until(ports_released, interval=1, name='wait %s ports released' % cluster_config.name)
 
     if servers:
         stdio.stop_loading('fail')
@@ -16,7 +16,6 @@
 from __future__ import absolute_import, division, print_function
 
 import sys
-import time
 from copy import copy
 if sys.version_info.major == 2:
     import MySQLdb as mysql
@@ -119,7 +118,8 @@ def connect(plugin_context, target_server=None, connect_proxysys=True, *args, **
             plugin_context.set_variable(key, value)
         return plugin_context.return_true(**kwargs)
     
-    count = 10
+    # the rounds left, the new password and the current one are tried in turn
+    count = [10]
     cluster_config = plugin_context.cluster_config
     new_cluster_config = kwargs.get("new_cluster_config")
     stdio = plugin_context.stdio
@@ -128,7 +128,7 @@ def connect(plugin_context, target_server=None, connect_proxysys=True, *args, **
         server_config = cluster_config.get_server_conf(target_server)
         stdio.start_loading('Connect obproxy(%s:%s)' % (target_server, server_config['listen_port']))
     else:
-        servers = cluster_config.servers
+        servers = list(cluster_config.servers)
         stdio.start_loading('Connect to obproxy')
     user = kwargs.get('user')
     password = kwargs.get('password')
@@ -155,8 +155,11 @@ def connect(plugin_context, target_server=None, connect_proxysys=True, *args, **
             break
     dbs = {}
     cursors = {}
-    while count and servers:
-        count -= 1
+    # the last cursor made
+    last_cursor = [None]
+
+    def connected():
+        count[0] -= 1
         tmp_servers = []
         for server in servers:
             try:
@@ -172,11 +175,11 @@ def connect(plugin_context, target_server=None, connect_proxysys=True, *args, **
                     if new_config:
                         new_r_password = new_config.get(pwd_key, '')
                 r_password = password if password else server_config.get(pwd_key)
-                r_password = new_r_password if new_config and count % 2 else r_password
+                r_password = new_r_password if new_config and count[0] % 2 else r_password
                 if r_password is None:
                     r_password = ''
 
-                cursor = Cursor(ip=server.ip, port=server_config['listen_port'], user=user, tenant='', password=r_password if count % 2 else '', stdio=stdio)
+                cursor = last_cursor[0] = Cursor(ip=server.ip, port=server_config['listen_port'], user=user, tenant='', password=r_password if count[0] % 2 else '', stdio=stdio)
                 if user in ['root', 'root@sys']:
                     if not cursor.fetchone('select * from information_schema.TABLES limit 1'):
                         continue
@@ -185,8 +188,9 @@ def connect(plugin_context, target_server=None, connect_proxysys=True, *args, **
             except:
                 tmp_servers.append(server)
                 pass
-        servers = tmp_servers
-        servers and time.sleep(3)
+        servers[:] = tmp_servers
+        return not servers or count[0] <= 0
+    plugin_context.wait_until(connected, interval=1, name='connect to obproxy')
 
     if len(servers) == len(cluster_config.servers):
         stdio.stop_loading('fail')
@@ -194,7 +198,7 @@ def connect(plugin_context, target_server=None, connect_proxysys=True, *args, **
         return plugin_context.return_false()
     else:
         stdio.stop_loading('succeed')
-        plugin_context.set_variable('cursor', cursor)
+        plugin_context.set_variable('cursor', last_cursor[0])
         if target_server:
             return return_true(connect=dbs[target_server], cursor=cursors[target_server])
         else:
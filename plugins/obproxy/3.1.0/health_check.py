@@ -17,7 +17,6 @@ from __future__ import absolute_import, division, print_function
 
 import os
 import re
-import time
 
 from tool import confirm_port
 
@@ -71,38 +70,40 @@ def health_check(plugin_context, **kwargs):
 
     stdio.start_loading('obproxy program health check')
     failed = []
-    servers = cluster_config.servers
-    count = 600
-    while servers and count:
-        count -= 1
+    servers = list(cluster_config.servers)
+
+    def check(server, client):
+        server_config = cluster_config.get_server_conf(server)
+        stdio.verbose('%s program health check' % server)
+        remote_pid = client.execute_command("cat %s" % pid_path[server]).stdout.strip()
+        if not remote_pid:
+            return 'failed'
+        for pid in re.findall('\d+',remote_pid):
+            confirm = confirm_port(client, pid, int(server_config["listen_port"]))
+            if confirm:
+                proxyd_Pid_path = os.path.join(server_config["home_path"], 'run/obproxyd-%s-%d.pid' % (server.ip, server_config["listen_port"]))
+                if client.execute_command("pid=`cat %s` && ls /proc/$pid" % proxyd_Pid_path):
+                    stdio.verbose('%s obproxy[pid: %s] started', server, pid)
+                    return 'started'
+                client.execute_command('echo %s > %s' % (pid, pid_path[server]))
+                obproxyd(server_config["home_path"], client, server.ip, server_config["listen_port"])
+                return 'retry'
+            stdio.verbose('%s obproxy is not started yet' % server)
+        return 'retry'
+
+    def started():
         tmp_servers = []
-        for server in servers:
-            server_config = cluster_config.get_server_conf(server)
-            client = clients[server]
-            stdio.verbose('%s program health check' % server)
-            remote_pid = client.execute_command("cat %s" % pid_path[server]).stdout.strip()
-            if remote_pid:
-                for pid in re.findall('\d+',remote_pid):
-                    confirm = confirm_port(client, pid, int(server_config["listen_port"]))
-                    if confirm:
-                        proxyd_Pid_path = os.path.join(server_config["home_path"], 'run/obproxyd-%s-%d.pid' % (server.ip, server_config["listen_port"]))
-                        if client.execute_command("pid=`cat %s` && ls /proc/$pid" % proxyd_Pid_path):
-                            stdio.verbose('%s obproxy[pid: %s] started', server, pid)
-                        else:
-                            client.execute_command('echo %s > %s' % (pid, pid_path[server]))
-                            obproxyd(server_config["home_path"], client, server.ip, server_config["listen_port"])
-                            tmp_servers.append(server)
-                        break
-                    stdio.verbose('failed to start %s obproxy, remaining retries: %d' % (server, count))
-                    if count:
-                        tmp_servers.append(server)
-                    else:
-                        failed.append('failed to start %s obproxy' % server)
-            else:
+        rets = plugin_context.fan_out({server: check for server in servers})
+        for server in rets:
+            if rets[server].value == 'retry':
+                tmp_servers.append(server)
+            elif rets[server].value != 'started':
                 failed.append('failed to start %s obproxy' % server)
-        servers = tmp_servers
-        if servers and count:
-            time.sleep(1)
+        servers[:] = tmp_servers
+        return not servers
+    plugin_context.wait_until(started, timeout=600, interval=1, name='wait obproxy started')
+    for server in servers:
+        failed.append('failed to start %s obproxy' % server)
     if failed:
         stdio.stop_loading('fail')
         for msg in failed:
@@ -54,9 +54,10 @@ def start(plugin_context,  *args, **kwargs):
     real_cmd = plugin_context.get_variable('real_cmd')
 
     stdio.start_loading('start obproxy')
-    for server in clusters_cmd:
+    errors = {}
+
+    def start_server(server, client):
         environments = deepcopy(cluster_config.get_environments())
-        client = clients[server]
         server_config = cluster_config.get_server_conf(server)
         port = int(server_config["listen_port"])
         stdio.verbose('%s port check' % server)
@@ -66,10 +67,9 @@ def start(plugin_context,  *args, **kwargs):
             ret = client.execute_command('ls /proc/%s/' % remote_pid)
             if ret:
                 if confirm_port(client, remote_pid, port):
-                    continue
-                stdio.stop_loading('fail')
-                stdio.error(EC_CONFLICT_PORT.format(server=server.ip, port=port))
-                return plugin_context.return_false()
+                    return True
+                errors[server] = EC_CONFLICT_PORT.format(server=server.ip, port=port)
+                return False
 
         stdio.verbose('starting %s obproxy', server)
         if 'LD_LIBRARY_PATH' not in environments:
@@ -77,10 +77,18 @@ def start(plugin_context,  *args, **kwargs):
         with EnvVariables(environments, client):
             ret = client.execute_command(clusters_cmd[server])
         if not ret:
-            stdio.stop_loading('fail')
-            stdio.error('failed to start %s obproxy: %s' % (server, ret.stderr))
-            return plugin_context.return_false()
+            errors[server] = 'failed to start %s obproxy: %s' % (server, ret.stderr)
+            return False
         client.execute_command('''ps -aux | grep -e '%s$' | grep -v grep | awk '{print $2}' > %s''' % (cmd, pid_path[server]))
+        return True
+
+    rets = plugin_context.fan_out({server: start_server for server in clusters_cmd})
+    failed = [server for server in rets if not rets[server]]
+    if failed:
+        stdio.stop_loading('fail')
+        for server in failed:
+            stdio.error(errors.get(server, 'failed to start %s obproxy: %s' % (server, rets[server].stderr)))
+        return plugin_context.return_false()
     stdio.stop_loading('succeed')
 
     return plugin_context.return_true()
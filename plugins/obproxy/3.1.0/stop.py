@@ -16,9 +16,8 @@
 from __future__ import absolute_import, division, print_function
 
 import os
-import time
 
-from tool import confirm_port, get_port_socket_inode
+from tool import confirm_port, get_port_socket_inode, OrderedDict
 
 
 
@@ -26,16 +25,14 @@ def stop(plugin_context, *args, **kwargs):
     cluster_config = plugin_context.cluster_config
     clients = plugin_context.clients
     stdio = plugin_context.stdio
-    servers = {}
-
     servers_pid_filenames = plugin_context.get_variable('servers_pid_filenames')
     port_keys = plugin_context.get_variable('port_keys')
 
     stdio.start_loading('Stop %s ' % cluster_config.name)
-    success = True
-    for server in cluster_config.servers:
+    denied_servers = []
+
+    def kill_server(server, client):
         server_config = cluster_config.get_server_conf(server)
-        client = clients[server]
         home_path = server_config['home_path']
         pid_filename_list = servers_pid_filenames[server]
         remote_pid_path = os.path.join(home_path, 'run/%s' % pid_filename_list[1])
@@ -46,7 +43,7 @@ def stop(plugin_context, *args, **kwargs):
                 port_info = {key: server_config[key] for key in port_keys}
                 stdio.verbose('%s obproxy[pid:%s] stopping ...' % (server, remote_pid))
                 client.execute_command('cat %s | xargs kill -9; kill -9 -%s' % (obproxyd_pid_path, remote_pid))
-                servers[server] = {
+                return {
                     'client': client,
                     'pid': remote_pid,
                     'path': remote_pid_path,
@@ -54,35 +51,42 @@ def stop(plugin_context, *args, **kwargs):
                 }
             else:
                 stdio.verbose('failed to stop obproxy[pid:%s] in %s, permission deny' % (remote_pid, server))
-                success = False
+                denied_servers.append(server)
         else:
             stdio.verbose('%s obproxy is not running' % server)
+        return None
 
-    if not success:
+    rets = plugin_context.fan_out({server: kill_server for server in cluster_config.servers})
+    servers = OrderedDict((server, rets[server].value) for server in rets if rets[server].value)
+
+    if denied_servers:
         stdio.stop_loading('fail')
         return plugin_context.return_true()
 
-    count = 10
-    check = lambda client, pid, port: confirm_port(client, pid, port) if count < 5 else get_port_socket_inode(client, port)
-    time.sleep(1)
-    while count and servers:
-        tmp_servers = {}
-        for server in servers:
-            data = servers[server]
-            client = clients[server]
-            stdio.verbose('%s check whether the port is released' % server)
-            for key in port_keys:
-                if data[key] and check(data['client'], data['pid'], data[key]):
-                    tmp_servers[server] = data
-                    break
-                data[key] = ''
-            else:
-                client.execute_command('rm -rf %s' % data['path'])
-                stdio.verbose('%s %s is stopped' % (server, cluster_config.name))
-        servers = tmp_servers
-        count -= 1
-        if count and servers:
-            time.sleep(3)
+    # the rounds left, only the sockets of the killed process count in the last 5 rounds
+    count = [10]
+    check = lambda client, pid, port: confirm_port(client, pid, port) if count[0] < 5 else get_port_socket_inode(client, port)
+
+    def release_check(server, client):
+        data = servers[server]
+        stdio.verbose('%s check whether the port is released' % server)
+        for key in port_keys:
+            if data[key] and check(data['client'], data['pid'], data[key]):
+                return False
+            data[key] = ''
+        client.execute_command('rm -rf %s' % data['path'])
+        stdio.verbose('%s %s is stopped' % (server, cluster_config.name))
+        return True
+
+    def ports_released():
+        rets = plugin_context.fan_out({server: release_check for server in servers})
+        for server in rets:
+            if rets[server]:
+                del servers[server]
+        count[0] -= 1
+        return not servers or not count[0]
+    if servers:
+        plugin_context.wait_until(ports_released, interval=1, name='wait %s ports released' % cluster_config.name)
     if servers:
         stdio.stop_loading('fail')
         for server in servers:
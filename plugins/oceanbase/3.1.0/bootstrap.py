@@ -15,8 +15,6 @@
 
 from __future__ import absolute_import, division, print_function
 
-import time
-
 from _deploy import InnerConfigItem
 
 
@@ -101,12 +99,9 @@ def bootstrap(plugin_context, *args, **kwargs):
             stdio.stop_loading('succeed')
 
     # wait for server online
-    all_server_online = False
-    while not all_server_online:
+    def all_server_online():
         servers = cursor.fetchall('select * from oceanbase.__all_server', raise_exception=False, exc_level='verbose')
-        if servers and all([s.get('status') for s in servers]):
-            all_server_online = True
-        else:
-            time.sleep(1)
+        return servers and all([s.get('status') for s in servers])
+    plugin_context.wait_until(all_server_online, name='wait for server online')
     stdio.stop_loading('succeed')
     return plugin_context.return_true()
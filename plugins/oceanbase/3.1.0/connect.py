@@ -16,7 +16,6 @@
 from __future__ import absolute_import, division, print_function
 
 import sys
-import time
 import re
 from copy import copy
 if sys.version_info.major == 2:
@@ -41,7 +40,8 @@ def connect(plugin_context, target_server=None, retry_times=101, connect_all=Fal
         if cursor:
             return return_true(connect=cursor.db, cursor=cursor, server=None)
     
-    count = retry_times
+    # the rounds left, the new root password and the current one are tried in turn
+    count = [retry_times]
     cluster_config = plugin_context.cluster_config
     new_cluster_config = kwargs.get("new_cluster_config")
     stdio = plugin_context.stdio
@@ -52,8 +52,11 @@ def connect(plugin_context, target_server=None, retry_times=101, connect_all=Fal
     else:
         servers = cluster_config.servers
         stdio.start_loading('Connect to observer')
-    while count:
-        count -= 1
+
+    def connected():
+        if count[0] <= 0:
+            return False
+        count[0] -= 1
         connect_nums = 0
         for server in servers:
             try:
@@ -64,23 +67,26 @@ def connect(plugin_context, target_server=None, retry_times=101, connect_all=Fal
                     if new_config:
                         new_pwd = new_config['root_password']
                 password = server_config.get('root_password', '')
-                password = new_pwd if count % 2 else password
+                password = new_pwd if count[0] % 2 else password
                 cursor = Cursor(ip=server.ip, port=server_config.get('mysql_port', 2881), tenant='', password=password if password is not None else '', stdio=stdio)
                 if cursor.execute('select 1', raise_exception=False, exc_level='verbose'):
                     if not connect_all:
                         stdio.stop_loading('succeed', text='Connect to observer {}:{}'.format(server.ip, server_config.get('mysql_port', 2881)))
-                        return return_true(connect=cursor.db, cursor=cursor, server=server)
+                        return [cursor, server]
                     else:
                         connect_nums += 1
                         if connect_nums == len(servers):
                             stdio.stop_loading('succeed')
-                            return return_true(connect=cursor.db, cursor=cursor, server=server)
+                            return [cursor, server]
             except:
-                if count == 0:
+                if count[0] == 0:
                     stdio.exception('')
                 if connect_all:
                     break
-        time.sleep(3)
+    ret = plugin_context.wait_until(connected, interval=1, fail_on=lambda ret: ret is False, name='connect to observer')
+    if ret:
+        cursor, server = ret.value
+        return return_true(connect=cursor.db, cursor=cursor, server=server)
 
     stdio.stop_loading('fail')
     stdio.error(EC_FAIL_TO_CONNECT.format(component=cluster_config.name))
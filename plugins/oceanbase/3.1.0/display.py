@@ -16,7 +16,6 @@
 from __future__ import absolute_import, division, print_function
 
 import re
-import time
 import uuid
 
 from const import ENCRYPT_PASSWORD
@@ -58,39 +57,41 @@ def display(plugin_context, cursor, config_encrypted, display_encrypt_password='
         display_encrypt_password = None
     if plugin_context.get_variable('restart_manager'):
         cursor = plugin_context.get_return('connect').get_return('cursor')
+
+    def fetch_servers():
+        try:
+            return cursor.fetchall('select * from oceanbase.__all_server', raise_exception=True, exc_level='verbose')
+        except Exception as e:
+            code = e.args[0]
+            if code != 1146 and code != 4012:
+                raise e
+            return False
+
     try:
-        while True:
-            try:
-                servers = cursor.fetchall('select * from oceanbase.__all_server', raise_exception=True, exc_level='verbose')
-                if servers:
-                    stdio.print_list(servers, ['ip', 'version', 'port', 'zone', 'status'],
-                        lambda x: [x['svr_ip'], x['build_version'].split('_')[0], x['inner_port'], x['zone'], x['status']], title=cluster_config.name)
-                    user = 'root@%s' % (cursor.tenant if cursor.tenant else 'sys')
-                    password = cluster_config.get_global_conf().get('root_password', '') if not display_encrypt_password else display_encrypt_password
-                    cmd = 'obclient -h%s -P%s -u%s %s-Doceanbase -A' % (servers[0]['svr_ip'], servers[0]['inner_port'], user, '-p%s ' % passwd_format(password) if password else '')
-                    stdio.print(cmd)
-                    stdio.stop_loading('succeed')
-                    info_dict = {
-                        "type": "db",
-                        "ip": servers[0]['svr_ip'],
-                        "port": servers[0]['inner_port'],
-                        "user": user,
-                        "password": password,
-                        "cmd": cmd
-                    }
+        servers = plugin_context.wait_until(fetch_servers, name='wait for __all_server').value
+        stdio.print_list(servers, ['ip', 'version', 'port', 'zone', 'status'],
+            lambda x: [x['svr_ip'], x['build_version'].split('_')[0], x['inner_port'], x['zone'], x['status']], title=cluster_config.name)
+        user = 'root@%s' % (cursor.tenant if cursor.tenant else 'sys')
+        password = cluster_config.get_global_conf().get('root_password', '') if not display_encrypt_password else display_encrypt_password
+        cmd = 'obclient -h%s -P%s -u%s %s-Doceanbase -A' % (servers[0]['svr_ip'], servers[0]['inner_port'], user, '-p%s ' % passwd_format(password) if password else '')
+        stdio.print(cmd)
+        stdio.stop_loading('succeed')
+        info_dict = {
+            "type": "db",
+            "ip": servers[0]['svr_ip'],
+            "port": servers[0]['inner_port'],
+            "user": user,
+            "password": password,
+            "cmd": cmd
+        }
 
-                    var = cursor.fetchone('select unix_timestamp(gmt_create) as gmt_create from oceanbase.__all_virtual_sys_variable limit 1',  raise_exception=True, exc_level='verbose')
-                    if var:
-                        cid = int(var['gmt_create'] * 1000)
-                        unique_id = Codec.encoding(cid, servers[0]['build_version'])
-                        stdio.print('cluster unique id: %s\n' % unique_id)
-                    plugin_context.set_variable('server_infos', servers)
-                    return plugin_context.return_true(info=info_dict, unique_id=unique_id)
-            except Exception as e:
-                code = e.args[0]
-                if code != 1146 and code != 4012:
-                    raise e
-                time.sleep(3)
+        var = cursor.fetchone('select unix_timestamp(gmt_create) as gmt_create from oceanbase.__all_virtual_sys_variable limit 1',  raise_exception=True, exc_level='verbose')
+        if var:
+            cid = int(var['gmt_create'] * 1000)
+            unique_id = Codec.encoding(cid, servers[0]['build_version'])
+            stdio.print('cluster unique id: %s\n' % unique_id)
+        plugin_context.set_variable('server_infos', servers)
+        return plugin_context.return_true(info=info_dict, unique_id=unique_id)
     except:
         stdio.stop_loading('fail', 'observer need bootstarp')
     stdio.exception('')
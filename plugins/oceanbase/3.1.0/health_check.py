@@ -30,9 +30,8 @@ def health_check(plugin_context, *args, **kwargs):
     stdio = plugin_context.stdio
     stdio.start_loading('observer program health check')
     time.sleep(3)
-    failed = []
-    for server in cluster_config.servers:
-        client = clients[server]
+
+    def check(server, client):
         server_config = cluster_config.get_server_conf(server)
         home_path = server_config['home_path']
         remote_pid_path = '%s/run/observer.pid' % home_path
@@ -40,8 +39,11 @@ def health_check(plugin_context, *args, **kwargs):
         remote_pid = client.execute_command('cat %s' % remote_pid_path).stdout.strip()
         if remote_pid and client.execute_command('ls /proc/%s' % remote_pid):
             stdio.verbose('%s observer[pid: %s] started', server, remote_pid)
-        else:
-            failed.append(EC_OBSERVER_FAIL_TO_START.format(server=server))
+            return True
+        return False
+
+    rets = plugin_context.fan_out({server: check for server in cluster_config.servers})
+    failed = [EC_OBSERVER_FAIL_TO_START.format(server=server) for server in rets if not rets[server]]
     if failed:
         stdio.stop_loading('fail')
         for msg in failed:
@@ -14,7 +14,6 @@
 # limitations under the License.
 from __future__ import absolute_import, division, print_function
 
-import re
 import os
 import time
 
@@ -72,8 +71,8 @@ def resource_check(plugin_context, generate_configs={}, strict_check=False, *arg
         server_num = len(ip_servers)
 
         # memory
-        ret = client.execute_command('cat /proc/meminfo')
-        if ret:
+        memory = client.host_facts().memory
+        if memory:
             server_memory_stats = {}
             memory_key_map = {
                 'MemTotal': 'total',
@@ -83,11 +82,7 @@ def resource_check(plugin_context, generate_configs={}, strict_check=False, *arg
                 'Cached': 'cached'
             }
             for key in memory_key_map:
-                server_memory_stats[memory_key_map[key]] = 0
-            for k, v in re.findall('(\w+)\s*:\s*(\d+\s*\w+)', ret.stdout):
-                if k in memory_key_map:
-                    key = memory_key_map[k]
-                    server_memory_stats[key] = Capacity(str(v)).bytes
+                server_memory_stats[memory_key_map[key]] = memory.get(key, 0)
 
             server_memory_stat = servers_memory[ip]
             min_start_need = server_num * START_NEED_MEMORY
@@ -15,8 +15,6 @@
 
 from __future__ import absolute_import, division, print_function
 
-import time
-
 from tool import Cursor, set_plugin_context_variables
 
 
@@ -36,27 +34,29 @@ class RestartManager(object):
 
     def connect(self):
         if self.cursor is None or self.execute_sql('select version()', error=False) is False:
-            count = 101
-            while count:
-                count -= 1
+            # the rounds left, the root password and the empty one are tried in turn
+            count = [101]
+
+            def connected():
+                count[0] -= 1
                 for server in self.cluster_config.servers:
                     try:
                         server_config = self.cluster_config.get_server_conf(server)
-                        password = server_config.get('root_password', '') if count % 2 == 0 else ''
+                        password = server_config.get('root_password', '') if count[0] % 2 == 0 else ''
                         cursor = Cursor(ip=server.ip, port=server_config['mysql_port'], tenant='', password=password if password is not None else '', stdio=self.stdio)
                         if cursor.execute('select 1', raise_exception=False, exc_level='verbose'):
                             if self.cursor:
                                 self.close()
                             self.db = cursor.db
                             self.cursor = cursor
-                            count = 0
-                            break
+                            return True
                     except:
-                        if count == 0:
-                            return False
-                time.sleep(3)
-            while self.execute_sql('use oceanbase', error=False) is False:
-                time.sleep(2)
+                        pass
+                if not count[0]:
+                    return False
+            if not self.plugin_context.wait_until(connected, interval=1, fail_on=lambda ret: ret is False, name='connect to observer'):
+                return False
+            self.plugin_context.wait_until(lambda: self.execute_sql('use oceanbase', error=False) is not False, name='wait use oceanbase')
             self.execute_sql('set session ob_query_timeout=1000000000')
         return True
 
@@ -70,11 +70,7 @@ class RestartManager(object):
         return result
 
     def broken_sql(self, sql, sleep_time=3):
-        while True:
-            ret = self.execute_sql(sql, error=False)
-            if ret is None:
-                break
-            time.sleep(sleep_time)
+        self.plugin_context.wait_until(lambda: self.execute_sql(sql, error=False) is None, max_interval=sleep_time, name='wait no rows of: %s' % sql)
 
 
 def restart_pre(plugin_context, *args, **kwargs):
@@ -28,19 +28,23 @@ def start(plugin_context, *args, **kwargs):
     stdio = plugin_context.stdio
     clusters_cmd = plugin_context.get_variable('clusters_cmd')
     stdio.start_loading('Start observer')
-    for server in clusters_cmd:
+
+    def start_server(server, client):
         environments = deepcopy(cluster_config.get_environments())
-        client = clients[server]
         server_config = cluster_config.get_server_conf(server)
         stdio.verbose('starting %s observer', server)
         if 'LD_LIBRARY_PATH' not in environments:
             environments['LD_LIBRARY_PATH'] = '%s/lib:' % server_config['home_path']
         with EnvVariables(environments, client):
-            ret = client.execute_command(clusters_cmd[server])
-        if not ret:
-            stdio.stop_loading('fail')
-            stdio.error(EC_OBSERVER_FAIL_TO_START_WITH_ERR.format(server=server, stderr=ret.stderr))
-            return
+            return client.execute_command(clusters_cmd[server])
+
+    rets = plugin_context.fan_out({server: start_server for server in clusters_cmd})
+    failed = [server for server in rets if not rets[server]]
+    if failed:
+        stdio.stop_loading('fail')
+        for server in failed:
+            stdio.error(EC_OBSERVER_FAIL_TO_START_WITH_ERR.format(server=server, stderr=rets[server].stderr))
+        return
     stdio.stop_loading('succeed')
 
     need_bootstrap = plugin_context.get_variable('need_bootstrap', False)
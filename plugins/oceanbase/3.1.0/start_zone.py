@@ -15,8 +15,6 @@
 
 from __future__ import absolute_import, division, print_function
 
-import time
-
 
 def start_zone(plugin_context, zone, *args, **kwargs):
 
@@ -32,12 +30,10 @@ def start_zone(plugin_context, zone, *args, **kwargs):
         stdio.verbose('start zone %s' % zone)
         start_sql = "alter system start zone %s" % zone
         check_sql = "select * from oceanbase.__all_zone where name = 'status' and zone = '%s' and info != 'ACTIVE'" % zone
-        while True:
-            if restart_manager.execute_sql(start_sql, error=False) is None:
-                break
-            if restart_manager.execute_sql(check_sql, error=False) is None:
-                break
-            time.sleep(3)
+        plugin_context.wait_until(
+            lambda: restart_manager.execute_sql(start_sql, error=False) is None or restart_manager.execute_sql(check_sql, error=False) is None,
+            name='wait zone %s started' % zone
+        )
     if not restart_manager.connect():
         return plugin_context.return_false()
     stdio.verbose('server check')
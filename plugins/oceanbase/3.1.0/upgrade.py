@@ -16,7 +16,6 @@
 from __future__ import absolute_import, division, print_function
 
 import os
-import time
 import tool
 import datetime
 from ssh import LocalClient
@@ -202,8 +201,7 @@ class Upgrader(object):
                 self.close()
             self.cursor = ret.get_return('cursor')
             self.db = ret.get_return('connect')
-            while self.execute_sql('use oceanbase', error=False) is False:
-                time.sleep(2)
+            self.plugin_context.wait_until(lambda: self.execute_sql('use oceanbase', error=False) is not False, name='wait use oceanbase')
             self.execute_sql('set session ob_query_timeout=1000000000')
             server = ret.get_return('server')
             host = server.ip
@@ -274,24 +272,24 @@ class Upgrader(object):
         if self.execute_upgrade_sql('alter system begin upgrade') is False:
             self.stdio.stop_loading('fail')
             return False
-        time.sleep(2)
         sql = "select value from oceanbase.__all_virtual_sys_parameter_stat where name = 'enable_upgrade_mode' and value = 'False'"
-        while True:
-            if not self.execute_sql(sql, error=False):
-                self.stdio.stop_loading('succeed')
-                return True
-            time.sleep(2)
+        self.plugin_context.wait_until(lambda: not self.execute_sql(sql, error=False), name='wait upgrade mode on')
+        self.stdio.stop_loading('succeed')
+        return True
 
     def exec_upgrade_pre(self):
         return self._exec_script_all_repositories('upgrade_pre.py')
 
     def broken_sql(self, sql, sleep_time=3):
-        while True:
-            ret = self.execute_sql(sql, error=False)
-            if ret is None:
-                break
-            time.sleep(sleep_time)
-            self.connect(cache=False)
+        # every retry connects again
+        rounds = [0]
+
+        def no_rows():
+            if rounds[0]:
+                self.connect(cache=False)
+            rounds[0] += 1
+            return self.execute_sql(sql, error=False) is None
+        self.plugin_context.wait_until(no_rows, max_interval=sleep_time, name='wait no rows of: %s' % sql)
 
     def wait(self):
         if not self.connect():
@@ -308,12 +306,10 @@ class Upgrader(object):
             self.stdio.verbose('start zone %s' % zone)
             start_sql = "alter system start zone %s" % zone
             check_sql = "select * from oceanbase.__all_zone where name = 'status' and zone = '%s' and info != 'ACTIVE'" % zone
-            while True:
-                if self.execute_sql(start_sql, error=False) is None:
-                    break
-                if self.execute_sql(check_sql, error=False) is None:
-                    break
-                time.sleep(3)
+            self.plugin_context.wait_until(
+                lambda: self.execute_sql(start_sql, error=False) is None or self.execute_sql(check_sql, error=False) is None,
+                name='wait zone %s started' % zone
+            )
         self.wait()
         return True
 
@@ -324,12 +320,10 @@ class Upgrader(object):
         self.stdio.verbose('stop zone %s' % zone)
         stop_sql = "alter system stop zone %s" % zone
         check_sql = "select * from oceanbase.__all_zone where name = 'status' and zone = '%s' and info = 'ACTIVE'" % zone
-        while True:
-            if self.execute_sql(stop_sql, error=False) is None:
-                break
-            if self.execute_sql(check_sql, error=False):
-                break
-            time.sleep(3)
+        self.plugin_context.wait_until(
+            lambda: self.execute_sql(stop_sql, error=False) is None or self.execute_sql(check_sql, error=False),
+            name='wait zone %s stopped' % zone
+        )
         return True
 
     def upgrade_zone(self):
@@ -385,7 +379,8 @@ class Upgrader(object):
             if not self.start_zone(pre_zone):
                 self.stdio.stop_loading('stop_loading', 'fail')
                 return False
-            while True:
+
+            def schema_refreshed():
                 for server in zones_servers[zone]:
                     config = self.cluster_config.get_server_conf(server)
                     sql = '''
@@ -396,13 +391,14 @@ class Upgrader(object):
                         ) as b on a.tenant_id = b.tenant_id 
                     where b.tenant_id is null'''
                     if self.execute_sql(sql, args=(server.ip, config['rpc_port'])).get('cnt'):
-                        break
-                else:
-                    break
-                time.sleep(3)
+                        return False
+                return True
+            self.plugin_context.wait_until(schema_refreshed, name='wait zone %s schema refreshed' % zone)
 
-            while self.execute_sql("select * from oceanbase.__all_virtual_clog_stat where table_id = 1099511627777 and status != 'ACTIVE'"):
-                time.sleep(3)
+            self.plugin_context.wait_until(
+                lambda: not self.execute_sql("select * from oceanbase.__all_virtual_clog_stat where table_id = 1099511627777 and status != 'ACTIVE'"),
+                name='wait clog of zone %s active' % zone
+            )
             
             self.stop_zone(zone)
 
@@ -440,13 +436,10 @@ class Upgrader(object):
         if self.execute_upgrade_sql('alter system end upgrade') is False:
             self.stdio.stop_loading('fail')
             return False
-        time.sleep(2)
         sql = "select value from oceanbase.__all_virtual_sys_parameter_stat where name = 'enable_upgrade_mode' and value = 'True'"
-        while True:
-            if not self.execute_sql(sql, error=False):
-                self.stdio.stop_loading('succeed')
-                return True
-            time.sleep(2)
+        self.plugin_context.wait_until(lambda: not self.execute_sql(sql, error=False), name='wait upgrade mode off')
+        self.stdio.stop_loading('succeed')
+        return True
 
     def root_inspect(self):
         self.stdio.start_loading('Root inspection')
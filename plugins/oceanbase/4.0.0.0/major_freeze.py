@@ -15,8 +15,6 @@
 
 from __future__ import absolute_import, division, print_function
 
-import time
-
 
 def major_freeze(plugin_context, cursor, *args, **kwargs):
 
@@ -35,20 +33,19 @@ def major_freeze(plugin_context, cursor, *args, **kwargs):
     merge_version = merge_version['FROZEN_SCN']
     if cursor.execute("alter system major freeze tenant = %s" % tenant_name) is False:
         return
-    while True:
-        current_version = cursor.fetchone(sql_frozen_scn)
-        if current_version is False:
-            return
-        current_version = current_version.get("FROZEN_SCN")
-        if int(current_version) > int(merge_version):
-            break
-        time.sleep(5)
-    while True:
+    def merge_version_changed():
+        ret = cursor.fetchone(sql_frozen_scn)
+        if ret is False or int(ret['FROZEN_SCN']) > int(merge_version):
+            return ret
+    ret = plugin_context.wait_until(merge_version_changed, max_interval=5, name='wait merge version changed', fail_on=lambda ret: ret is False)
+    if not ret:
+        return
+    current_version = ret.value['FROZEN_SCN']
+    def merge_finished():
         ret = cursor.fetchone(sql_frozen_scn)
-        if ret is False:
-            return
-        if int(ret.get("FROZEN_SCN", 0)) / 1000 == int(ret.get("LAST_SCN", 0)) / 1000:
-            break
-        time.sleep(5)
+        if ret is False or int(ret.get("FROZEN_SCN", 0)) / 1000 == int(ret.get("LAST_SCN", 0)) / 1000:
+            return ret
+    if not plugin_context.wait_until(merge_finished, max_interval=5, name='wait merge finished', fail_on=lambda ret: ret is False):
+        return
     stdio.stop_loading('succeed')
     return plugin_context.return_true()
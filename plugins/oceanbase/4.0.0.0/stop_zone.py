@@ -15,8 +15,6 @@
 
 from __future__ import absolute_import, division, print_function
 
-import time
-
 
 def stop_zone(plugin_context, zone, *args, **kwargs):
     stdio = plugin_context.stdio
@@ -31,11 +29,9 @@ def stop_zone(plugin_context, zone, *args, **kwargs):
     stdio.verbose('stop zone %s' % zone)
     stop_sql = "alter system stop zone %s" % zone
     check_sql = "select * from oceanbase.__all_zone where name = 'status' and zone = '%s' and info = 'ACTIVE'" % zone
-    while True:
-        if restart_manager.execute_sql(stop_sql, error=False) is None:
-            break
-        if restart_manager.execute_sql(check_sql, error=False):
-            break
-        time.sleep(3)
+    plugin_context.wait_until(
+        lambda: restart_manager.execute_sql(stop_sql, error=False) is None or restart_manager.execute_sql(check_sql, error=False),
+        name='wait zone %s stopped' % zone
+    )
 
     return plugin_context.return_true()
\ No newline at end of file
@@ -16,7 +16,6 @@
 from __future__ import absolute_import, division, print_function
 
 import os
-import time
 from collections import defaultdict
 
 import tool
@@ -209,8 +208,7 @@ class Upgrader(object):
                 self.close()
             self.cursor = ret.get_return('cursor')
             self.db = ret.get_return('connect')
-            while self.execute_sql('use oceanbase', error=False) is False:
-                time.sleep(2)
+            self.plugin_context.wait_until(lambda: self.execute_sql('use oceanbase', error=False) is not False, name='wait use oceanbase')
             self.execute_sql('set session ob_query_timeout=1000000000')
             server = ret.get_return('server')
             host = server.ip
@@ -285,16 +283,15 @@ class Upgrader(object):
     def disable_ddl_and_check(self):
         if self.repositories[self.route_index - 1].version == Version('4.0.0.0'):
             self.stdio.start_loading('Disable DDL')
+            wait_until = self.plugin_context.wait_until
             while True:
                 # check ddl end
-                while self.execute_sql("select task_id from __all_virtual_ddl_task_status", error=True):
-                    time.sleep(3)
+                wait_until(lambda: not self.execute_sql("select task_id from __all_virtual_ddl_task_status", error=True), name='wait ddl task end')
                 # close ddl
                 if self.execute_sql('alter system set enable_ddl = false') is False:
                     self.stdio.stop_loading('fail')
                     return False
-                while self.execute_sql("select * from __all_virtual_sys_parameter_stat where name = 'enable_ddl' and value != 'false'"):
-                    time.sleep(3)
+                wait_until(lambda: not self.execute_sql("select * from __all_virtual_sys_parameter_stat where name = 'enable_ddl' and value != 'false'"), name='wait enable_ddl = false')
 
                 # check ddl end
                 if self.execute_sql("select task_id from __all_virtual_ddl_task_status", error=True):
@@ -307,9 +304,12 @@ class Upgrader(object):
             self.stdio.verbose('wait clog sync')
             rets = self.execute_sql("select tenant_id, ls_id, max(max_scn) as max_scn from gv$ob_log_stat group by tenant_id, ls_id", one=False, error=True)
             if rets is not None:
+                # poll all log streams in each round
+                conditions = {}
                 for ret in rets:
-                    while self.execute_sql("select unsubmitted_log_scn from __all_virtual_replay_stat where tenant_id = %s and ls_id = %s and role != 'leader' and unsubmitted_log_scn <= %s" % (ret['tenant_id'], ret['ls_id'], ret['max_scn']), error=True):
-                        time.sleep(3)
+                    sql = "select unsubmitted_log_scn from __all_virtual_replay_stat where tenant_id = %s and ls_id = %s and role != 'leader' and unsubmitted_log_scn <= %s" % (ret['tenant_id'], ret['ls_id'], ret['max_scn'])
+                    conditions[(ret['tenant_id'], ret['ls_id'])] = lambda sql=sql: not self.execute_sql(sql, error=True)
+                wait_until(conditions, name='wait clog sync')
 
             # major freeze
             # 1. wait all tenant global_broadcast_scn = last_scn,  record tenant_id, global_broadcast_scn
@@ -317,45 +317,58 @@ class Upgrader(object):
             tenant_ids = []
             for tenant_info in self.execute_sql("select tenant_id from CDB_OB_MAJOR_COMPACTION", one=False):
                 tenant_ids.append(tenant_info['tenant_id'])
-            while tenant_ids:
+
+            def check_pre_tenant_scn():
+                if not tenant_ids:
+                    return True
                 pre_tenant_scn_list = self.execute_sql("select tenant_id, global_broadcast_scn, last_scn from CDB_OB_MAJOR_COMPACTION where tenant_id in ({})".format(",".join([str(x) for x in tenant_ids])), one=False)
-                tenant_ids = []
+                del tenant_ids[:]
                 for pre_tenant_scn in pre_tenant_scn_list:
                     if pre_tenant_scn['global_broadcast_scn'] > pre_tenant_scn['last_scn']:
                         tenant_ids.append(pre_tenant_scn['tenant_id'])
                         continue
                     pre_tenant_scn_dict[pre_tenant_scn['tenant_id']] = pre_tenant_scn['global_broadcast_scn']
-                time.sleep(1)
+                return not tenant_ids
+            wait_until(check_pre_tenant_scn, max_interval=1, name='wait last major compaction')
 
             # 2. begin merge
             self.execute_sql("alter system major freeze tenant = all", error=False)
 
             # 3. wait merge start
-            tenant_ids = pre_tenant_scn_dict.keys()
-            while tenant_ids:
+            tenant_ids = list(pre_tenant_scn_dict.keys())
+
+            def check_merge_start():
+                if not tenant_ids:
+                    return True
                 tenant_scn_list = self.execute_sql("select tenant_id, global_broadcast_scn from CDB_OB_MAJOR_COMPACTION where tenant_id in ({})".format(",".join([str(x) for x in tenant_ids])), one=False)
-                tenant_ids = []
+                del tenant_ids[:]
                 for tenant_scn in tenant_scn_list:
                     if pre_tenant_scn_dict[tenant_scn['tenant_id']] >= tenant_scn['global_broadcast_scn']:
                         tenant_ids.append(tenant_scn['tenant_id'])
-                        continue
-                time.sleep(3)
+                return not tenant_ids
+            wait_until(check_merge_start, name='wait merge start')
 
             # 4. wait merge finish
-            while self.execute_sql("select * from CDB_OB_MAJOR_COMPACTION where global_broadcast_scn > last_scn"):
-                time.sleep(3)
+            wait_until(
+                lambda: not self.execute_sql("select * from CDB_OB_MAJOR_COMPACTION where global_broadcast_scn > last_scn"),
+                name='wait merge finish',
+                progress=lambda ret: 'Disable DDL: wait merge finish (%ds)' % ret.elapsed
+            )
 
             self.stdio.stop_loading('succeed')
 
         return True
 
     def broken_sql(self, sql, sleep_time=3):
-        while True:
-            ret = self.execute_sql(sql, error=False)
-            if ret is None:
-                break
-            time.sleep(sleep_time)
-            self.connect(cache=False)
+        # every retry connects again
+        rounds = [0]
+
+        def no_rows():
+            if rounds[0]:
+                self.connect(cache=False)
+            rounds[0] += 1
+            return self.execute_sql(sql, error=False) is None
+        self.plugin_context.wait_until(no_rows, max_interval=sleep_time, name='wait no rows of: %s' % sql)
 
     def wait(self):
         if not self.connect():
@@ -372,12 +385,10 @@ class Upgrader(object):
             self.stdio.verbose('start zone %s' % zone)
             start_sql = "alter system start zone %s" % zone
             check_sql = "select * from oceanbase.__all_zone where name = 'status' and zone = '%s' and info != 'ACTIVE'" % zone
-            while True:
-                if self.execute_sql(start_sql, error=False) is None:
-                    break
-                if self.execute_sql(check_sql, error=False) is None:
-                    break
-                time.sleep(3)
+            self.plugin_context.wait_until(
+                lambda: self.execute_sql(start_sql, error=False) is None or self.execute_sql(check_sql, error=False) is None,
+                name='wait zone %s started' % zone
+            )
         self.wait()
         return True
 
@@ -180,9 +180,8 @@ def generate_general_config(plugin_context, generate_config_mini=False, auto_dep
 
         # cpu
         if not server_config.get('cpu_count'):
-            ret = client.execute_command("grep -e 'processor\s*:' /proc/cpuinfo | wc -l")
-            if ret and ret.stdout.strip().isdigit():
-                cpu_num = int(ret.stdout)
+            cpu_num = client.host_facts().cpu_count
+            if cpu_num:
                 server_config['cpu_count'] = max(MIN_CPU_COUNT, int(cpu_num - 2))
             else:
                 server_config['cpu_count'] = MIN_CPU_COUNT
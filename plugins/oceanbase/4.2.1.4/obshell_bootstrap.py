@@ -15,8 +15,6 @@
 
 from __future__ import absolute_import, division, print_function
 
-import time
-
 import requests.exceptions
 from obshell import ClientSet
 from obshell.auth import PasswordAuth
@@ -30,11 +28,10 @@ def obshell_bootstrap(plugin_context, need_bootstrap=None, *args, **kwargs):
     stdio = plugin_context.stdio
     cluster_config = plugin_context.cluster_config
     stdio.start_loading('obshell bootstrap')
-    time.sleep(3)
     try:
-        count = 200
         obshell_clients = {}
-        while count:
+
+        def taken_over():
             take_over_count = 0
             for server in cluster_config.servers:
                 if server not in obshell_clients:
@@ -57,13 +54,13 @@ def obshell_bootstrap(plugin_context, need_bootstrap=None, *args, **kwargs):
                 elif info.identity == Agentidentity.CLUSTER_AGENT.value:
                     take_over_count += 1
             if take_over_count == len(cluster_config.servers):
-                break
-            time.sleep(3)
-            count -= 1
-        if count == 0:
+                return [client]
+        ret = plugin_context.wait_until(taken_over, timeout=600, interval=1, name='wait obshell take over')
+        if not ret:
             stdio.stop_loading('fail')
             stdio.error('obshell bootstrap failed: get obshell take over result timeout!')
             return plugin_context.return_false()
+        client = ret.value[0]
     except Exception as e:
         stdio.exception('')
         stdio.stop_loading('fail')
@@ -16,11 +16,10 @@
 from __future__ import absolute_import, division, print_function
 
 import json
-import time
 import requests
 from urllib.parse import urlparse
 
-from tool import NetUtil
+from tool import NetUtil, OrderedDict
 
 
 def is_ob_configserver(obconfig_url, stdio):
@@ -92,19 +91,18 @@ def stop(plugin_context, *args, **kwargs):
                     stdio.warn('%s status code %s' % (cleanup_config_url_content, response.status_code))
             except:
                 stdio.warn('failed to clean up the configuration url content')
-    servers = {}
-    for server in cluster_config.servers:
+
+    def kill_server(server, client):
         server_config = cluster_config.get_server_conf(server)
-        client = clients[server]
         if 'home_path' not in server_config:
             stdio.verbose('%s home_path is empty', server)
-            continue
+            return None
         remote_pid_path = '%s/run/observer.pid' % server_config['home_path']
         remote_pid = client.execute_command('cat %s' % remote_pid_path).stdout.strip()
         if remote_pid and client.execute_command('ps uax | egrep " %s " | grep -v grep' % remote_pid):
             stdio.verbose('%s observer[pid:%s] stopping ...' % (server, remote_pid))
             client.execute_command('kill -9 %s' % (remote_pid))
-            servers[server] = {
+            return {
                 'client': client,
                 'mysql_port': server_config['mysql_port'],
                 'rpc_port': server_config['rpc_port'],
@@ -113,34 +111,41 @@ def stop(plugin_context, *args, **kwargs):
             }
         else:
             stdio.verbose('%s observer is not running ...' % server)
-    count = 30
-    time.sleep(1)
-    while count and servers:
-        tmp_servers = {}
-        for server in servers:
-            data = servers[server]
-            client = clients[server]
-            stdio.verbose('%s check whether the port is released' % server)
-            for key in ['rpc_port', 'mysql_port']:
-                if data[key] and not port_release_check(data['client'], data['pid'], data[key], count):
-                    tmp_servers[server] = data
-                    break
-                data[key] = ''
-            else:
-                client.execute_command('rm -f %s' % (data['path']))
-                stdio.verbose('%s observer is stopped', server)
-        servers = tmp_servers
-        count -= 1
-        if count and servers:
-            if count == 5:
-                for server in servers:
-                    data = servers[server]
-                    server_config = cluster_config.get_server_conf(server)
-                    client = clients[server]
-                    client.execute_command(
-                        "if [[ -d /proc/%s ]]; then pkill -9 -u `whoami` -f '%s/bin/observer -p %s';fi" %
-                        (data['pid'], server_config['home_path'], server_config['mysql_port']))
-            time.sleep(3)
+        return None
+
+    def release_check(server, client):
+        data = servers[server]
+        stdio.verbose('%s check whether the port is released' % server)
+        for key in ['rpc_port', 'mysql_port']:
+            if data[key] and not port_release_check(data['client'], data['pid'], data[key], count[0]):
+                return False
+            data[key] = ''
+        client.execute_command('rm -f %s' % (data['path']))
+        stdio.verbose('%s observer is stopped', server)
+        return True
+
+    rets = plugin_context.fan_out({server: kill_server for server in cluster_config.servers})
+    servers = OrderedDict((server, rets[server].value) for server in rets if rets[server].value)
+    # the rounds left, the observers still holding the ports are killed again 5 rounds before the end
+    count = [30]
+
+    def ports_released():
+        rets = plugin_context.fan_out({server: release_check for server in servers})
+        for server in rets:
+            if rets[server]:
+                del servers[server]
+        count[0] -= 1
+        if count[0] == 5 and servers:
+            commands = {}
+            for server in servers:
+                data = servers[server]
+                server_config = cluster_config.get_server_conf(server)
+                commands[server] = "if [[ -d /proc/%s ]]; then pkill -9 -u `whoami` -f '%s/bin/observer -p %s';fi" % \
+                    (data['pid'], server_config['home_path'], server_config['mysql_port'])
+            plugin_context.fan_out(commands)
+        return not servers or not count[0]
+    if servers:
+        plugin_context.wait_until(ports_released, interval=1, name='wait observer ports released')
 
     if servers:
         stdio.stop_loading('fail')
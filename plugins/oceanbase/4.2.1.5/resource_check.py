@@ -24,11 +24,17 @@ from _types import Capacity
 
 def get_disk_info_by_path(path, client, stdio):
     disk_info = {}
-    ret = client.execute_command('df --block-size=1024 {}'.format(path))
-    if ret:
-        for total, used, avail, puse, path in re.findall(r'(\d+)\s+(\d+)\s+(\d+)\s+(\d+%)\s+(.+)', ret.stdout):
-            disk_info[path] = {'total': int(total) << 10, 'avail': int(avail) << 10, 'need': 0}
-            stdio.verbose('get disk info for path {}, total: {} avail: {}'.format(path, disk_info[path]['total'], disk_info[path]['avail']))
+    if path:
+        mounts = {}
+        ret = client.execute_command('df --block-size=1024 {}'.format(path))
+        if ret:
+            for total, used, avail, puse, mount_path in re.findall(r'(\d+)\s+(\d+)\s+(\d+)\s+(\d+%)\s+(.+)', ret.stdout):
+                mounts[mount_path] = {'total': int(total) << 10, 'avail': int(avail) << 10}
+    else:
+        mounts = client.host_facts().mounts
+    for path in mounts:
+        disk_info[path] = {'total': mounts[path]['total'], 'avail': mounts[path]['avail'], 'need': 0}
+        stdio.verbose('get disk info for path {}, total: {} avail: {}'.format(path, disk_info[path]['total'], disk_info[path]['avail']))
     return disk_info
 
 
@@ -117,8 +123,8 @@ def resource_check(plugin_context, generate_configs={}, strict_check=False, *arg
         server_num = len(ip_servers)
 
         # memory
-        ret = client.execute_command('cat /proc/meminfo')
-        if ret:
+        memory = client.host_facts().memory
+        if memory:
             server_memory_stats = {}
             memory_key_map = {
                 'MemTotal': 'total',
@@ -128,11 +134,7 @@ def resource_check(plugin_context, generate_configs={}, strict_check=False, *arg
                 'Cached': 'cached'
             }
             for key in memory_key_map:
-                server_memory_stats[memory_key_map[key]] = 0
-            for k, v in re.findall('(\w+)\s*:\s*(\d+\s*\w+)', ret.stdout):
-                if k in memory_key_map:
-                    key = memory_key_map[k]
-                    server_memory_stats[key] = Capacity(str(v)).bytes
+                server_memory_stats[memory_key_map[key]] = memory.get(key, 0)
 
             ip_server_memory_info[ip] = server_memory_stats
             server_memory_stat = servers_memory[ip]
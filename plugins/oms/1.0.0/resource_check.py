@@ -64,12 +64,12 @@ def resource_check(plugin_context, work_dir_check=False, *args, **kwargs):
                 )
         check_pass(server, 'port')
 
-        default_cpu_count = client.execute_command("grep -e 'processor\s*:' /proc/cpuinfo | wc -l").stdout.strip()
-        if not default_cpu_count or (int(default_cpu_count) < 9):
+        facts = client.host_facts()
+        if not facts.cpu_count or facts.cpu_count < 9:
             stdio.warn('Insufficient resources: CPU cores fewer than 8, which will affect the speed of data migration.')
 
-        memory = client.execute_command("grep MemTotal /proc/meminfo | sed 's/^[^0-9]*//g'|sed 's/kB//g'").stdout.strip()
-        if not memory or (int(memory) // 1024 // 1024 < 16):
+        memory = facts.memory.get('MemTotal', 0)
+        if (memory >> 30) < 16:
             stdio.warn('Insufficient resources: Memory less than 16 GB. Each migration task requires at least 12 GB of memory for both full and incremental migration. Insufficient memory can cause the migration task to fail.')
 
         logs_path = server_config.get('logs_mount_path')
@@ -73,20 +73,20 @@ def resource_check(plugin_context, *args, **kwargs):
         if port_check_pass:
             check_pass(server, 'port')
 
-        default_cpu_count = client.execute_command("grep -e 'processor\s*:' /proc/cpuinfo | wc -l").stdout.strip()
-        if not default_cpu_count or (int(default_cpu_count) < 4):
+        facts = client.host_facts()
+        if not facts.cpu_count or facts.cpu_count < 4:
            critical(server,
                'cpu',
-               err.EC_CPU_CORE_NOT_ENOUGH.format(server=server, current=default_cpu_count, required=4)
+               err.EC_CPU_CORE_NOT_ENOUGH.format(server=server, current=facts.cpu_count or 0, required=4)
            )
         else:
             check_pass(server, 'cpu')
 
-        memory = client.execute_command("grep MemTotal /proc/meminfo | sed 's/^[^0-9]*//g'|sed 's/kB//g'").stdout.strip()
-        if not memory or (int(memory) // 1024 // 1024 < 16):
+        memory = facts.memory.get('MemTotal', 0)
+        if (memory >> 30) < 16:
             critical(server,
                 'memory',
-                err.EC_OBSERVER_NOT_ENOUGH_MEMORY.format(server=server, free=Capacity(int(memory)), need='16G')
+                err.EC_OBSERVER_NOT_ENOUGH_MEMORY.format(server=server, free=Capacity(memory), need='16G')
             )
         else:
             check_pass(server, 'memory')
@@ -93,12 +93,15 @@ def environment_check(plugin_context, work_dir_empty_check=True, generate_config
                             critical(server, 'dir', check_dirs[path], suggests)
                         break
 
-                    if client.execute_command('bash -c "[ -a %s ]"' % path):
-                        is_dir = client.execute_command('[ -d {} ]'.format(path))
-                        has_write_permission = client.execute_command('[ -w {} ]'.format(path))
+                    commands = ['bash -c "[ -a %s ]"' % path, '[ -d {} ]'.format(path), '[ -w {} ]'.format(path)]
+                    if empty_check:
+                        commands.append('ls %s' % path)
+                    rets = client.execute_commands(commands)
+                    exists, is_dir, has_write_permission = rets[:3]
+                    ret = rets[3] if empty_check else None
+                    if exists:
                         if is_dir and has_write_permission:
                             if empty_check:
-                                ret = client.execute_command('ls %s' % path)
                                 if not ret or ret.stdout.strip():
                                     check_dirs[path] = err.EC_FAIL_TO_INIT_PATH.format(server=server, key=key, msg=err.InitDirFailedErrorMessage.NOT_EMPTY.format(path=path))
                                 else:
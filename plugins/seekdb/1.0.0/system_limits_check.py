@@ -17,6 +17,7 @@ from __future__ import absolute_import, division, print_function
 import re
 
 import _errno as err
+from ssh import gather_host_facts
 
 
 def system_limits_check(plugin_context, ulimits_min, generate_configs={}, strict_check=False,  *args, **kwargs):
@@ -35,19 +36,20 @@ def system_limits_check(plugin_context, ulimits_min, generate_configs={}, strict
     INF = float('inf')
 
     need_check_servers_disk = {}
+    # the facts of all hosts are collected at the same time, one batch for each host
+    ips = list(servers_disk.keys())
+    servers_facts = dict(zip(ips, gather_host_facts([servers_clients[ip] for ip in ips], stdio=stdio)))
     for ip in servers_disk:
-        client = servers_clients[ip]
         ip_servers = servers_memory[ip]['servers'].keys()
         server_num = len(ip_servers)
 
-        ret = client.execute_command('cat /proc/sys/fs/aio-max-nr /proc/sys/fs/aio-nr')
-        if not ret:
+        facts = servers_facts[ip]
+        if not facts.raw['aio']:
             for server in ip_servers:
                 critical(server, 'aio', err.EC_FAILED_TO_GET_AIO_NR.format(ip=ip), [err.SUG_CONNECT_EXCEPT.format()])
         else:
             try:
-                max_nr, nr = ret.stdout.strip().split('\n')
-                max_nr, nr = int(max_nr), int(nr)
+                max_nr, nr = facts.aio['max_nr'], facts.aio['nr']
                 need = server_num * 20000
                 RECD_AIO = 1048576
                 if need > max_nr - nr:
@@ -61,11 +63,7 @@ def system_limits_check(plugin_context, ulimits_min, generate_configs={}, strict
                     alert(server, 'aio', err.EC_FAILED_TO_GET_AIO_NR.format(ip=ip), [err.SUG_UNSUPPORT_OS.format()])
                 stdio.exception('')
 
-        ret = client.execute_command('bash -c "ulimit -a"')
-        ulimits = {}
-        src_data = re.findall('\s?([a-zA-Z\s]+[a-zA-Z])\s+\([a-zA-Z\-,\s]+\)\s+([\d[a-zA-Z]+)', ret.stdout) if ret else []
-        for key, value in src_data:
-            ulimits[key] = value
+        ulimits = facts.ulimits
         for key in ulimits_min:
             value = ulimits.get(key)
             if value == 'unlimited':
@@ -102,17 +100,12 @@ def system_limits_check(plugin_context, ulimits_min, generate_configs={}, strict
                     if ip == server.ip:
                         break
                 cmd = 'sysctl -a'
-                ret = client.execute_command(cmd)
-                if not ret:
+                if not facts.kernel_params:
                     alert_strict(server, 'kernel', err.EC_FAILED_TO_GET_PARAM.format(key='kernel parameter ', cmd=cmd), [err.SUG_CONNECT_EXCEPT.format(ip=ip)])
                     continue
                 kernel_params = {}
-                kernel_param_src = ret.stdout.split('\n')
-                for kernel in kernel_param_src:
-                    if not kernel:
-                        continue
-                    kernel = kernel.split('=')
-                    kernel_params[kernel[0].strip()] = re.findall(r"[-+]?\d+", kernel[1])
+                for key, value in facts.kernel_params.items():
+                    kernel_params[key] = re.findall(r"[-+]?\d+", value)
 
                 for kernel_param in kernel_check_items:
                     check_item = kernel_param['check_item']
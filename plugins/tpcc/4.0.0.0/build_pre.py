@@ -15,8 +15,6 @@
 
 from __future__ import absolute_import, division, print_function
 
-import time
-
 from tool import set_plugin_context_variables
 
 
@@ -38,23 +36,22 @@ def build_pre(plugin_context, *args, **kwargs):
         if cursor.fetchone("alter system major freeze tenant = %s" % tenant_name) is False:
             return False
         # merge version changed
-        while True:
-            current_version = cursor.fetchone(sql_frozen_scn)
-            if current_version is False:
-                return False
-            current_version = current_version['FROZEN_SCN']
-            if int(current_version) > int(merge_version):
-                break
-            time.sleep(5)
+        def merge_version_changed():
+            ret = cursor.fetchone(sql_frozen_scn)
+            if ret is False or int(ret['FROZEN_SCN']) > int(merge_version):
+                return ret
+        ret = plugin_context.wait_until(merge_version_changed, max_interval=5, name='wait merge version changed', fail_on=lambda ret: ret is False)
+        if not ret:
+            return False
+        current_version = ret.value['FROZEN_SCN']
         stdio.verbose('current merge version is: %s' % current_version)
         # version updated
-        while True:
+        def merge_finished():
             ret = cursor.fetchone(sql_frozen_scn)
-            if ret is False:
-                return False
-            if int(ret.get("FROZEN_SCN", 0)) / 1000 == int(ret.get("LAST_SCN", 0)) / 1000:
-                break
-            time.sleep(5)
+            if ret is False or int(ret.get("FROZEN_SCN", 0)) / 1000 == int(ret.get("LAST_SCN", 0)) / 1000:
+                return ret
+        if not plugin_context.wait_until(merge_finished, max_interval=5, name='wait merge finished', fail_on=lambda ret: ret is False):
+            return False
         stdio.stop_loading('succeed')
         return True
 
@@ -100,9 +100,9 @@ def run_test(plugin_context, *args, **kwargs):
 
     for server in cluster_config.servers:
         client = clients[server]
-        ret = client.execute_command("grep -e 'processor\s*:' /proc/cpuinfo | wc -l")
-        if ret and ret.stdout.strip().isdigit():
-            cpu_total += int(ret.stdout)
+        cpu_num = client.host_facts().cpu_count
+        if cpu_num:
+            cpu_total += cpu_num
         else:
             server_config = cluster_config.get_server_conf(server)
             cpu_total += int(server_config.get('cpu_count', 0))
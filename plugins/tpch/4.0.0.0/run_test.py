@@ -102,9 +102,9 @@ def run_test(plugin_context, *args, **kwargs):
 
     for server in cluster_config.servers:
         client = clients[server]
-        ret = client.execute_command("grep -e 'processor\s*:' /proc/cpuinfo | wc -l")
-        if ret and ret.stdout.strip().isdigit():
-            cpu_total += int(ret.stdout)
+        cpu_num = client.host_facts().cpu_count
+        if cpu_num:
+            cpu_total += cpu_num
         else:
             server_config = cluster_config.get_server_conf(server)
             cpu_total += int(server_config.get('cpu_count', 0))
@@ -165,21 +165,20 @@ def run_test(plugin_context, *args, **kwargs):
             merge_version = merge_version['FROZEN_SCN']
             if cursor.fetchone("alter system major freeze tenant = %s" % tenant_name) is False:
                 return
-            while True:
-                current_version = cursor.fetchone(sql_frozen_scn)
-                if current_version is False:
-                    return
-                current_version = current_version['FROZEN_SCN']
-                if int(current_version) > int(merge_version):
-                    break
-                time.sleep(5)
-            while True:
+            def merge_version_changed():
                 ret = cursor.fetchone(sql_frozen_scn)
-                if ret is False:
-                    return
-                if int(ret.get("FROZEN_SCN", 0)) / 1000 == int(ret.get("LAST_SCN", 0)) / 1000:
-                    break
-                time.sleep(5)
+                if ret is False or int(ret['FROZEN_SCN']) > int(merge_version):
+                    return ret
+            ret = plugin_context.wait_until(merge_version_changed, max_interval=5, name='wait merge version changed', fail_on=lambda ret: ret is False)
+            if not ret:
+                return
+            current_version = ret.value['FROZEN_SCN']
+            def merge_finished():
+                ret = cursor.fetchone(sql_frozen_scn)
+                if ret is False or int(ret.get("FROZEN_SCN", 0)) / 1000 == int(ret.get("LAST_SCN", 0)) / 1000:
+                    return ret
+            if not plugin_context.wait_until(merge_finished, max_interval=5, name='wait merge finished', fail_on=lambda ret: ret is False):
+                return
             # analyze
             local_dir, _ = os.path.split(__file__)
             analyze_path = os.path.join(local_dir, 'analyze.sql')
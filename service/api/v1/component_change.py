@@ -194,9 +194,12 @@ async def get_component_change_log(
     task_info = handler.get_component_change_task_info(name)
     if task_info is None:
         return response_utils.new_internal_server_error_exception("task {0} not found".format(name))
-    origin_log = handler.buffer.read() if components is None else handler.get_component_change_log_by_component(components, 'add_component')
-    masked_log = handler.obd.stdio.table_log_masking(handler.obd.stdio.log_masking(origin_log))
-    log_info = InstallLog(log=masked_log[offset:], offset=len(masked_log))
+    if components is None:
+        masked_log = handler.obd.stdio.table_log_masking(handler.obd.stdio.log_masking(handler.buffer.read()))
+        log_info = InstallLog(log=masked_log[offset:], offset=len(masked_log))
+    else:
+        origin_log, next_offset = handler.get_component_change_log_by_component(components, 'add_component', offset)
+        log_info = InstallLog(log=handler.obd.stdio.table_log_masking(handler.obd.stdio.log_masking(origin_log)), offset=next_offset)
     return response_utils.new_ok_response(log_info)
 
 
@@ -147,9 +147,12 @@ async def get_start_log(name: str = Path(description='deployment name'),
     task_info = handler.get_start_task_info(name)
     if task_info is None:
         return response_utils.new_not_found_exception("task {0} not found".format(name))
-    origin_log = handler.buffer.read() if component_name is None else handler.get_install_log_by_component(component_name)
-    masked_log = handler.obd.stdio.table_log_masking(handler.obd.stdio.log_masking(origin_log))
-    log_info = InstallLog(log=masked_log[offset:], offset=len(masked_log))
+    if component_name is None:
+        masked_log = handler.obd.stdio.table_log_masking(handler.obd.stdio.log_masking(handler.buffer.read()))
+        log_info = InstallLog(log=masked_log[offset:], offset=len(masked_log))
+    else:
+        origin_log, next_offset = handler.get_install_log_by_component(component_name, offset or 0)
+        log_info = InstallLog(log=handler.obd.stdio.table_log_masking(handler.obd.stdio.log_masking(origin_log)), offset=next_offset)
     return response_utils.new_ok_response(log_info)
 
 
@@ -190,9 +193,12 @@ async def get_stop_log(name: str = Path(description='deployment name'),
     task_info = handler.get_stop_task_info(name)
     if task_info is None:
         return response_utils.new_not_found_exception("task {0} not found".format(name))
-    origin_log = handler.buffer.read() if component_name is None else handler.get_install_log_by_component(component_name)
-    masked_log = handler.obd.stdio.table_log_masking(handler.obd.stdio.log_masking(origin_log))
-    log_info = InstallLog(log=masked_log[offset:], offset=len(masked_log))
+    if component_name is None:
+        masked_log = handler.obd.stdio.table_log_masking(handler.obd.stdio.log_masking(handler.buffer.read()))
+        log_info = InstallLog(log=masked_log[offset:], offset=len(masked_log))
+    else:
+        origin_log, next_offset = handler.get_install_log_by_component(component_name, offset or 0)
+        log_info = InstallLog(log=handler.obd.stdio.table_log_masking(handler.obd.stdio.log_masking(origin_log)), offset=next_offset)
     return response_utils.new_ok_response(log_info)
 
 @router.get("/deployments/{name}/connection",
@@ -221,9 +227,12 @@ async def get_install_log(name: str = Path(description='deployment name'),
     task_info = handler.get_install_task_info(name)
     if task_info is None:
         return response_utils.new_not_found_exception("task {0} not found".format(name))
-    origin_log = handler.buffer.read() if component_name is None else handler.get_install_log_by_component(component_name)
-    masked_log = handler.obd.stdio.table_log_masking(handler.obd.stdio.log_masking(origin_log))
-    log_info = InstallLog(log=masked_log[offset:], offset=len(masked_log))
+    if component_name is None:
+        masked_log = handler.obd.stdio.table_log_masking(handler.obd.stdio.log_masking(handler.buffer.read()))
+        log_info = InstallLog(log=masked_log[offset:], offset=len(masked_log))
+    else:
+        origin_log, next_offset = handler.get_install_log_by_component(component_name, offset or 0)
+        log_info = InstallLog(log=handler.obd.stdio.table_log_masking(handler.obd.stdio.log_masking(origin_log)), offset=next_offset)
     return response_utils.new_ok_response(log_info)
 
 
@@ -381,9 +390,12 @@ async def get_install_log(offset: int = Query(None, description='log offset'),
     if task_info is None:
         return response_utils.new_not_found_exception("task {0} not found".format(task_id))
     trace_id = handler.context['create_tenant_trace'][task_id]
-    origin_log = handler.buffer.read() if not detail_log else handler.get_log_by_trace_id(trace_id)
-    masked_log = handler.obd.stdio.table_log_masking(handler.obd.stdio.log_masking(origin_log))
-    log_info = CreateTenantLog(log=masked_log[offset:], offset=len(masked_log))
+    if not detail_log:
+        masked_log = handler.obd.stdio.table_log_masking(handler.obd.stdio.log_masking(handler.buffer.read()))
+        log_info = CreateTenantLog(log=masked_log[offset:], offset=len(masked_log))
+    else:
+        origin_log, next_offset = handler.get_log_by_trace_id(trace_id, offset or 0)
+        log_info = CreateTenantLog(log=handler.obd.stdio.table_log_masking(handler.obd.stdio.log_masking(origin_log)), offset=next_offset)
     return response_utils.new_ok_response(log_info)
 
 
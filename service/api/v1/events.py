@@ -0,0 +1,75 @@
+# coding: utf-8
+# Copyright (c) 2025 OceanBase.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+import time
+import asyncio
+
+from fastapi import APIRouter, Query, Header, Request
+from fastapi.responses import StreamingResponse
+
+from _plugin import PLUGIN_EVENTS
+
+router = APIRouter()
+
+# the longest wait for new events in a worker thread, a disconnected client is noticed after it
+WAIT_TIMEOUT = 1
+KEEPALIVE_INTERVAL = 15
+
+
+def format_event(event_type, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append('id: %s' % event_id)
+    lines.append('event: %s' % event_type)
+    lines.append('data: %s' % json.dumps(data))
+    return '\n'.join(lines) + '\n\n'
+
+
+@router.get("/events",
+            description='stream the plugin completion events as server-sent events',
+            operation_id='streamEvents',
+            tags=['Events'])
+async def get_events(request: Request,
+                     name: str = Query(None, description='deployment name'),
+                     cursor: int = Query(None, description='id of the last received event'),
+                     last_event_id: str = Header(None, description='id of the last received event, sent by EventSource when reconnecting')):
+    if cursor is None:
+        if last_event_id and last_event_id.isdigit():
+            cursor = int(last_event_id)
+        else:
+            cursor = PLUGIN_EVENTS.last_id
+
+    async def stream():
+        loop = asyncio.get_event_loop()
+        last_id = cursor
+        last_sent = time.time()
+        while not await request.is_disconnected():
+            # blocks on the condition of PLUGIN_EVENTS until an event is published
+            events, lost = await loop.run_in_executor(None, PLUGIN_EVENTS.read, last_id, WAIT_TIMEOUT)
+            if lost:
+                # the client has to query the whole task info again
+                last_id = events[0]['id'] - 1 if events else 0
+                yield format_event('reset', {'id': last_id}, last_id)
+            for event in events:
+                last_id = event['id']
+                if name and event['deploy_name'] != name:
+                    continue
+                last_sent = time.time()
+                yield format_event('plugin', event, event['id'])
+            if time.time() - last_sent >= KEEPALIVE_INTERVAL:
+                last_sent = time.time()
+                yield ': keepalive\n\n'
+
+    return StreamingResponse(stream(), media_type='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
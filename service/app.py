@@ -12,6 +12,7 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import os
 import asyncio
 from datetime import timedelta
 
@@ -26,6 +27,7 @@ from asgi_correlation_id import CorrelationIdMiddleware
 
 from service.common import log
 from service.common.core import CoreManager
+from service.common.task import get_task_manager
 from service.api.v1 import components, deployments, common, service_info, mirror, oms_deployments, connect
 from service.middleware.request_response_log import RequestResponseLogMiddleware
 from service.middleware.process_time import ProcessTimeMiddleware
@@ -36,9 +38,10 @@ from service.api.v1 import ocp_deployments
 from service.api.v1 import metadb
 from service.api.v1 import installer
 from service.api.v1 import component_change
+from service.api.v1 import events
 from tool import COMMAND_ENV
 from const import DISABLE_SWAGGER, IDLE_TIME_BEFORE_SHUTDOWN_MINITES
-from _environ import ENV_IDLE_TIME_BEFORE_SHUTDOWN_MINITES
+from _environ import ENV_IDLE_TIME_BEFORE_SHUTDOWN_MINITES, ENV_WEB_TASK_JOURNAL
 
 
 if DISABLE_SWAGGER == '<DISABLE_SWAGGER>':
@@ -53,6 +56,8 @@ class OBDWeb(object):
 
     def __init__(self, obd, white_ip_list=None, resource_path="./"):
         CoreManager.INSTANCE = obd
+        if COMMAND_ENV.get(ENV_WEB_TASK_JOURNAL, '1') != '0':
+            get_task_manager().enable_journal(os.path.join(obd.home_path, '.cache', 'web', 'tasks.journal'))
         self.app = app
         self.app.add_route("/metrics", metrics)
         self.app.include_router(components.router, prefix='/api/v1')
@@ -66,6 +71,7 @@ class OBDWeb(object):
         self.app.include_router(component_change.router, prefix='/api/v1')
         self.app.include_router(oms_deployments.router, prefix='/api/v1')
         self.app.include_router(connect.router, prefix='/api/v1')
+        self.app.include_router(events.router, prefix='/api/v1')
         self.app.add_middleware(IdleShutdownMiddleware, logger=log.get_logger(), idle_time_before_shutdown=IDLE_TIME_BEFORE_SHUTDOWN)
         self.app.add_middleware(CORSMiddleware, allow_origins=['*'], allow_credentials=True, allow_methods=['*'], allow_headers=['*'])
         self.app.add_middleware(IPBlockMiddleware, ips=white_ip_list)
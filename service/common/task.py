@@ -12,25 +12,48 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import os
+import json
 import time
+import heapq
+import itertools
 import functools
-from threading import Lock
+import threading
+from threading import Lock, Condition
 from collections import defaultdict
 from singleton_decorator import singleton
 
 from enum import auto
 from fastapi_utils.enums import StrEnum
 from service.common import log
-from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from concurrent.futures import Future, TimeoutError, wait
+from tool import COMMAND_ENV
+from _plugin import PLUGIN_CANCELLATION, PluginCancelled
+from _environ import ENV_WEB_TASK_WORKERS, ENV_WEB_TASK_TTL
 
 
 DEFAULT_TASK_TYPE="undefined"
 DEFAULT_TASK_TIMEOUT_SECONDS=3600
+DEFAULT_TASK_PRIORITY=0
+DEFAULT_TASK_WORKERS=8
+# no limit for a task type unless configured, the tasks of one type and one name always run one by one
+DEFAULT_TASK_TYPE_LIMIT=None
+DEFAULT_TASK_TTL_SECONDS=86400
+EVICT_INTERVAL_SECONDS=60
+CANCEL_WAIT_SECONDS=10
+
 
 def get_task_manager():
     return TaskManager()
 
 
+def _get_int_env(key, default):
+    try:
+        return int(COMMAND_ENV.get(key, default))
+    except (TypeError, ValueError):
+        return default
+
+
 class TaskStatus(StrEnum):
     PENDING = auto()
     RUNNING = auto()
@@ -44,22 +67,40 @@ class TaskResult(StrEnum):
     RUNNING = auto()
 
 
+# raised by the next plugin which the cancelled task runs
+TaskCancelled = PluginCancelled
+
+
 class TaskInfo(object):
-    def __init__(self):
+    def __init__(self, name=None, task_type=DEFAULT_TASK_TYPE, priority=DEFAULT_TASK_PRIORITY):
+        self.name = name
+        self.task_type = task_type
+        self.priority = priority
+        self.submit_time = time.time()
         self.start_time = None
         self.status = TaskStatus.PENDING
         self.end_time = None
         self.result = TaskResult.RUNNING
         self.ret = None
         self.exception = None
+        self.cancelled = False
+        self.on_change = None
+        self._started = threading.Event()
+
+    def _changed(self):
+        self.on_change and self.on_change(self)
 
     def run(self):
         self.status = TaskStatus.RUNNING
         self.start_time = time.time()
+        self._started.set()
+        self._changed()
 
     def finish(self):
         self.status = TaskStatus.FINISHED
         self.end_time = time.time()
+        self._started.set()
+        self._changed()
 
     def success(self):
         self.result = TaskResult.SUCCESSFUL
@@ -69,16 +110,273 @@ class TaskInfo(object):
         self.result = TaskResult.FAILED
         self.finish()
 
+    def wait_started(self, timeout=None):
+        return self._started.wait(timeout)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'task_type': self.task_type,
+            'priority': self.priority,
+            'submit_time': self.submit_time,
+            'start_time': self.start_time,
+            'end_time': self.end_time,
+            'status': self.status.value,
+            'result': self.result.value,
+            'exception': str(self.exception) if self.exception is not None else None,
+            'cancelled': self.cancelled
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        task_info = cls(data['name'], data['task_type'], data.get('priority', DEFAULT_TASK_PRIORITY))
+        task_info.submit_time = data.get('submit_time') or task_info.submit_time
+        task_info.start_time = data.get('start_time')
+        task_info.end_time = data.get('end_time')
+        task_info.status = TaskStatus(data['status'])
+        task_info.result = TaskResult(data['result'])
+        task_info.exception = Exception(data['exception']) if data.get('exception') is not None else None
+        task_info.cancelled = data.get('cancelled', False)
+        if task_info.status != TaskStatus.PENDING:
+            task_info._started.set()
+        return task_info
+
+
+class TaskJournal(object):
+    """
+    Task status changes appended as json lines. Loading compacts the file to the latest status of each task.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = Lock()
+
+    def load(self):
+        tasks = {}
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    data = json.loads(line)
+                    tasks[(data['task_type'], data['name'])] = data
+                except Exception:
+                    # the last line may be broken by a crash
+                    continue
+        task_infos = []
+        for data in tasks.values():
+            task_info = TaskInfo.from_dict(data)
+            if task_info.status != TaskStatus.FINISHED:
+                # the process which ran the task is gone
+                task_info.exception = Exception('task {0} interrupted by the restart of obd web'.format(task_info.name))
+                task_info.fail()
+            task_infos.append(task_info)
+        return task_infos
+
+    def dump(self, task_infos):
+        tmp_path = '%s.tmp' % self.path
+        with self.lock:
+            with open(tmp_path, 'w') as f:
+                for task_info in task_infos:
+                    f.write(json.dumps(task_info.to_dict()) + '\n')
+            os.rename(tmp_path, self.path)
+
+    def append(self, task_info):
+        line = json.dumps(task_info.to_dict()) + '\n'
+        with self.lock:
+            try:
+                with open(self.path, 'a') as f:
+                    f.write(line)
+            except Exception:
+                log.get_logger().exception('failed to write task journal %s', self.path)
+
+
+class TaskScheduler(object):
+    """
+    A shared worker pool. Pending tasks are picked by priority (lower first) then submit order,
+    skipping the task types which reach their concurrency limit and the tasks whose name is running with the same type.
+    Cancelling a running task is cooperative: it stops before its next plugin.
+    """
+
+    class Job(object):
+
+        def __init__(self, task_info, func, args, kwargs):
+            self.task_info = task_info
+            self.func = func
+            self.args = args
+            self.kwargs = kwargs
+            self.future = Future()
+            self.cancel_event = threading.Event()
+
+        @property
+        def key(self):
+            return self.task_info.task_type, self.task_info.name
+
+    def __init__(self, max_workers=DEFAULT_TASK_WORKERS, type_limits=None, default_type_limit=DEFAULT_TASK_TYPE_LIMIT):
+        self.max_workers = max_workers
+        self.type_limits = type_limits or {}
+        self.default_type_limit = default_type_limit
+        self._queue = []
+        self._running = defaultdict(int)
+        self._running_keys = set()
+        self._jobs = {}
+        self._seq = itertools.count()
+        self._condition = Condition()
+        self._workers = []
+        self._local = threading.local()
+
+    def set_type_limit(self, task_type, limit):
+        with self._condition:
+            self.type_limits[task_type] = limit
+            self._condition.notify_all()
+
+    def _type_limit(self, task_type):
+        return self.type_limits.get(task_type, self.default_type_limit)
+
+    def submit(self, task_info, func, *args, **kwargs):
+        job = self.Job(task_info, func, args, kwargs)
+        parent_job = getattr(self._local, 'job', None)
+        if parent_job:
+            # submitted by a running task, which would wait for a worker it may hold itself
+            job.cancel_event = parent_job.cancel_event
+            self._run(job)
+            return job.future
+        with self._condition:
+            self._jobs[id(task_info)] = job
+            heapq.heappush(self._queue, (task_info.priority, next(self._seq), job))
+            if len(self._workers) < self.max_workers and len(self._workers) < len(self._queue) + sum(self._running.values()):
+                worker = threading.Thread(target=self._work, name='task-worker-%s' % len(self._workers))
+                worker.daemon = True
+                self._workers.append(worker)
+                worker.start()
+            self._condition.notify_all()
+        return job.future
+
+    def _pop(self):
+        for item in sorted(self._queue):
+            job = item[2]
+            if job.key in self._running_keys:
+                continue
+            limit = self._type_limit(job.task_info.task_type)
+            if limit is None or self._running[job.task_info.task_type] < limit:
+                self._queue.remove(item)
+                heapq.heapify(self._queue)
+                return job
+        return None
+
+    def _work(self):
+        while True:
+            with self._condition:
+                job = self._pop()
+                while job is None:
+                    self._condition.wait()
+                    job = self._pop()
+                self._running[job.task_info.task_type] += 1
+                self._running_keys.add(job.key)
+            try:
+                self._run(job)
+            finally:
+                with self._condition:
+                    self._running[job.task_info.task_type] -= 1
+                    self._running_keys.discard(job.key)
+                    self._jobs.pop(id(job.task_info), None)
+                    self._condition.notify_all()
+
+    def _run(self, job):
+        task_info = job.task_info
+        if not job.future.set_running_or_notify_cancel():
+            return
+        parent_job = getattr(self._local, 'job', None)
+        self._local.job = job
+        parent_event = PLUGIN_CANCELLATION.bind(job.cancel_event)
+        try:
+            log.get_logger().info("start run task %s", task_info.name)
+            task_info.run()
+            ret = job.func(*job.args, **job.kwargs)
+            task_info.ret = ret
+            log.get_logger().info("task %s run finished", task_info.name)
+            task_info.success()
+            log.get_logger().info("task %s finished successful", task_info.name)
+            job.future.set_result(ret)
+        except BaseException as ex:
+            if isinstance(ex, TaskCancelled) and task_info.exception is None:
+                task_info.exception = Exception("task {0} cancelled".format(task_info.name))
+            elif not isinstance(ex, TaskCancelled):
+                log.get_logger().exception("task {0} got exception".format(task_info.name))
+                task_info.exception = ex
+            task_info.fail()
+            log.get_logger().info("task %s finished failed", task_info.name)
+            job.future.set_exception(ex)
+        finally:
+            PLUGIN_CANCELLATION.bind(parent_event)
+            self._local.job = parent_job
+
+    def cancel(self, task_info):
+        with self._condition:
+            job = self._jobs.get(id(task_info))
+            if job is None:
+                return False
+            task_info.cancelled = True
+            for item in self._queue:
+                if item[2] is job:
+                    self._queue.remove(item)
+                    heapq.heapify(self._queue)
+                    self._jobs.pop(id(task_info), None)
+                    if task_info.exception is None:
+                        task_info.exception = Exception("task {0} cancelled".format(task_info.name))
+                    task_info.fail()
+                    job.future.cancel()
+                    return True
+            # the running task stops before its next plugin
+            job.cancel_event.set()
+            return True
+
 
 @singleton
 class TaskManager(object):
     def __init__(self):
         self.all_tasks = defaultdict(dict)
         self.lock = Lock()
+        self.ttl = _get_int_env(ENV_WEB_TASK_TTL, DEFAULT_TASK_TTL_SECONDS)
+        self.scheduler = TaskScheduler(max_workers=_get_int_env(ENV_WEB_TASK_WORKERS, DEFAULT_TASK_WORKERS))
+        self.journal = None
+        self._last_evict_time = 0
+
+    def enable_journal(self, path):
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        journal = TaskJournal(path)
+        task_infos = journal.load()
+        self.lock.acquire()
+        try:
+            for task_info in task_infos:
+                if task_info.name not in self.all_tasks[task_info.task_type]:
+                    self.all_tasks[task_info.task_type][task_info.name] = task_info
+            self.journal = journal
+            self._evict(force=True)
+            journal.dump([task_info for tasks in self.all_tasks.values() for task_info in tasks.values()])
+            for tasks in self.all_tasks.values():
+                for task_info in tasks.values():
+                    task_info.on_change = journal.append
+        finally:
+            self.lock.release()
+        log.get_logger().info("load %d tasks from journal %s", len(task_infos), path)
+
+    def _evict(self, force=False):
+        now = time.time()
+        if not force and now - self._last_evict_time < EVICT_INTERVAL_SECONDS:
+            return
+        self._last_evict_time = now
+        for tasks in self.all_tasks.values():
+            for name in list(tasks.keys()):
+                task_info = tasks[name]
+                if task_info.status == TaskStatus.FINISHED and task_info.end_time and now - task_info.end_time > self.ttl:
+                    del tasks[name]
 
     def get_task_info(self, name, task_type=DEFAULT_TASK_TYPE):
         ret = None
         self.lock.acquire()
+        self._evict()
         if name in self.all_tasks[task_type].keys():
             ret = self.all_tasks[task_type][name]
         self.lock.release()
@@ -94,14 +392,31 @@ class TaskManager(object):
     def register_task(self, name, task_info, task_type=DEFAULT_TASK_TYPE):
         self.lock.acquire()
         log.get_logger().info("register task %s", name)
+        self._evict()
+        task_info.name = name
+        task_info.task_type = task_type
+        if self.journal:
+            task_info.on_change = self.journal.append
+            self.journal.append(task_info)
         self.all_tasks[task_type][name] = task_info
         self.lock.release()
 
+    def submit(self, task_info, func, *args, **kwargs):
+        return self.scheduler.submit(task_info, func, *args, **kwargs)
+
+    def cancel_task(self, name, task_type=DEFAULT_TASK_TYPE):
+        task_info = self.get_task_info(name, task_type=task_type)
+        if task_info is None or task_info.status == TaskStatus.FINISHED:
+            return False
+        log.get_logger().info("cancel task %s", name)
+        return self.scheduler.cancel(task_info)
+
 
 class AutoRegister(object):
-    def __init__(self, task_type=DEFAULT_TASK_TYPE, timeout=DEFAULT_TASK_TIMEOUT_SECONDS):
+    def __init__(self, task_type=DEFAULT_TASK_TYPE, timeout=DEFAULT_TASK_TIMEOUT_SECONDS, priority=DEFAULT_TASK_PRIORITY):
         self._task_type = task_type
         self._timeout = timeout
+        self._priority = priority
 
     def __call__(self, func):
         @functools.wraps(func)
@@ -110,32 +425,27 @@ class AutoRegister(object):
                 raise Exception("lack of parameter task_name")
             name = args[1]
             task_manager = get_task_manager()
-            task_info = TaskInfo()
+            task_info = TaskInfo(name, self._task_type, self._priority)
             task_manager.register_task(name, task_info, task_type=self._task_type)
+            future = task_manager.submit(task_info, func, *args, **kwargs)
             try:
-                log.get_logger().info("start run task %s", name)
-                task_info.run()
-                with ThreadPoolExecutor(max_workers=1) as executor:
-                    future = executor.submit(func, *args, **kwargs)
-                    try:
-                        future.result(timeout=self._timeout)
-                    except TimeoutError:
-                        future.cancel()
-                        msg = "task {0} execution timeout".format(name)
-                        log.get_logger().exception(msg)
-                        task_info.exception = Exception(msg)
-                        task_info.fail()
-                        log.get_logger().info("task %s finished timeout", name)
-                        return 
-                log.get_logger().info("task %s run finished", name)
-                task_info.success()
-                log.get_logger().info("task %s finished successful", name)
-            except BaseException as ex:
-                msg = "task {0} got exception".format(name)
-                log.get_logger().exception(msg)
-                task_info.exception = ex
-                task_info.fail()
-                log.get_logger().info("task %s finished failed", name)
+                # the timeout counts from the start of the task, and a task waiting for a worker as long is dropped
+                if not task_info.wait_started(self._timeout):
+                    raise TimeoutError()
+                future.result(timeout=self._timeout)
+            except TimeoutError:
+                msg = "task {0} execution timeout".format(name)
+                log.get_logger().error(msg)
+                task_info.exception = Exception(msg)
+                if task_manager.cancel_task(name, task_type=self._task_type):
+                    # give the worker a moment to stop the task and record the failure
+                    wait([future], timeout=CANCEL_WAIT_SECONDS)
+                else:
+                    task_info.fail()
+                log.get_logger().info("task %s finished timeout", name)
+            except BaseException:
+                # recorded in task info by the worker
+                pass
         return wrapper
 
 
@@ -12,6 +12,7 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+from ssh import LocalClient
 from service.common import core
 
 SPACENAME = "API"
@@ -34,3 +35,15 @@ class BaseHandler(object):
     @property
     def context(self):
         return self._context
+
+    def get_log_by_trace_id(self, trace_id, offset=0):
+        """
+        :return: (log of the trace after `offset`, offset for the next read)
+        """
+        ret = self.obd.stdio.read_trace_log(trace_id, offset)
+        if ret is not None:
+            return ret
+        # the trace is not written by this process
+        cmd = 'grep -h "\[{}\]" {}* | sed "s/\[{}\] //g" '.format(trace_id, self.obd.stdio.log_path, trace_id)
+        stdout = LocalClient.execute_command(cmd).stdout
+        return stdout[offset:], len(stdout)
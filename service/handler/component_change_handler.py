@@ -26,7 +26,6 @@ from _plugin import PluginType
 from _errno import CheckStatus, FixEval
 from collections import defaultdict
 from const import COMP_JRE, COMP_OCP_EXPRESS, COMPS_OB, COMPS_ODP, COMP_ODP_CE, COMP_OB_CONFIGSERVER, COMP_PROMETHEUS, COMP_ALERTMANAGER, COMP_OB_CONFIGSERVER
-from ssh import LocalClient
 from _mirror import MirrorRepositoryType
 from _deploy import DeployStatus, DeployConfigStatus
 from service.handler.base_handler import BaseHandler
@@ -749,20 +748,18 @@ class ComponentChangeHandler(BaseHandler):
             status = TaskResult.FAILED
         return TaskInfo(total=total_count, finished=finished_count if task_result != TaskResult.SUCCESSFUL else total_count, current=current, status=status, info=info_list, msg=msg)
 
-    def get_component_change_log_by_component(self, component_name, mode):
+    def get_component_change_log_by_component(self, component_name, mode, offset=0):
         data = []
-        stdout = ''
+        stdout, next_offset = '', offset
+        # the whole log of each component is returned for del_component
+        offset = offset if mode == 'add_component' else 0
         for component in component_name:
-            trace_id = self.context['component_trace'][component]
-            cmd = 'grep -h "\[{}\]" {}* | sed "s/\[{}\] //g" '.format(trace_id, self.obd.stdio.log_path, trace_id)
-            stdout = LocalClient.execute_command(cmd).stdout
-            if not stdout:
-                trace_id = self.context['component_trace']['deploy']
-                cmd = 'grep -h "\[{}\]" {}* | sed "s/\[{}\] //g" '.format(trace_id, self.obd.stdio.log_path, trace_id)
-                stdout = LocalClient.execute_command(cmd).stdout
+            stdout, next_offset = self.get_log_by_trace_id(self.context['component_trace'][component], offset)
+            if not next_offset:
+                stdout, next_offset = self.get_log_by_trace_id(self.context['component_trace']['deploy'], offset)
             data.append(ComponentLog(component_name=component, log=stdout))
         if mode == 'add_component':
-            return stdout
+            return stdout, next_offset
         if mode == 'del_component':
             return data
 
@@ -1103,16 +1103,11 @@ class DeploymentHandler(BaseHandler):
                 return config_dict, old_value
         return None, None
 
-    def get_install_log_by_component(self, component_name):
-        stdout = self.get_log_by_trace_id(self.context['component_trace'][component_name])
-        if not stdout:
-            stdout = self.get_log_by_trace_id(self.context['component_trace']['deploy'])
-        return stdout
-
-    def get_log_by_trace_id(self, trace_id):
-        cmd = 'grep -h "\[{}\]" {}* | sed "s/\[{}\] //g" '.format(trace_id, self.obd.stdio.log_path, trace_id)
-        stdout = LocalClient.execute_command(cmd).stdout
-        return stdout
+    def get_install_log_by_component(self, component_name, offset=0):
+        log, next_offset = self.get_log_by_trace_id(self.context['component_trace'][component_name], offset)
+        if not next_offset:
+            return self.get_log_by_trace_id(self.context['component_trace']['deploy'], offset)
+        return log, next_offset
 
     def get_scenario_by_version(self, version, language='zh-CN'):
         version = version.split('-')[0]
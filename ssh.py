@@ -18,12 +18,17 @@ from __future__ import absolute_import, division, print_function
 import enum
 import getpass
 import os
+import re
+import uuid
+import tarfile
 import tempfile
+import time
 import warnings
 from glob import glob
 from pathlib import Path
 from copy import copy
 
+import zstandard
 from subprocess32 import Popen, PIPE
 
 # paramiko import cryptography 模块在python2下会报不支持警报
@@ -36,14 +41,18 @@ from paramiko.ssh_exception import NoValidConnectionsError, SSHException
 from multiprocessing.queues import Empty
 from multiprocessing import Queue, Process
 from multiprocessing.pool import ThreadPool
+from threading import Lock, RLock, BoundedSemaphore
 
 from tool import COMMAND_ENV, DirectoryUtil, FileUtil, NetUtil, Timeout, is_root_user
 from _stdio import SafeStdio
 from _errno import EC_SSH_CONNECT
-from _environ import ENV_DISABLE_RSYNC, ENV_DISABLE_RSA_ALGORITHMS, ENV_HOST_IP_MODE
+from _environ import ENV_DISABLE_RSYNC, ENV_DISABLE_RSA_ALGORITHMS, ENV_HOST_IP_MODE, ENV_SSH_CONNECT_WORKERS, ENV_DISABLE_TAR_TRANSFER, ENV_TAR_TRANSFER_COMPRESS
 
 
-__all__ = ("SshClient", "SshConfig", "LocalClient", "ConcurrentExecutor")
+__all__ = ("SshClient", "SshConfig", "LocalClient", "ConcurrentExecutor", "concurrent_connect", "HostFacts", "gather_host_facts")
+
+
+SSH_CONNECT_WORKERS = 32
 
 
 class SshConfig(object):
@@ -72,7 +81,134 @@ class SshReturn(object):
     
     def __nonzero__(self):
         return self.__bool__()
-    
+
+
+class CommandBatch(object):
+
+    """
+    Several commands run as one shell script, each one in a subshell.
+    A marker line follows the output of each command on stdout, with its exit code, and on stderr,
+    so that one execution gives back one SshReturn per command.
+    """
+
+    def __init__(self, commands):
+        self.commands = list(commands)
+        self.token = '__OBD_BATCH_%s__' % uuid.uuid4().hex
+
+    @property
+    def script(self):
+        lines = []
+        for idx, command in enumerate(self.commands):
+            lines.append('(%s\n)' % command.strip(';').strip('\n'))
+            lines.append('printf "\\n%s %d %%d\\n" $?' % (self.token, idx))
+            lines.append('printf "\\n%s %d\\n" >&2' % (self.token, idx))
+        return '\n'.join(lines)
+
+    def parse(self, ret, stdio=None):
+        # with a tty stderr comes in stdout, and lines end with \r\n
+        stdout = re.sub(r'\r?\n%s \d+\r?\n' % self.token, '', ret.stdout)
+        outputs = re.split(r'\r?\n%s (\d+) (\d+)\r?\n' % self.token, stdout)
+        errors = re.split(r'\r?\n%s \d+\r?\n' % self.token, ret.stderr)
+        rets = []
+        for idx, command in enumerate(self.commands):
+            if idx * 3 + 2 < len(outputs):
+                code = int(outputs[idx * 3 + 2])
+                error = errors[idx] if idx < len(errors) else ''
+                rets.append(SshReturn(code, outputs[idx * 3], error))
+            else:
+                # the script stopped before this command
+                rets.append(SshReturn(ret.code or 255, '', ret.stderr))
+            if stdio:
+                verbose_msg = '%s: exited code %s' % (command, rets[-1].code)
+                if rets[-1].code:
+                    verbose_msg += ', error output:\n%s' % rets[-1].stderr
+                stdio.verbose(verbose_msg)
+        return rets
+
+
+class HostFacts(object):
+
+    """
+    Facts of a host collected in one batch: cpu, memory, mounts, ulimits, kernel params and os.
+    The clock is not a fact, its offset must be measured fresh by the checks.
+    The command returns are kept in `raw`, to tell a failed command from an output that could not be parsed.
+    """
+
+    COMMANDS = (
+        ('cpu_count', "grep -e 'processor\\s*:' /proc/cpuinfo | wc -l"),
+        ('meminfo', 'cat /proc/meminfo'),
+        ('df', 'df --block-size=1024'),
+        ('ulimit', 'bash -c "ulimit -a"'),
+        ('aio', 'cat /proc/sys/fs/aio-max-nr /proc/sys/fs/aio-nr'),
+        ('sysctl', 'sysctl -a'),
+        ('os_release', 'cat /etc/os-release'),
+        ('kernel', 'uname -r'),
+    )
+
+    def __init__(self, raw, collect_time):
+        self.raw = raw
+        self.collect_time = collect_time
+        self.cpu_count = None
+        self.memory = {}
+        self.mounts = {}
+        self.ulimits = {}
+        self.aio = {}
+        self.kernel_params = {}
+        self.os_release = {}
+        self.kernel = raw['kernel'].stdout.strip() if raw['kernel'] else None
+        self._parse()
+
+    def _parse(self):
+        raw = self.raw
+        if raw['cpu_count'] and raw['cpu_count'].stdout.strip().isdigit():
+            self.cpu_count = int(raw['cpu_count'].stdout.strip())
+        if raw['meminfo']:
+            for key, value, unit in re.findall(r'(\w+)\s*:\s*(\d+)\s*(\w*)', raw['meminfo'].stdout):
+                self.memory[key] = int(value) << 10 if unit.lower() == 'kb' else int(value)
+        if raw['df']:
+            for total, used, avail, puse, path in re.findall(r'(\d+)\s+(\d+)\s+(\d+)\s+(\d+%)\s+(.+)', raw['df'].stdout):
+                self.mounts[path] = {'total': int(total) << 10, 'used': int(used) << 10, 'avail': int(avail) << 10}
+        if raw['ulimit']:
+            for key, value in re.findall(r'\s?([a-zA-Z\s]+[a-zA-Z])\s+\([a-zA-Z\-,\s]+\)\s+([\d[a-zA-Z]+)', raw['ulimit'].stdout):
+                self.ulimits[key] = value
+        if raw['aio']:
+            values = raw['aio'].stdout.split()
+            if len(values) == 2 and all(value.isdigit() for value in values):
+                self.aio = {'max_nr': int(values[0]), 'nr': int(values[1])}
+        if raw['sysctl']:
+            for line in raw['sysctl'].stdout.split('\n'):
+                if '=' in line:
+                    key, value = line.split('=', 1)
+                    self.kernel_params[key.strip()] = value.strip()
+        if raw['os_release']:
+            for key, value in re.findall(r'^(\w+)=(.*)$', raw['os_release'].stdout, re.M):
+                self.os_release[key] = value.strip('"')
+
+    @classmethod
+    def collect(cls, client, stdio=None):
+        names = [item[0] for item in cls.COMMANDS]
+        rets = client.execute_commands([item[1] for item in cls.COMMANDS], stdio=stdio)
+        return cls(dict(zip(names, rets)), time.time())
+
+
+def gather_host_facts(clients, refresh=False, workers=None, stdio=None):
+    """
+    Get the facts of clients in parallel, return them in the same order.
+    """
+    clients = list(clients)
+    if not clients:
+        return []
+    if workers is None:
+        try:
+            workers = int(COMMAND_ENV.get(ENV_SSH_CONNECT_WORKERS, SSH_CONNECT_WORKERS))
+        except ValueError:
+            workers = SSH_CONNECT_WORKERS
+    pool = ThreadPool(processes=max(1, min(workers, len(clients))))
+    try:
+        return pool.map(lambda client: client.host_facts(refresh=refresh, stdio=stdio), clients)
+    finally:
+        pool.close()
+
 
 class FeatureSshReturn(SshReturn, SafeStdio):
 
@@ -139,11 +275,59 @@ class FutureSshReturn(SshReturn):
         self.finsh = True
 
 
+class SshSessionPool(object):
+    """
+    Authenticated ssh sessions kept per host. Commands on the same host are multiplexed as channels
+    over one paramiko Transport, with at most `max_channels` channels opened at the same time.
+    """
+
+    def __init__(self, max_channels=8):
+        self.max_channels = max_channels
+        self._lock = Lock()
+        self._sessions = {}
+
+    @staticmethod
+    def _key(config):
+        return (config.host, config.port, config.username, config.password, config.key_filename)
+
+    def _get_session(self, config):
+        key = self._key(config)
+        with self._lock:
+            if key not in self._sessions:
+                self._sessions[key] = {
+                    'client': SshClient(config),
+                    'semaphore': BoundedSemaphore(self.max_channels)
+                }
+            return self._sessions[key]
+
+    def _get_client(self, session, stdio=None):
+        # the client logs in again by itself when its transport is broken, so every channel keeps the same client
+        client = session['client']
+        if client.connect(stdio=stdio, exit=False) is True:
+            return client
+        return None
+
+    def execute_command(self, config, command, timeout=None, stdio=None):
+        session = self._get_session(config)
+        with session['semaphore']:
+            client = self._get_client(session, stdio=stdio)
+            if client is None:
+                return SshReturn(255, '', 'connect failed')
+            return client.execute_command(command, timeout=timeout, stdio=stdio)
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session['client'].close()
+            self._sessions = {}
+
+
 class ConcurrentExecutor(object):
 
-    def __init__(self, workers=None):
+    def __init__(self, workers=None, max_channels=8):
         self.workers = workers
         self.futures = []
+        self.session_pool = SshSessionPool(max_channels)
 
     def add_task(self, client, command, timeout=None, stdio=None):
         ret = FutureSshReturn(client, command, timeout, stdio=stdio)
@@ -153,17 +337,15 @@ class ConcurrentExecutor(object):
     def size(self):
         return len(self.futures)
 
-    @staticmethod
-    def execute(future):
-        client = SshClient(future.client.config, future.stdio)
-        future.set_return(client.execute_command(future.command, timeout=future.timeout))
+    def execute(self, future):
+        future.set_return(self.session_pool.execute_command(future.client.config, future.command, timeout=future.timeout, stdio=future.stdio))
         return future
 
     def submit(self):
         rets = []
         pool = ThreadPool(processes=self.workers)
         try:
-            results = pool.map(ConcurrentExecutor.execute, tuple(self.futures))
+            results = pool.map(self.execute, tuple(self.futures))
             for r in results:
                 rets.append(r)
         finally:
@@ -171,6 +353,62 @@ class ConcurrentExecutor(object):
         self.futures = []
         return rets
 
+    def close(self):
+        self.session_pool.close()
+
+    def __del__(self):
+        self.close()
+
+
+def concurrent_connect(clients, workers=None, stdio=None):
+    """
+    Connect clients with a bounded thread pool. Each client is given `config.timeout` seconds
+    from the moment its worker picks it up, the whole handshake included.
+    Return the connect results in the same order of clients: True or the connect error.
+    """
+    if not clients:
+        return []
+    if workers is None:
+        try:
+            workers = int(COMMAND_ENV.get(ENV_SSH_CONNECT_WORKERS, SSH_CONNECT_WORKERS))
+        except ValueError:
+            workers = SSH_CONNECT_WORKERS
+    workers = max(1, min(workers, len(clients)))
+    started = {}
+
+    def _connect(index):
+        started[index] = time.time()
+        client = clients[index]
+        try:
+            return client.connect(stdio=stdio, exit=False)
+        except BaseException as e:
+            stdio and stdio.exception('')
+            return EC_SSH_CONNECT.format(user=client.config.username, ip=client.config.host, message=e)
+
+    pool = ThreadPool(processes=workers)
+    try:
+        results = [pool.apply_async(_connect, (index, )) for index in range(len(clients))]
+        rets = []
+        for index, result in enumerate(results):
+            client = clients[index]
+            while not result.ready():
+                if index in started and time.time() - started[index] > client.config.timeout:
+                    break
+                result.wait(0.1)
+            if result.ready():
+                rets.append(result.get())
+            else:
+                stdio and stdio.verbose('%s connect exceeded the deadline of %ss' % (client, client.config.timeout))
+                try:
+                    client.ssh_client.close()
+                except:
+                    pass
+                rets.append(EC_SSH_CONNECT.format(user=client.config.username, ip=client.config.host, message='time out'))
+        return rets
+    finally:
+        # workers which exceeded the deadline are left behind as daemon threads
+        pool.close()
+
 
 class LocalClient(SafeStdio):
     
@@ -223,12 +461,37 @@ class LocalClient(SafeStdio):
             stdio.exception('')
         return SshReturn(code, output, error)
 
+    @staticmethod
+    def execute_commands(commands, env=None, timeout=None, stdio=None):
+        """
+        Run `commands` in one shell, return a SshReturn for each command
+        """
+        if not commands:
+            return []
+        batch = CommandBatch(commands)
+        return batch.parse(LocalClient.execute_command(batch.script, env, timeout, stdio=stdio), stdio)
+
     @staticmethod
     def put_file(local_path, remote_path, stdio=None):
         if LocalClient.execute_command('mkdir -p %s && cp -f %s %s' % (os.path.dirname(remote_path), local_path, remote_path), stdio=stdio):
             return True
         return False
 
+    @staticmethod
+    def resume_put_file(local_path, remote_path, offset, stdio=None):
+        stdio.verbose('append %s to %s from %s' % (local_path, remote_path, offset))
+        try:
+            with open(local_path, 'rb') as fsrc, open(remote_path, 'r+b') as fdst:
+                fsrc.seek(offset)
+                fdst.seek(offset)
+                fdst.truncate()
+                FileUtil.copy_fileobj(fsrc, fdst)
+            os.chmod(remote_path, os.stat(local_path).st_mode)
+            return True
+        except:
+            stdio.exception('')
+            return False
+
     @staticmethod
     def put_dir(local_dir, remote_dir, stdio=None):
         if os.path.isdir(local_dir):
@@ -310,6 +573,84 @@ class RemoteTransporter(enum.Enum):
         return self.value > other.value
 
 
+class ChannelWriter(object):
+
+    """
+    A write-only file over the stdin of an exec channel, used as the fileobj of a tar stream.
+    """
+
+    def __init__(self, channel):
+        self.channel = channel
+
+    def write(self, data):
+        self.channel.sendall(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+class TarStream(object):
+
+    """
+    Transfer a directory as one tar stream over an exec channel, optionally compressed by zstd.
+    Modes and symlinks are kept, the owner is always the user who extracts the stream.
+    """
+
+    COMPRESS_NONE = 'none'
+    COMPRESS_ZSTD = 'zstd'
+    BUFFER_SIZE = 1 << 20
+
+    def __init__(self, compress=COMPRESS_NONE):
+        self.compress = compress
+
+    def remote_extract_command(self, remote_dir):
+        command = 'mkdir -p {dir} && tar -x -p --no-same-owner -C {dir} -f -'.format(dir=remote_dir)
+        if self.compress == self.COMPRESS_ZSTD:
+            command = 'mkdir -p {dir} && zstd -d -q -c | tar -x -p --no-same-owner -C {dir} -f -'.format(dir=remote_dir)
+        return command
+
+    def remote_create_command(self, remote_dir):
+        command = 'cd {dir} && tar -c -f - .'.format(dir=remote_dir)
+        if self.compress == self.COMPRESS_ZSTD:
+            command += ' | zstd -q -c'
+        return command
+
+    def write(self, local_dir, fileobj):
+        if self.compress == self.COMPRESS_ZSTD:
+            writer = zstandard.ZstdCompressor(level=3).stream_writer(fileobj)
+        else:
+            writer = fileobj
+        with tarfile.open(fileobj=writer, mode='w|', bufsize=self.BUFFER_SIZE, format=tarfile.GNU_FORMAT) as tar:
+            for root, dirs, files in os.walk(local_dir):
+                for name in sorted(dirs) + sorted(files):
+                    path = os.path.join(root, name)
+                    tar.add(path, arcname=os.path.relpath(path, local_dir), recursive=False)
+        if writer is not fileobj:
+            writer.flush(zstandard.FLUSH_FRAME)
+
+    def read(self, fileobj, local_dir):
+        if self.compress == self.COMPRESS_ZSTD:
+            fileobj = zstandard.ZstdDecompressor().stream_reader(fileobj)
+        kwargs = {'filter': 'fully_trusted'} if hasattr(tarfile, 'fully_trusted_filter') else {}
+        with tarfile.open(fileobj=fileobj, mode='r|', bufsize=self.BUFFER_SIZE) as tar:
+            tar.extractall(local_dir, members=self._members(tar, local_dir), **kwargs)
+
+    @staticmethod
+    def _members(tar, local_dir):
+        local_dir = os.path.realpath(local_dir)
+        for member in tar:
+            path = os.path.realpath(os.path.join(local_dir, member.name))
+            if os.path.isabs(member.name) or not (path + os.sep).startswith(local_dir + os.sep):
+                raise tarfile.TarError('%s is outside of %s' % (member.name, local_dir))
+            if member.islnk() and os.path.isabs(member.linkname):
+                raise tarfile.TarError('hard link %s is outside of %s' % (member.name, local_dir))
+            # the files are owned by the current user, as the files got by sftp
+            member.uid, member.gid = os.getuid(), os.getgid()
+            member.uname = member.gname = ''
+            yield member
+
+
 class SshClient(SafeStdio):
 
     DEFAULT_PATH = '/sbin:/usr/local/bin:/usr/bin:/usr/local/sbin:/usr/sbin:'
@@ -321,14 +662,19 @@ class SshClient(SafeStdio):
         self.stdio = stdio
         self.sftp = None
         self.is_connected = False
+        # the client may be shared by the channels of many threads, which log in and close under this lock
+        self._connect_lock = RLock()
         self.ssh_client = SSHClient()
         self.env_str = ''
         self._remote_transporter = None
+        self._tar_transfer = None
         self.task_queue = None
         self.result_queue = None
         self._is_local = self.is_local()
         self._disable_local = False
         self.get_pty = False
+        self._host_facts = None
+        self._host_facts_lock = Lock()
         if self._is_local:
             self.env = {}
         else:
@@ -410,8 +756,15 @@ class SshClient(SafeStdio):
         return self.config.host in self.LOCAL_HOST
 
     def _login(self, stdio=None, exit=True, stdio_func=None):
-        if self.is_connected:
-            return True
+        with self._connect_lock:
+            if self.is_connected:
+                if self.is_active():
+                    return True
+                # the transport is broken, and so are all the channels over it
+                self.close()
+            return self._connect_transport(stdio=stdio, exit=exit, stdio_func=stdio_func)
+
+    def _connect_transport(self, stdio=None, exit=True, stdio_func=None):
         err = None
         try:
             self.ssh_client.set_missing_host_key_policy(AutoAddPolicy())
@@ -463,6 +816,12 @@ class SshClient(SafeStdio):
         return self.is_localhost() and self.config.username == getpass.getuser() or \
             (COMMAND_ENV.get(ENV_HOST_IP_MODE, '0') == '1' and self.config.host in NetUtil.get_all_ips())
 
+    def is_active(self):
+        if self._is_local:
+            return True
+        transport = self.ssh_client.get_transport()
+        return bool(transport and transport.is_active())
+
     def connect(self, stdio=None, exit=True, stdio_func=None):
         if self._is_local:
             return True
@@ -475,10 +834,12 @@ class SshClient(SafeStdio):
     def close(self, stdio=None):
         if self._is_local:
             return True
-        if self.is_connected:
-            self.ssh_client.close()
-        if self.sftp:
-            self.sftp = None
+        with self._connect_lock:
+            if self.is_connected:
+                self.ssh_client.close()
+                self.is_connected = False
+            if self.sftp:
+                self.sftp = None
 
     def __del__(self):
         self.close()
@@ -502,8 +863,8 @@ class SshClient(SafeStdio):
             stdio.verbose(verbose_msg)
         except SSHException as e:
             if retry:
-                self.close()
-                return self._execute_command(command, retry=retry - 1, stdio=stdio)
+                # other channels may share the transport, so it is not closed here. The login of the retry reconnects it when broken.
+                return self._execute_command(command, timeout=timeout, retry=retry - 1, stdio=stdio)
             else:
                 stdio.exception('')
                 stdio.critical('%s@%s connect failed: %s' % (self.config.username, self.config.host, e))
@@ -529,6 +890,29 @@ class SshClient(SafeStdio):
         command = '(%s %s);echo -e "\n$?\c"' % (self.env_str, command.strip(';').lstrip('\n'))
         return self._execute_command(command, retry=3, timeout=timeout, stdio=stdio)
 
+    def host_facts(self, refresh=False, stdio=None):
+        """
+        The HostFacts of this host, collected on the first call and kept until `invalidate_host_facts`.
+        """
+        with self._host_facts_lock:
+            if self._host_facts is None or refresh:
+                self._host_facts = HostFacts.collect(self, stdio=stdio)
+            return self._host_facts
+
+    def invalidate_host_facts(self, stdio=None):
+        self._host_facts = None
+
+    def execute_commands(self, commands, timeout=None, stdio=None):
+        """
+        Run `commands` in one remote shell, which saves a channel for each command.
+
+        :return: a SshReturn for each command
+        """
+        if not commands:
+            return []
+        batch = CommandBatch(commands)
+        return batch.parse(self.execute_command(batch.script, timeout=timeout, stdio=stdio), stdio)
+
     @property
     def disable_rsync(self):
         return COMMAND_ENV.get(ENV_DISABLE_RSYNC) == "1"
@@ -547,6 +931,32 @@ class SshClient(SafeStdio):
         self.stdio.verbose("current remote_transporter {}".format(self._remote_transporter))
         return self._remote_transporter
 
+    @property
+    def disable_tar_transfer(self):
+        return COMMAND_ENV.get(ENV_DISABLE_TAR_TRANSFER) == "1"
+
+    @property
+    def tar_transfer(self):
+        """
+        The TarStream used to transfer directories when rsync is not used, None if the remote host can not extract a tar stream.
+        """
+        if self._tar_transfer is not None:
+            return self._tar_transfer or None
+        self._tar_transfer = False
+        if not self._is_local and not self.disable_tar_transfer and self.execute_command('tar --version', stdio=self.stdio):
+            compress = COMMAND_ENV.get(ENV_TAR_TRANSFER_COMPRESS, TarStream.COMPRESS_NONE)
+            if compress == TarStream.COMPRESS_ZSTD and not self.execute_command('zstd --version', stdio=self.stdio):
+                self.stdio.verbose('zstd is not found in %s, send the tar stream without compression' % self.config.host)
+                compress = TarStream.COMPRESS_NONE
+            self._tar_transfer = TarStream(compress)
+        self.stdio.verbose("current tar transfer {}".format(self._tar_transfer.compress if self._tar_transfer else None))
+        return self._tar_transfer or None
+
+    def _open_exec_channel(self, command):
+        channel = self.ssh_client.get_transport().open_session()
+        channel.exec_command('%s %s' % (self.env_str, command))
+        return channel
+
     def put_file(self, local_path, remote_path, stdio=None):
         if not os.path.isfile(local_path):
             stdio.error('path: %s is not file' % local_path)
@@ -557,6 +967,28 @@ class SshClient(SafeStdio):
             return False
         return self._put_file(local_path, remote_path, stdio=stdio)
 
+    def resume_put_file(self, local_path, remote_path, offset, stdio=None):
+        """
+        Send the rest of `local_path` from `offset` to a remote file whose first `offset` bytes are already the same.
+        """
+        if self._is_local:
+            return LocalClient.resume_put_file(local_path, remote_path, offset, stdio=stdio)
+        if not self._open_sftp(stdio=stdio):
+            return False
+        stdio.verbose('append %s to %s from %s' % (local_path, remote_path, offset))
+        try:
+            with open(local_path, 'rb') as fsrc, self.sftp.open(remote_path, 'r+b') as fdst:
+                fsrc.seek(offset)
+                fdst.seek(offset)
+                fdst.truncate(offset)
+                fdst.set_pipelined(True)
+                FileUtil.copy_fileobj(fsrc, fdst)
+            self.sftp.chmod(remote_path, os.stat(local_path).st_mode & 0o7777)
+            return True
+        except Exception as e:
+            stdio.exception('append %s to %s@%s:%s failed: %s' % (local_path, self.config.username, self.config.host, remote_path, e))
+        return False
+
     def write_file(self, content, file_path, mode='w', stdio=None):
         if self._is_local:
             return LocalClient.write_file(content, file_path, mode, stdio)
@@ -639,9 +1071,34 @@ class SshClient(SafeStdio):
     def _put_dir(self):
         if self.remote_transporter == RemoteTransporter.RSYNC:
             return self._rsync_put_dir
+        elif self.tar_transfer:
+            return self._tar_put_dir
         else:
             return self._client_put_dir
 
+    def _tar_put_dir(self, local_dir, remote_dir, stdio=None):
+        tar_stream = self.tar_transfer
+        command = tar_stream.remote_extract_command(remote_dir)
+        stdio.verbose('send %s to %s by tar stream: %s' % (local_dir, remote_dir, command))
+        try:
+            channel = self._open_exec_channel(command)
+            try:
+                tar_stream.write(local_dir, ChannelWriter(channel))
+                channel.shutdown_write()
+                code = channel.recv_exit_status()
+                stderr = channel.makefile_stderr('rb').read().decode(errors='replace')
+            finally:
+                channel.close()
+            if code == 0:
+                return True
+            stdio.verbose('tar stream exited code %s, error output:\n%s' % (code, stderr))
+        except Exception as e:
+            stdio.exception('send %s to %s by tar stream failed: %s' % (local_dir, remote_dir, e))
+        # a partial extraction is overwritten by the transfer file by file
+        stdio.verbose('fall back to send %s file by file' % local_dir)
+        self._tar_transfer = False
+        return self._client_put_dir(local_dir, remote_dir, stdio=stdio)
+
     def _client_put_dir(self, local_dir, remote_dir, stdio=None):
         has_failed = False
         ret = LocalClient.execute_command('find -L %s -type f' % local_dir)
@@ -755,9 +1212,36 @@ class SshClient(SafeStdio):
     def _get_dir(self):
         if self.remote_transporter == RemoteTransporter.RSYNC:
             return self._rsync_get_dir
+        elif self.tar_transfer:
+            return self._tar_get_dir
         else:
             return self._client_get_dir
 
+    def _tar_get_dir(self, local_dir, remote_dir, stdio=None):
+        if "*" in remote_dir:
+            return self._client_get_dir(local_dir, remote_dir, stdio=stdio)
+        tar_stream = self.tar_transfer
+        command = tar_stream.remote_create_command(remote_dir)
+        stdio.verbose('get %s from %s by tar stream: %s' % (local_dir, remote_dir, command))
+        try:
+            if DirectoryUtil.mkdir(local_dir, stdio=stdio):
+                channel = self._open_exec_channel(command)
+                try:
+                    channel.shutdown_write()
+                    tar_stream.read(channel.makefile('rb', TarStream.BUFFER_SIZE), local_dir)
+                    code = channel.recv_exit_status()
+                    stderr = channel.makefile_stderr('rb').read().decode(errors='replace')
+                finally:
+                    channel.close()
+                if code == 0:
+                    return True
+                stdio.verbose('tar stream exited code %s, error output:\n%s' % (code, stderr))
+        except Exception as e:
+            stdio.exception('get %s from %s by tar stream failed: %s' % (local_dir, remote_dir, e))
+        stdio.verbose('fall back to get %s file by file' % remote_dir)
+        self._tar_transfer = False
+        return self._client_get_dir(local_dir, remote_dir, stdio=stdio)
+
     def _client_get_dir(self, local_dir, remote_dir, stdio=None):
         task_queue = []
         has_failed = False
@@ -815,6 +1299,7 @@ class SshClient(SafeStdio):
             client = SshClient(config=self.config, stdio=None)
             client._open_sftp(stdio=stdio)
             client._remote_transporter = self.remote_transporter
+            client._tar_transfer = self._tar_transfer
             while True:
                 remote_path = self.task_queue.get(block=False)
                 local_path = os.path.join(local_dir, os.path.relpath(remote_path, remote_dir))
@@ -832,6 +1317,7 @@ class SshClient(SafeStdio):
         try:
             client = SshClient(config=self.config, stdio=None)
             client._remote_transporter = self.remote_transporter
+            client._tar_transfer = self._tar_transfer
             while True:
                 local_path, is_dir = self.task_queue.get(block=False)
                 remote_path = os.path.join(remote_dir, os.path.relpath(local_path, local_dir))
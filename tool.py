@@ -32,14 +32,13 @@ import time
 import hashlib
 import socket
 import datetime
+import threading
+import types
 from io import BytesIO
 from copy import copy, deepcopy
 
 import string
 
-from Crypto.Cipher import AES
-from Crypto.Random import get_random_bytes
-from Crypto.Util.Padding import pad, unpad
 from ruamel.yaml import YAML, YAMLContextManager, representer
 import _environ as ENV
 import _errno
@@ -69,14 +68,15 @@ if sys.version_info.major == 2:
 
 else:
     import lzma
-    import pymysql as mysql
+    # pymysql is imported on first connect, see Cursor._connect
+    mysql = None
     encoding_open = open
 
     class OrderedDict(dict):
         pass
 
 
-__all__ = ("timeout", "DynamicLoading", "ConfigUtil", "DirectoryUtil", "FileUtil", "YamlLoader", "OrderedDict", "COMMAND_ENV", "TimeUtils", "Cursor")
+__all__ = ("timeout", "wait_until", "Waiter", "WaitResult", "DynamicLoading", "ConfigUtil", "DirectoryUtil", "FileUtil", "YamlLoader", "OrderedDict", "COMMAND_ENV", "TimeUtils", "Cursor")
 
 _WINDOWS = os.name == 'nt'
 
@@ -131,24 +131,139 @@ class Timeout:
 timeout = Timeout
 
 
+class WaitResult(object):
+
+    def __init__(self, name=None):
+        self.name = name
+        self.ok = False
+        # the wait is stopped by `fail_on`
+        self.failed = False
+        # the return of the condition. For several conditions, a dict of name => return
+        self.value = None
+        self.pending = []
+        self.elapsed = 0
+        self.rounds = 0
+
+    def __bool__(self):
+        return self.ok
+
+    __nonzero__ = __bool__
+
+    def __str__(self):
+        state = 'done' if self.ok else ('failed' if self.failed else 'timeout')
+        return '%s %s after %.3fs in %s rounds' % (self.name or 'wait', state, self.elapsed, self.rounds)
+
+
+class Waiter(object):
+
+    """
+    Poll conditions until they hold.
+    The interval starts small and grows by `backoff` up to `max_interval`, with some jitter,
+    so that short waits end quickly and long waits do not hammer the target.
+    A condition is a callable, the wait ends when it returns a true value. With a dict of
+    name => callable every pending condition is polled in each round, and the wait ends when all of them hold.
+    `progress` is called with the WaitResult after each failed round, a text it returns is shown in the loading.
+    `fail_on` is called with each return of a condition, the wait stops and fails when it returns true,
+    e.g. `lambda ret: ret is False` for a condition returning the row of a query which may fail.
+    """
+
+    def __init__(self, timeout=None, interval=0.5, max_interval=3, backoff=1.5, jitter=0.1, name=None, progress=None, fail_on=None, stdio=None):
+        self.timeout = timeout
+        self.interval = interval
+        self.max_interval = max(max_interval, interval)
+        self.backoff = backoff
+        self.jitter = jitter
+        self.name = name
+        self.progress = progress
+        self.fail_on = fail_on
+        self.stdio = stdio
+
+    def _check(self, value, result):
+        if self.fail_on and self.fail_on(value):
+            result.failed = True
+        return value
+
+    def _poll(self, condition, result):
+        if not isinstance(condition, dict):
+            result.value = self._check(condition(), result)
+            return bool(result.value) and not result.failed
+        if result.value is None:
+            result.value = {}
+            result.pending = list(condition.keys())
+        pending = []
+        for key in result.pending:
+            value = self._check(condition[key](), result)
+            if result.failed:
+                result.value[key] = value
+                return False
+            if value:
+                result.value[key] = value
+            else:
+                pending.append(key)
+        result.pending = pending
+        return not pending
+
+    def wait(self, condition):
+        result = WaitResult(self.name)
+        start_time = time.time()
+        deadline = start_time + self.timeout if self.timeout else None
+        interval = self.interval
+        text = None
+        while True:
+            result.rounds += 1
+            result.ok = self._poll(condition, result)
+            now = time.time()
+            result.elapsed = now - start_time
+            if result.ok or result.failed or (deadline and now >= deadline):
+                break
+            if self.progress and self.stdio:
+                new_text = self.progress(result)
+                if new_text and new_text != text:
+                    text = new_text
+                    self.stdio.update_loading_text(text)
+            sleep_time = interval * (1 + random.uniform(-self.jitter, self.jitter))
+            if deadline:
+                sleep_time = min(sleep_time, deadline - now)
+            time.sleep(max(sleep_time, 0))
+            interval = min(interval * self.backoff, self.max_interval)
+        self.stdio and getattr(self.stdio, 'verbose', print)(str(result))
+        return result
+
+
+def wait_until(condition, timeout=None, interval=0.5, max_interval=3, backoff=1.5, jitter=0.1, name=None, progress=None, fail_on=None, stdio=None):
+    return Waiter(timeout=timeout, interval=interval, max_interval=max_interval, backoff=backoff, jitter=jitter, name=name, progress=progress, fail_on=fail_on, stdio=stdio).wait(condition)
+
+
 class DynamicLoading(object):
 
     class Module(object):
 
-        def __init__(self, module):
+        def __init__(self, module, mtime=None):
             self.module = module
+            self.mtime = mtime
             self.count = 0
 
+    class Source(object):
+
+        def __init__(self, code, mtime):
+            self.code = code
+            self.mtime = mtime
+            self.executed = False
+
     LIBS_PATH = {}
     MODULES = {}
+    # the compiled sources of the modules loaded from a path stay for the life of the process: {path/name: Source}
+    RESIDENT_SOURCES = {}
+    LOCK = threading.RLock()
 
     @staticmethod
     def add_lib_path(lib):
-        if lib not in DynamicLoading.LIBS_PATH:
-            DynamicLoading.LIBS_PATH[lib] = 0
-        if DynamicLoading.LIBS_PATH[lib] == 0:
-            sys.path.insert(0, lib)
-        DynamicLoading.LIBS_PATH[lib] += 1
+        with DynamicLoading.LOCK:
+            if lib not in DynamicLoading.LIBS_PATH:
+                DynamicLoading.LIBS_PATH[lib] = 0
+            if DynamicLoading.LIBS_PATH[lib] == 0:
+                sys.path.insert(0, lib)
+            DynamicLoading.LIBS_PATH[lib] += 1
 
     @staticmethod
     def add_libs_path(libs):
@@ -157,17 +272,18 @@ class DynamicLoading(object):
 
     @staticmethod
     def remove_lib_path(lib):
-        if lib not in DynamicLoading.LIBS_PATH:
-            return
-        if DynamicLoading.LIBS_PATH[lib] < 1:
-            return
-        try:
-            DynamicLoading.LIBS_PATH[lib] -= 1
-            if DynamicLoading.LIBS_PATH[lib] == 0:
-                idx = sys.path.index(lib)
-                del sys.path[idx]
-        except:
-            pass
+        with DynamicLoading.LOCK:
+            if lib not in DynamicLoading.LIBS_PATH:
+                return
+            if DynamicLoading.LIBS_PATH[lib] < 1:
+                return
+            try:
+                DynamicLoading.LIBS_PATH[lib] -= 1
+                if DynamicLoading.LIBS_PATH[lib] == 0:
+                    idx = sys.path.index(lib)
+                    del sys.path[idx]
+            except:
+                pass
 
     @staticmethod
     def remove_libs_path(libs):
@@ -175,35 +291,100 @@ class DynamicLoading(object):
             DynamicLoading.remove_lib_path(lib)
 
     @staticmethod
-    def import_module(name, stdio=None):
-        if name not in DynamicLoading.MODULES:
+    def _module_key(name, path=None):
+        return name if path is None else os.path.join(path, name)
+
+    @staticmethod
+    def _get_resident_source(key, file_path, stdio=None):
+        try:
+            mtime = os.stat(file_path).st_mtime
+        except OSError:
+            stdio and getattr(stdio, 'exception', print)('import %s failed' % key)
+            return None
+        with DynamicLoading.LOCK:
+            source = DynamicLoading.RESIDENT_SOURCES.get(key)
+            if source and source.mtime == mtime:
+                return source
+            stdio and getattr(stdio, 'verbose', print)('%s %s' % ('reload' if source else 'load', key))
             try:
-                stdio and getattr(stdio, 'verbose', print)('import %s' % name)
-                module = __import__(name)
-                DynamicLoading.MODULES[name] = DynamicLoading.Module(module)
+                with open(file_path, 'rb') as f:
+                    code = compile(f.read(), file_path, 'exec', dont_inherit=True)
             except:
-                stdio and getattr(stdio, 'exception', print)('import %s failed' % name)
-                stdio and getattr(stdio, 'verbose', print)('sys.path: %s' % sys.path)
+                stdio and getattr(stdio, 'exception', print)('import %s failed' % key)
                 return None
-        DynamicLoading.MODULES[name].count += 1
-        stdio and getattr(stdio, 'verbose', print)('add %s ref count to %s' % (name, DynamicLoading.MODULES[name].count))
-        return DynamicLoading.MODULES[name].module
+            source = DynamicLoading.RESIDENT_SOURCES[key] = DynamicLoading.Source(code, mtime)
+            return source
 
     @staticmethod
-    def export_module(name, stdio=None):
-        if name not in DynamicLoading.MODULES:
-            return
-        if DynamicLoading.MODULES[name].count < 1:
-            return
+    def _import_resident_module(name, path, libs_path=None, stdio=None):
+        key = DynamicLoading._module_key(name, path)
+        file_path = os.path.join(path, '%s.py' % name)
+        source = DynamicLoading._get_resident_source(key, file_path, stdio)
+        if source is None:
+            return None
+        # every import runs the module in a new namespace, so no module state is left from the last call
+        module = types.ModuleType(key)
+        module.__file__ = file_path
+        # the libs are only needed by the imports at the top of the module, which are in sys.modules after the first run
+        libs_path = [] if source.executed else (libs_path or [])
+        DynamicLoading.add_libs_path(libs_path)
         try:
-            DynamicLoading.MODULES[name].count -= 1
-            stdio and getattr(stdio, 'verbose', print)('sub %s ref count to %s' % (name, DynamicLoading.MODULES[name].count))
-            if DynamicLoading.MODULES[name].count == 0:
-                stdio and getattr(stdio, 'verbose', print)('export %s' % name)
-                del sys.modules[name]
-                del DynamicLoading.MODULES[name]
+            sys.modules[key] = module
+            exec(source.code, module.__dict__)
+            source.executed = True
         except:
-            stdio and getattr(stdio, 'exception', print)('export %s failed' % name)
+            sys.modules.pop(key, None)
+            stdio and getattr(stdio, 'exception', print)('import %s failed' % key)
+            stdio and getattr(stdio, 'verbose', print)('sys.path: %s' % sys.path)
+            return None
+        finally:
+            DynamicLoading.remove_libs_path(libs_path)
+        return module
+
+    @staticmethod
+    def import_module(name, stdio=None, path=None, libs_path=None):
+        """
+        Import a module by name, or load `name`.py in `path` when path is given.
+        The source of a module loaded from a path is resident: it is compiled again only when the file is modified,
+        each import gets a new module, and modules with the same name in different paths are different modules.
+        """
+        if path is not None:
+            return DynamicLoading._import_resident_module(name, path, libs_path, stdio)
+        key = name
+        with DynamicLoading.LOCK:
+            if key not in DynamicLoading.MODULES:
+                try:
+                    stdio and getattr(stdio, 'verbose', print)('import %s' % key)
+                    module = __import__(name)
+                    DynamicLoading.MODULES[key] = DynamicLoading.Module(module)
+                except:
+                    stdio and getattr(stdio, 'exception', print)('import %s failed' % key)
+                    stdio and getattr(stdio, 'verbose', print)('sys.path: %s' % sys.path)
+                    return None
+            DynamicLoading.MODULES[key].count += 1
+            stdio and getattr(stdio, 'verbose', print)('add %s ref count to %s' % (key, DynamicLoading.MODULES[key].count))
+            return DynamicLoading.MODULES[key].module
+
+    @staticmethod
+    def export_module(name, stdio=None, path=None):
+        if path is not None:
+            # a module loaded from a path is dropped with its last reference
+            return
+        key = name
+        with DynamicLoading.LOCK:
+            if key not in DynamicLoading.MODULES:
+                return
+            if DynamicLoading.MODULES[key].count < 1:
+                return
+            try:
+                DynamicLoading.MODULES[key].count -= 1
+                stdio and getattr(stdio, 'verbose', print)('sub %s ref count to %s' % (key, DynamicLoading.MODULES[key].count))
+                if DynamicLoading.MODULES[key].count == 0:
+                    stdio and getattr(stdio, 'verbose', print)('export %s' % key)
+                    del sys.modules[key]
+                    del DynamicLoading.MODULES[key]
+            except:
+                stdio and getattr(stdio, 'exception', print)('export %s failed' % key)
 
 
 class ConfigUtil(object):
@@ -819,6 +1000,9 @@ class Cursor(SafeStdio):
             self.cursor = self.db.cursor(cursorclass=mysql.cursors.DictCursor)
     else:
         def _connect(self):
+            global mysql
+            if mysql is None:
+                import pymysql as mysql
             if self.mode == 'mysql':
                 self.stdio.verbose('mysql connect %s -P%s -u%s -p%s' % (self.ip, self.port, self.user, self.password))
                 self.db = mysql.connect(host=self.ip, user=self.user, port=int(self.port), password=str(self.password),
@@ -844,17 +1028,17 @@ class Cursor(SafeStdio):
 
     @property
     def usable_cursor(self):
-        count = 600
-        self.stdio.start_loading('wait observer usable')
-        while count:
+        def usable():
             if self.execute('show databases', raise_exception=False, exc_level='verbose'):
-                self.stdio.stop_loading('succeed')
-                return self
-            else:
-                count -= 1
-                time.sleep(3)
-                self.close()
-                self._connect()
+                return True
+            self.close()
+            self._connect()
+            return False
+
+        self.stdio.start_loading('wait observer usable')
+        if wait_until(usable, timeout=1800, name='wait observer usable', stdio=self.stdio):
+            self.stdio.stop_loading('succeed')
+            return self
         self.stdio.stop_loading('fail')
         raise Exception('get usable cursor failed')
 
@@ -1116,6 +1300,9 @@ def string_to_md5_32bytes(input_str):
 
 
 def aes_encrypt(plaintext, key):
+    from Crypto.Cipher import AES
+    from Crypto.Random import get_random_bytes
+    from Crypto.Util.Padding import pad
     iv = get_random_bytes(AES.block_size)
     cipher = AES.new(key, AES.MODE_CBC, iv)
     ciphertext = cipher.encrypt(pad(plaintext.encode('utf-8'), AES.block_size))
@@ -1123,6 +1310,8 @@ def aes_encrypt(plaintext, key):
 
 
 def aes_decrypt(ciphertext, key):
+    from Crypto.Cipher import AES
+    from Crypto.Util.Padding import unpad
     raw_data = base64.b64decode(ciphertext)
     iv = raw_data[:AES.block_size]
     ciphertext = raw_data[AES.block_size:]